@@ -0,0 +1,23 @@
+# aplicar_retencion_logs.py
+"""
+Aplica una vez la política de retención: mueve a logs_archive los logs con más
+de LOG_RETENTION_DAYS días (o los días indicados), por lotes pequeños.
+
+Uso: python aplicar_retencion_logs.py [dias]
+"""
+import sys
+from core.database import create_db_and_tables
+from core.retention import apply_log_retention
+from core.config import settings
+
+def aplicar_retencion_logs():
+    create_db_and_tables()
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else settings.LOG_RETENTION_DAYS
+    if dias <= 0:
+        print("⚠️ Retención desactivada (LOG_RETENTION_DAYS=0); indique los días como argumento")
+        return
+    movidos = apply_log_retention(retention_days=dias)
+    print(f"✅ {movidos} logs con más de {dias} días movidos a logs_archive")
+
+if __name__ == "__main__":
+    aplicar_retencion_logs()
@@ -20,6 +20,13 @@ LiquidCrystal_I2C lcd(0x27, 16, 2);
 String tokenActual = "";
 String userName = "";
 bool logeado = false;
+// Los reintentos del backend repiten action_id: no ejecutar dos veces la misma acción.
+// Se recuerdan las últimas ids (un reintento puede llegar después de acciones más nuevas)
+const int ACCIONES_RECORDADAS = 64;
+int accionesEjecutadas[ACCIONES_RECORDADAS] = {0};
+int indiceAcciones = 0;
+// Acción que se está ejecutando: delayWithWebSocket atiende el socket y puede llegar su reintento
+int accionEnCurso = 0;
 
 // ================== TECLADO ==================
 const byte rowsCount = 4;
@@ -89,6 +96,9 @@ bool loginESP32(String username, String password);
 void webSocketEvent(WStype_t type, uint8_t* payload, size_t length);
 bool verificarConexionBackend();
 void enviarAccionBackend(String tipoAccion);
+bool accionYaEjecutada(int actionId);
+void ejecutarAccion(int actionId, String actionType, String command);
+void confirmarAccionBackend(int actionId);
 void mostrarMenuPrincipal();
 void mostrarMenuLED();
 void mostrarMenuMotor();
@@ -324,7 +334,8 @@ void webSocketEvent(WStype_t type, uint8_t* payload, size_t length) {
       {
         Serial.printf("[WS] 📩 Mensaje recibido: %s\n", payload);
 
-        StaticJsonDocument<512> doc;
+        // Un frame "action_batch" trae hasta 50 acciones (ACTION_BATCH_MAX_SIZE del backend)
+        DynamicJsonDocument doc(8192);
         DeserializationError error = deserializeJson(doc, payload, length);
 
         if (error) {
@@ -335,6 +346,14 @@ void webSocketEvent(WStype_t type, uint8_t* payload, size_t length) {
         String tipo = doc["type"] | "";
         String event = doc["event"] | "";
 
+        // Heartbeat del backend: responder enseguida para que mida el RTT y nos marque online
+        if (tipo == "ping") {
+          unsigned long seq = doc["seq"] | 0UL;
+          String pongMsg = "{\"type\":\"pong\",\"seq\":" + String(seq) + "}";
+          webSocket.sendTXT(pongMsg);
+          return;
+        }
+
         // 🔥 CAPTURAR LOGIN DESDE LA APP - MÚLTIPLES FORMATOS
         if (tipo == "login" || tipo == "auth_success") {
           bool success = doc["success"] | false;
@@ -401,38 +420,18 @@ void webSocketEvent(WStype_t type, uint8_t* payload, size_t length) {
           String command = doc["command"] | "";
 
           Serial.printf("[WS] ⚡ Acción recibida: %s (ID:%d)\n", actionType.c_str(), actionId);
-
-          if (actionType == "LED_ON" || command == "LED_ON") {
-            digitalWrite(ledPin1, HIGH);
-            ledState1 = 1;
-            lcd.clear();
-            lcd.setCursor(0, 0);
-            lcd.print("LED: ON");
-            lcd.setCursor(0, 1);
-            lcd.print("STATUS: ENCENDIDO");
-            delayWithWebSocket(2000);
-            delay(1000);
-            mostrarMenuPrincipal();
-          } else if (actionType == "LED_OFF" || command == "LED_OFF") {
-            digitalWrite(ledPin1, LOW);
-            ledState1 = 0;
-            lcd.clear();
-            lcd.setCursor(0, 0);
-            lcd.print("LED: OFF");
-            lcd.setCursor(0, 1);
-            lcd.print("STATUS: APAGADO");
-            delayWithWebSocket(2000);
-            delay(1000);
-            mostrarMenuPrincipal();
-          } else if (actionType == "MOTOR_IZQ" || command == "MOTOR_IZQ") {
-            iniciarGiroMotor(false);
-            mostrarPantallaMotor(false);
-          } else if (actionType == "MOTOR_DER" || command == "MOTOR_DER") {
-            iniciarGiroMotor(true);
-            mostrarPantallaMotor(true);
-          } else if (actionType == "MOTOR_STOP" || command == "MOTOR_STOP") {
-            pararMotor();
-            mostrarMenuPrincipal();
+          ejecutarAccion(actionId, actionType, command);
+        }
+        // Secuencia de acciones en un solo frame, en orden
+        else if (tipo == "action_batch") {
+          JsonArray acciones = doc["actions"].as<JsonArray>();
+          Serial.printf("[WS] 📦 Lote de %d acciones recibido\n", acciones.size());
+
+          for (JsonObject accion : acciones) {
+            int actionId = accion["action_id"] | 0;
+            String actionType = accion["action_type"] | "";
+            String command = accion["command"] | "";
+            ejecutarAccion(actionId, actionType, command);
           }
         }
         // Mensaje genérico de conexión
@@ -583,6 +582,83 @@ void enviarAccionBackend(String tipoAccion) {
   http.end();
 }
 
+// ================== ACCIONES ==================
+bool accionYaEjecutada(int actionId) {
+  for (int i = 0; i < ACCIONES_RECORDADAS; i++) {
+    if (accionesEjecutadas[i] == actionId) return true;
+  }
+  return false;
+}
+
+void ejecutarAccion(int actionId, String actionType, String command) {
+  if (actionId > 0 && actionId == accionEnCurso) {
+    // Reintento mientras la acción todavía corre: se confirmará al terminar
+    Serial.printf("[WS] ⏳ Acción %d en curso, se ignora el reintento\n", actionId);
+    return;
+  }
+  if (actionId > 0 && accionYaEjecutada(actionId)) {
+    // Reenvío de una acción ya ejecutada (la confirmación se perdió): solo confirmar
+    Serial.printf("[WS] 🔁 Acción %d repetida, se confirma sin ejecutar\n", actionId);
+    confirmarAccionBackend(actionId);
+    return;
+  }
+
+  // Registrar la id ANTES de ejecutar: un reintento que llegue durante la acción no la repite
+  if (actionId > 0) {
+    accionesEjecutadas[indiceAcciones] = actionId;
+    indiceAcciones = (indiceAcciones + 1) % ACCIONES_RECORDADAS;
+    accionEnCurso = actionId;
+  }
+
+  if (actionType == "LED_ON" || command == "LED_ON") {
+    digitalWrite(ledPin1, HIGH);
+    ledState1 = 1;
+    lcd.clear();
+    lcd.setCursor(0, 0);
+    lcd.print("LED: ON");
+    lcd.setCursor(0, 1);
+    lcd.print("STATUS: ENCENDIDO");
+    delayWithWebSocket(2000);
+    delay(1000);
+    mostrarMenuPrincipal();
+  } else if (actionType == "LED_OFF" || command == "LED_OFF") {
+    digitalWrite(ledPin1, LOW);
+    ledState1 = 0;
+    lcd.clear();
+    lcd.setCursor(0, 0);
+    lcd.print("LED: OFF");
+    lcd.setCursor(0, 1);
+    lcd.print("STATUS: APAGADO");
+    delayWithWebSocket(2000);
+    delay(1000);
+    mostrarMenuPrincipal();
+  } else if (actionType == "MOTOR_IZQ" || command == "MOTOR_IZQ") {
+    iniciarGiroMotor(false);
+    mostrarPantallaMotor(false);
+  } else if (actionType == "MOTOR_DER" || command == "MOTOR_DER") {
+    iniciarGiroMotor(true);
+    mostrarPantallaMotor(true);
+  } else if (actionType == "MOTOR_STOP" || command == "MOTOR_STOP") {
+    pararMotor();
+    mostrarMenuPrincipal();
+  }
+
+  if (actionId > 0) {
+    accionEnCurso = 0;
+    confirmarAccionBackend(actionId);
+  }
+}
+
+void confirmarAccionBackend(int actionId) {
+  HTTPClient http;
+  String url = API_BASE + "/actions/device/confirm/" + String(actionId);
+  http.begin(url);
+
+  int code = http.POST("");
+  Serial.printf("[ACTION] Confirmación acción %d, HTTP Code: %d\n", actionId, code);
+  http.end();
+}
+
 // ================== FUNCIONES DE VISUALIZACIÓN ==================
 void mostrarPantallaMotor(bool direccion) {
   lcd.clear();
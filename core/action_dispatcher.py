@@ -0,0 +1,296 @@
+# core/action_dispatcher.py
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import select
+
+from core.backplane import Backplane, backplane
+from core.config import settings
+from core.database import AsyncSession, async_engine
+from core.websocket_manager import manager
+from models.actions_devices import ActionDevice
+
+
+class _PendingAction:
+    """Acción esperando confirmación del dispositivo."""
+
+    def __init__(self, action_id: int, id_device: int, action: str, created_at: datetime, recovered: bool = False):
+        self.action_id = action_id
+        self.id_device = id_device
+        self.action = action
+        self.created_at = created_at
+        self.attempts = 0
+        self.first_sent_at: Optional[float] = None  # time.monotonic() del primer envío
+        self.next_retry_at = 0.0
+        # Cargada de la base al iniciar: todos los workers la tienen, la envía
+        # solo el que tenga conectado al dispositivo
+        self.recovered = recovered
+
+    def payload(self) -> Dict[str, Any]:
+        return {
+            "type": "action_execute",
+            "action_id": self.action_id,
+            "id_device": self.id_device,
+            "action_type": self.action,
+            "timestamp": self.created_at.isoformat(),
+            # Un reintento puede llegar a un dispositivo que ya ejecutó: deduplicar por action_id
+            "attempt": self.attempts,
+        }
+
+
+class _DeviceQueue:
+    def __init__(self):
+        self.pending: "OrderedDict[int, _PendingAction]" = OrderedDict()
+        self.lock = asyncio.Lock()  # Un envío a la vez por dispositivo: conserva el orden
+        self.sent = 0
+        self.frames = 0
+        self.acked = 0
+        self.retries = 0
+        self.failed = 0
+        self.expired = 0
+        self.total_ack_ms = 0.0
+        self.max_ack_ms = 0.0
+
+
+class ActionDispatcher:
+    """
+    Cola de salida por dispositivo para las acciones creadas en /actions.
+
+    Las acciones pendientes son las filas de actions_devices con executed=False:
+    al reconectarse /ws/device/{id} se reenvían en orden de creación, y mientras
+    el dispositivo no confirme (POST /actions/device/confirm/{id}) se reintentan
+    con backoff exponencial. Tras ACTION_MAX_ATTEMPTS envíos o ACTION_TTL_SECONDS
+    de antigüedad se descartan: un motor no debe moverse por una orden vieja.
+
+    Con varios workers, la acción queda en la cola del worker que la creó y se
+    envía por el backplane si el dispositivo está en otro; las confirmaciones y
+    descartes se publican para que todos los workers la saquen de su cola.
+    """
+
+    def __init__(self, max_attempts: int, retry_base_seconds: float, retry_max_seconds: float, ttl_seconds: int,
+                 backplane: Backplane):
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.ttl_seconds = ttl_seconds
+        self.backplane = backplane
+        self._queues: Dict[int, _DeviceQueue] = {}
+        self._retry_task: Optional[asyncio.Task] = None
+        backplane.on("action_ack", self._on_remote_ack)
+        backplane.on("action_discard", self._on_remote_discard)
+
+    def _queue(self, device_id: int) -> _DeviceQueue:
+        queue = self._queues.get(device_id)
+        if queue is None:
+            queue = self._queues[device_id] = _DeviceQueue()
+        return queue
+
+    def _is_expired(self, item: _PendingAction) -> bool:
+        return item.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+
+    # ---------------------- CICLO DE VIDA ----------------------
+    async def start(self):
+        """Carga las acciones pendientes recientes e inicia el ciclo de reintentos."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        async with AsyncSession(async_engine) as session:
+            rows = (await session.exec(
+                select(ActionDevice)
+                .where(ActionDevice.executed == False, ActionDevice.created_at >= cutoff)
+                .order_by(ActionDevice.id)
+            )).all()
+        for row in rows:
+            self._queue(row.id_device).pending[row.id] = _PendingAction(
+                row.id, row.id_device, row.action, row.created_at, recovered=True
+            )
+        if rows:
+            print(f"📬 {len(rows)} acciones pendientes recuperadas para reenvío")
+        self._retry_task = asyncio.create_task(self._retry_loop())
+
+    def shutdown(self):
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+
+    # ---------------------- ENVÍO ----------------------
+    def _drop_stale(self, queue: _DeviceQueue, item: _PendingAction) -> bool:
+        """Descarta la acción si agotó los intentos o venció. Devuelve True si se descartó."""
+        if item.attempts >= self.max_attempts:
+            queue.failed += 1
+            print(f"❌ Acción {item.action_id} sin confirmar tras {item.attempts} envíos, se descarta")
+        elif self._is_expired(item):
+            queue.expired += 1
+            print(f"⌛ Acción {item.action_id} vencida sin confirmar, se descarta")
+        else:
+            return False
+        queue.pending.pop(item.action_id, None)
+        return True
+
+    async def _deliver(self, queue: _DeviceQueue, items: List[_PendingAction]) -> bool:
+        """
+        Envía (o reenvía) acciones del mismo dispositivo y programa sus reintentos.
+        Una sola acción va como "action_execute"; varias, en un único frame
+        "action_batch" de hasta ACTION_BATCH_MAX_SIZE. Llamar con queue.lock.
+        """
+        items = [item for item in items if item.action_id in queue.pending and not self._drop_stale(queue, item)]
+        if not items:
+            return False
+
+        device_id = items[0].id_device
+        for chunk_start in range(0, len(items), settings.ACTION_BATCH_MAX_SIZE):
+            chunk = items[chunk_start:chunk_start + settings.ACTION_BATCH_MAX_SIZE]
+            for item in chunk:
+                item.attempts += 1
+            if len(chunk) == 1:
+                message = chunk[0].payload()
+            else:
+                message = {
+                    "type": "action_batch",
+                    "id_device": device_id,
+                    "actions": [item.payload() for item in chunk],
+                }
+            if not await manager.send_to_device(device_id, message):
+                # Sin conexión: no cuenta como intento, se envía al reconectar
+                for item in chunk:
+                    item.attempts -= 1
+                return False
+
+            now = time.monotonic()
+            for item in chunk:
+                if item.first_sent_at is None:
+                    item.first_sent_at = now
+                else:
+                    queue.retries += 1
+                backoff = min(self.retry_base_seconds * 2 ** (item.attempts - 1), self.retry_max_seconds)
+                item.next_retry_at = now + backoff
+            queue.sent += len(chunk)
+            queue.frames += 1
+        return True
+
+    async def enqueue(self, actions: List[ActionDevice]):
+        """
+        Agrega acciones recién creadas y envía a cada dispositivo conectado un solo
+        frame con las suyas, en orden de creación.
+        """
+        by_device: Dict[int, List[_PendingAction]] = {}
+        for action in actions:
+            by_device.setdefault(action.id_device, []).append(
+                _PendingAction(action.id, action.id_device, action.action, action.created_at)
+            )
+        for device_id, items in by_device.items():
+            queue = self._queue(device_id)
+            local = device_id in manager.device_connections
+            async with queue.lock:
+                # Si hay acciones anteriores sin enviar, el dispositivo está desconectado:
+                # estas esperan su turno en flush()
+                waiting = any(
+                    item.first_sent_at is None and (local or not item.recovered)
+                    for item in queue.pending.values()
+                )
+                for item in items:
+                    queue.pending[item.action_id] = item
+                if not waiting:
+                    await self._deliver(queue, items)
+
+    async def flush(self, device_id: int):
+        """Reenvía en orden todo lo pendiente del dispositivo (al reconectarse)."""
+        queue = self._queues.get(device_id)
+        if queue is None or not queue.pending:
+            return
+        async with queue.lock:
+            await self._deliver(queue, list(queue.pending.values()))
+        print(f"📬 Cola del dispositivo {device_id} reenviada ({len(queue.pending)} sin confirmar)")
+
+    async def _retry_loop(self):
+        while True:
+            await asyncio.sleep(settings.ACTION_RETRY_TICK_MS / 1000)
+            now = time.monotonic()
+            for device_id, queue in list(self._queues.items()):
+                if not queue.pending:
+                    continue
+                local = device_id in manager.device_connections
+                if not local and not manager.is_device_connected(device_id):
+                    # Desconectado: solo se descartan las vencidas, el resto espera a flush()
+                    for item in [item for item in queue.pending.values() if self._is_expired(item)]:
+                        queue.pending.pop(item.action_id, None)
+                        queue.expired += 1
+                    continue
+                # En otro worker: las recuperadas las envía ese worker desde su propia cola
+                due = [
+                    item for item in queue.pending.values()
+                    if item.next_retry_at <= now and (local or not item.recovered)
+                ]
+                if not due:
+                    continue
+                try:
+                    async with queue.lock:
+                        await self._deliver(queue, due)
+                except Exception as e:
+                    print(f"❌ Error reintentando acciones del dispositivo {device_id}: {e}")
+
+    # ---------------------- CONFIRMACIONES ----------------------
+    def ack(self, id_device: int, action_id: int):
+        """El dispositivo confirmó la ejecución: sale de la cola y se mide la latencia."""
+        self._ack_local(id_device, action_id)
+        self.backplane.publish_nowait({"kind": "action_ack", "id_device": id_device, "action_id": action_id})
+
+    def _ack_local(self, id_device: int, action_id: int):
+        queue = self._queues.get(id_device)
+        item = queue.pending.pop(action_id, None) if queue else None
+        if item is None:
+            return
+        queue.acked += 1
+        if item.first_sent_at is not None:
+            ack_ms = (time.monotonic() - item.first_sent_at) * 1000
+            queue.total_ack_ms += ack_ms
+            queue.max_ack_ms = max(queue.max_ack_ms, ack_ms)
+
+    def discard(self, id_device: int, action_id: int):
+        """La acción se borró o se marcó a mano: deja de reintentarse."""
+        self._discard_local(id_device, action_id)
+        self.backplane.publish_nowait({"kind": "action_discard", "id_device": id_device, "action_id": action_id})
+
+    def _discard_local(self, id_device: int, action_id: int):
+        queue = self._queues.get(id_device)
+        if queue:
+            queue.pending.pop(action_id, None)
+
+    async def _on_remote_ack(self, message: Dict[str, Any]):
+        self._ack_local(message["id_device"], message["action_id"])
+
+    async def _on_remote_discard(self, message: Dict[str, Any]):
+        self._discard_local(message["id_device"], message["action_id"])
+
+    def stats(self) -> Dict[str, Any]:
+        devices = {}
+        for device_id, queue in self._queues.items():
+            devices[device_id] = {
+                "connected": manager.is_device_connected(device_id),
+                "queue_depth": len(queue.pending),
+                "sent": queue.sent,
+                "frames": queue.frames,
+                "acked": queue.acked,
+                "retries": queue.retries,
+                "failed": queue.failed,
+                "expired": queue.expired,
+                "avg_ack_ms": round(queue.total_ack_ms / queue.acked, 2) if queue.acked else 0.0,
+                "max_ack_ms": round(queue.max_ack_ms, 2),
+            }
+        return {
+            "max_attempts": self.max_attempts,
+            "retry_base_seconds": self.retry_base_seconds,
+            "retry_max_seconds": self.retry_max_seconds,
+            "ttl_seconds": self.ttl_seconds,
+            "devices": devices,
+        }
+
+
+# Instancia global
+action_dispatcher = ActionDispatcher(
+    max_attempts=settings.ACTION_MAX_ATTEMPTS,
+    retry_base_seconds=settings.ACTION_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.ACTION_RETRY_MAX_SECONDS,
+    ttl_seconds=settings.ACTION_TTL_SECONDS,
+    backplane=backplane,
+)
@@ -0,0 +1,127 @@
+# core/auth_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+from core.backplane import Backplane, backplane
+from core.config import settings
+from models.users import User
+
+
+def _key(token: str) -> str:
+    # Misma huella que core.security.token_digest (security importa este módulo).
+    # Con la huella como clave, las invalidaciones viajan por el backplane sin el JWT.
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class AuthCache:
+    """
+    Caché LRU con TTL de tokens verificados (huella del token → copia del usuario).
+    Evita las consultas de User y Token en cada petición protegida.
+
+    Cada worker tiene su caché: logout y los cambios de usuario se publican en
+    el backplane para que todos los workers descarten sus entradas.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, backplane: Backplane):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backplane = backplane
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()  # Las rutas sync corren en el threadpool
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        backplane.on("auth_invalidate_token", self._on_remote_invalidate_token)
+        backplane.on("auth_invalidate_user", self._on_remote_invalidate_user)
+
+    def get(self, token: str) -> Optional[User]:
+        token = _key(token)
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_data, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+        # Copia nueva por petición: nadie comparte ni modifica el snapshot
+        return User(**user_data)
+
+    def set(self, token: str, user: User, token_expiration: Optional[float] = None):
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        if token_expiration is not None:
+            # Nunca servir un token más allá de su propio "exp"
+            expires_at = min(expires_at, time.monotonic() + max(token_expiration - time.time(), 0))
+        token = _key(token)
+        with self._lock:
+            self._entries[token] = (user.model_dump(), expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # ---------------------- INVALIDACIÓN ----------------------
+    def invalidate_token(self, token: str):
+        digest = _key(token)
+        self._invalidate_token_local(digest)
+        self.backplane.publish_nowait({"kind": "auth_invalidate_token", "token_hash": digest})
+
+    def invalidate_user(self, user_id: int):
+        self._invalidate_user_local(user_id)
+        self.backplane.publish_nowait({"kind": "auth_invalidate_user", "user_id": user_id})
+
+    def _invalidate_token_local(self, digest: str):
+        with self._lock:
+            if self._entries.pop(digest, None) is not None:
+                self.invalidations += 1
+
+    def _invalidate_user_local(self, user_id: int):
+        with self._lock:
+            stale = [t for t, (data, _) in self._entries.items() if data.get("id") == user_id]
+            for t in stale:
+                del self._entries[t]
+            self.invalidations += len(stale)
+
+    async def _on_remote_invalidate_token(self, message: Dict[str, Any]):
+        self._invalidate_token_local(message["token_hash"])
+
+    async def _on_remote_invalidate_user(self, message: Dict[str, Any]):
+        self._invalidate_user_local(message["user_id"])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                # Cada acierto ahorra las 2 consultas (User + Token)
+                "queries_saved": self.hits * 2,
+            }
+
+
+# Instancia global
+auth_cache = AuthCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+    backplane=backplane,
+)
@@ -0,0 +1,276 @@
+# core/backplane.py
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from core.config import settings
+
+try:
+    import redis.asyncio as aioredis  # Opcional: solo para BACKPLANE_URL=redis://
+except ImportError:
+    aioredis = None
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class Backplane(ABC):
+    """
+    Bus de mensajes entre workers de uvicorn. Cada worker publica lo que no puede
+    entregar él mismo (frames para un dispositivo conectado a otro worker,
+    broadcasts, confirmaciones de acciones) y recibe lo que publican los demás.
+
+    Los mensajes son dicts con un campo "kind"; cada módulo registra con on() el
+    handler de sus tipos. Los mensajes propios se ignoran al recibirlos: quien
+    publica ya entregó localmente.
+    """
+
+    name = "base"
+    distributed = True
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._handlers: Dict[str, Handler] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    def on(self, kind: str, handler: Handler):
+        self._handlers[kind] = handler
+
+    # ---------------------- CICLO DE VIDA ----------------------
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self._open()
+        print(f"🔀 Backplane {self.name} activo (worker {self.worker_id})")
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await self._close()
+
+    async def _open(self):
+        pass
+
+    async def _close(self):
+        pass
+
+    # ---------------------- PUBLICACIÓN ----------------------
+    async def publish(self, message: Dict[str, Any]):
+        if not self.distributed:
+            return
+        try:
+            await self._send(json.dumps({**message, "origin": self.worker_id}))
+            self.published += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Error publicando en el backplane {self.name}: {e}")
+
+    def publish_nowait(self, message: Dict[str, Any]):
+        """Publica sin esperar; se puede llamar desde rutas sync (hilos del threadpool)."""
+        if not self.distributed or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._spawn(self.publish(message))
+        else:
+            self._loop.call_soon_threadsafe(self._spawn, self.publish(message))
+
+    def _spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @abstractmethod
+    async def _send(self, text: str):
+        """Entrega text a los demás workers; cada backend implementa su transporte."""
+
+    # ---------------------- RECEPCIÓN ----------------------
+    async def _dispatch(self, text: str):
+        try:
+            message = json.loads(text)
+            if message.get("origin") == self.worker_id:
+                return
+            handler = self._handlers.get(message.get("kind"))
+            if handler is None:
+                return
+            self.received += 1
+            await handler(message)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Error procesando mensaje del backplane: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "worker_id": self.worker_id,
+            "distributed": self.distributed,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+
+class InMemoryBackplane(Backplane):
+    """Un solo proceso: todo se entrega localmente y no hay nada que publicar."""
+
+    name = "memory"
+    distributed = False
+
+    async def _send(self, text: str):
+        # publish() no llega aquí: distributed=False
+        pass
+
+
+class SQLiteBackplane(Backplane):
+    """
+    Bus en una tabla SQLite compartida por los workers de una misma máquina:
+    publicar inserta una fila y cada worker lee las nuevas cada BACKPLANE_POLL_MS.
+    Pensado para pruebas con varios workers sin levantar Redis.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, poll_ms: int, retention_seconds: int = 60):
+        super().__init__()
+        self.path = path
+        self.poll_seconds = poll_ms / 1000
+        self.retention_seconds = retention_seconds
+        # sqlite3 bloquea: un hilo propio para no frenar el event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backplane")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_id = 0
+        self._poller: Optional[asyncio.Task] = None
+
+    def _run(self, func, *args):
+        return self._loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> int:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS backplane_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, body TEXT NOT NULL)"
+        )
+        return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM backplane_messages").fetchone()[0]
+
+    async def _open(self):
+        self._last_id = await self._run(self._connect)
+        self._poller = asyncio.create_task(self._poll_loop())
+
+    async def _close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+    def _insert(self, text: str):
+        self._conn.execute("INSERT INTO backplane_messages (created_at, body) VALUES (?, ?)", (time.time(), text))
+
+    async def _send(self, text: str):
+        await self._run(self._insert, text)
+
+    def _fetch(self, last_id: int):
+        return self._conn.execute(
+            "SELECT id, body FROM backplane_messages WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+
+    def _prune(self):
+        self._conn.execute(
+            "DELETE FROM backplane_messages WHERE created_at < ?", (time.time() - self.retention_seconds,)
+        )
+
+    async def _poll_loop(self):
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                rows = await self._run(self._fetch, self._last_id)
+                for row_id, body in rows:
+                    self._last_id = row_id
+                    await self._dispatch(body)
+                if time.monotonic() - last_prune > self.retention_seconds:
+                    last_prune = time.monotonic()
+                    await self._run(self._prune)
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Error leyendo el backplane sqlite: {e}")
+
+
+class RedisBackplane(Backplane):
+    """Pub/sub de Redis (o compatible: Valkey, KeyDB) en un canal común a todos los workers."""
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str):
+        super().__init__()
+        if aioredis is None:
+            raise RuntimeError("BACKPLANE_URL=redis:// requiere el paquete redis (pip install redis)")
+        self.url = url
+        self.channel = channel
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def _open(self):
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _send(self, text: str):
+        await self._redis.publish(self.channel, text)
+
+    async def _listen(self):
+        while True:
+            try:
+                async for item in self._pubsub.listen():
+                    if item.get("type") == "message":
+                        await self._dispatch(item["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Redis caído o reiniciado: reintentar la suscripción
+                self.errors += 1
+                print(f"❌ Backplane redis desconectado: {e}")
+                await asyncio.sleep(1)
+                try:
+                    await self._pubsub.subscribe(self.channel)
+                except Exception:
+                    pass
+
+
+def create_backplane(url: str) -> Backplane:
+    """memory:// (un proceso), sqlite:///ruta/bus.db (pruebas) o redis://host:6379/0 (producción)."""
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackplane(url, settings.BACKPLANE_CHANNEL)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackplane(url[len("sqlite:///"):], settings.BACKPLANE_POLL_MS)
+    if url.startswith("memory://"):
+        return InMemoryBackplane()
+    raise ValueError(f"BACKPLANE_URL no soportada: {url}")
+
+
+# Instancia global
+backplane = create_backplane(settings.BACKPLANE_URL)
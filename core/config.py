@@ -3,6 +3,23 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return default if value is None else value.strip().lower() in ("1", "true", "yes", "on")
+
+# Perfiles del motor de base de datos; cada valor se puede sobrescribir con su variable DB_*
+DB_PROFILES = {
+    "development": {
+        "echo": True, "pool_size": 5, "max_overflow": 10,
+        "pool_timeout": 30, "pool_recycle": -1, "pool_pre_ping": False,
+    },
+    # Sin log de SQL; reciclar antes del wait_timeout de MySQL y validar conexiones ociosas
+    "production": {
+        "echo": False, "pool_size": 10, "max_overflow": 20,
+        "pool_timeout": 10, "pool_recycle": 1800, "pool_pre_ping": True,
+    },
+}
+
 class Settings:
     PROJECT_NAME: str = "IoT Control System"
     DATABASE_URL: str = os.getenv("DATABASE_URL")
@@ -10,5 +27,84 @@ class Settings:
     ALGORITHM: str = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440))
 
+    # Pool de conexiones (DB_PROFILE=development|production)
+    DB_PROFILE: str = os.getenv("DB_PROFILE", "development")
+    _db_profile = DB_PROFILES.get(DB_PROFILE, DB_PROFILES["development"])
+    DB_ECHO: bool = _env_bool("DB_ECHO", _db_profile["echo"])
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", _db_profile["pool_size"]))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", _db_profile["max_overflow"]))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", _db_profile["pool_timeout"]))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", _db_profile["pool_recycle"]))
+    DB_POOL_PRE_PING: bool = _env_bool("DB_POOL_PRE_PING", _db_profile["pool_pre_ping"])
+
+    # Pool de hilos para bcrypt (hash/verificación de contraseñas)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 200))
+
+    # Caché de tokens verificados (0 desactiva)
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 1024))
+
+    # Segundos que se reutiliza el total de registros en la paginación por cursor
+    COUNT_CACHE_TTL_SECONDS: int = int(os.getenv("COUNT_CACHE_TTL_SECONDS", 30))
+
+    # Caché de /reports/dashboard-stats (STALE > 0 activa stale-while-revalidate)
+    DASHBOARD_CACHE_TTL_SECONDS: float = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", 5))
+    DASHBOARD_CACHE_STALE_SECONDS: float = float(os.getenv("DASHBOARD_CACHE_STALE_SECONDS", 0))
+
+    # Intervalo de envío agrupado del canal /ws/dashboard
+    DASHBOARD_STREAM_TICK_MS: int = int(os.getenv("DASHBOARD_STREAM_TICK_MS", 250))
+
+    # Reportes PDF en segundo plano (REPORT_WORKERS=0 renderiza en hilos)
+    REPORT_WORKERS: int = int(os.getenv("REPORT_WORKERS", 2))
+    REPORT_MAX_CONCURRENT: int = int(os.getenv("REPORT_MAX_CONCURRENT", 2))
+    REPORT_MAX_PENDING: int = int(os.getenv("REPORT_MAX_PENDING", 10))
+    # Tope de filas por PDF; el render por bloques permite subirlo sin crecer en memoria
+    REPORT_MAX_ROWS: int = int(os.getenv("REPORT_MAX_ROWS", 5000))
+    # Caché de PDFs generados en static/reports (desalojo por tamaño y antigüedad)
+    REPORT_CACHE_MAX_MB: int = int(os.getenv("REPORT_CACHE_MAX_MB", 200))
+    REPORT_CACHE_MAX_AGE_HOURS: float = float(os.getenv("REPORT_CACHE_MAX_AGE_HOURS", 72))
+
+    # Archivo columnar (Parquet) de logs para analítica fuera de la DB de producción
+    LOG_ARCHIVE_DIR: str = os.getenv("LOG_ARCHIVE_DIR", "archive/logs")
+    LOG_ARCHIVE_BATCH_SIZE: int = int(os.getenv("LOG_ARCHIVE_BATCH_SIZE", 50000))
+
+    # Retención: logs con más de N días pasan a logs_archive (0 desactiva)
+    LOG_RETENTION_DAYS: int = int(os.getenv("LOG_RETENTION_DAYS", 0))
+    LOG_RETENTION_BATCH_SIZE: int = int(os.getenv("LOG_RETENTION_BATCH_SIZE", 1000))
+    LOG_RETENTION_PAUSE_MS: int = int(os.getenv("LOG_RETENTION_PAUSE_MS", 50))
+    LOG_RETENTION_INTERVAL_MINUTES: int = int(os.getenv("LOG_RETENTION_INTERVAL_MINUTES", 60))
+
+    # Limpieza de tokens vencidos o revocados (0 desactiva)
+    TOKEN_SWEEP_INTERVAL_MINUTES: int = int(os.getenv("TOKEN_SWEEP_INTERVAL_MINUTES", 30))
+    TOKEN_SWEEP_BATCH_SIZE: int = int(os.getenv("TOKEN_SWEEP_BATCH_SIZE", 1000))
+    TOKEN_SWEEP_PAUSE_MS: int = int(os.getenv("TOKEN_SWEEP_PAUSE_MS", 20))
+
+    # Cola de acciones por dispositivo: reintentos hasta la confirmación del IoT
+    ACTION_MAX_ATTEMPTS: int = int(os.getenv("ACTION_MAX_ATTEMPTS", 5))
+    ACTION_RETRY_BASE_SECONDS: float = float(os.getenv("ACTION_RETRY_BASE_SECONDS", 2))
+    ACTION_RETRY_MAX_SECONDS: float = float(os.getenv("ACTION_RETRY_MAX_SECONDS", 30))
+    ACTION_RETRY_TICK_MS: int = int(os.getenv("ACTION_RETRY_TICK_MS", 250))
+    ACTION_TTL_SECONDS: int = int(os.getenv("ACTION_TTL_SECONDS", 300))
+    # Máximo de acciones por POST /actions/batch y por frame enviado al dispositivo
+    ACTION_BATCH_MAX_SIZE: int = int(os.getenv("ACTION_BATCH_MAX_SIZE", 50))
+
+    # WebSockets: cola de salida por socket y política con consumidores lentos
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", 100))
+    WS_SLOW_CONSUMER_POLICY: str = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")  # drop_oldest | disconnect
+    WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", 10))
+
+    # Bus entre workers de uvicorn: memory:// (un proceso), sqlite:///ruta.db (pruebas), redis://host:6379/0
+    BACKPLANE_URL: str = os.getenv("BACKPLANE_URL", "memory://")
+    BACKPLANE_CHANNEL: str = os.getenv("BACKPLANE_CHANNEL", "esp32_ws")
+    BACKPLANE_POLL_MS: int = int(os.getenv("BACKPLANE_POLL_MS", 50))
+    # Cada worker anuncia sus dispositivos conectados con esta frecuencia
+    BACKPLANE_PRESENCE_SECONDS: float = float(os.getenv("BACKPLANE_PRESENCE_SECONDS", 10))
+
+    # Presencia de dispositivos: ping por WebSocket, desconexión sin respuesta y escritura agrupada de status
+    DEVICE_HEARTBEAT_SECONDS: float = float(os.getenv("DEVICE_HEARTBEAT_SECONDS", 15))
+    DEVICE_HEARTBEAT_TIMEOUT_SECONDS: float = float(os.getenv("DEVICE_HEARTBEAT_TIMEOUT_SECONDS", 45))
+    DEVICE_STATUS_FLUSH_SECONDS: float = float(os.getenv("DEVICE_STATUS_FLUSH_SECONDS", 5))
+
 settings = Settings()
 
@@ -0,0 +1,140 @@
+# core/dashboard_stream.py
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from core.backplane import Backplane, backplane
+from core.config import settings
+from core.log_events import EVENT_CREACION
+from core.websocket_manager import (
+    ConnectionManager, TOPIC_DASHBOARD, TOPIC_LOGS, device_topic, manager, user_topic,
+)
+
+
+class _PendingBatch:
+    """Cambios acumulados desde el último tick."""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.counters: Dict[str, Any] = {}
+
+    def is_empty(self) -> bool:
+        return not self.events and not self.counters
+
+
+def _merge_counters(target: Dict[str, Any], delta: Dict[str, Any]):
+    """Suma incrementos, incluyendo diccionarios anidados (ej. action_counts_today)."""
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            _merge_counters(target.setdefault(key, {}), value)
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+class DashboardStream:
+    """
+    Canal de empuje para los tableros (sockets suscritos al tema "dashboard").
+
+    Las rutas publican cambios (logs nuevos, incrementos de contadores, estado de
+    dispositivos) y los suscriptores reciben como máximo un frame por tick con todo
+    lo acumulado, de modo que una ráfaga de acciones produce un único mensaje,
+    codificado una vez. Cada evento sale además al instante en los temas "logs",
+    "device:{id}" y "user:{id}" para quien siga solo una máquina o un usuario.
+    Los cambios también se publican en el backplane para los sockets conectados
+    a otros workers.
+    """
+
+    def __init__(self, tick_seconds: float, manager: ConnectionManager, backplane: Backplane):
+        self.tick_seconds = tick_seconds
+        self.manager = manager
+        self.backplane = backplane
+        self._pending = _PendingBatch()
+        self._lock = threading.Lock()  # publish() también se llama desde rutas sync
+        self._flusher: Optional[asyncio.Task] = None
+        backplane.on("dashboard", self._on_remote_publish)
+
+    def start(self):
+        """Arranca el envío por tick si no está activo (al suscribirse un tablero)."""
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    # ---------------------- PUBLICACIÓN ----------------------
+    def publish(self, event: Optional[Dict[str, Any]] = None, counters: Optional[Dict[str, Any]] = None):
+        self._apply(event, counters)
+        self.backplane.publish_nowait({"kind": "dashboard", "event": event, "counters": counters})
+
+    async def _on_remote_publish(self, message: Dict[str, Any]):
+        self._apply(message["event"], message["counters"])
+
+    def _apply(self, event: Optional[Dict[str, Any]], counters: Optional[Dict[str, Any]]):
+        if self.manager.has_subscribers(TOPIC_DASHBOARD):
+            with self._lock:
+                if event is not None:
+                    self._pending.events.append(event)
+                if counters:
+                    _merge_counters(self._pending.counters, counters)
+        if event is not None:
+            self.manager.publish_local(_event_topics(event), event)
+
+    def publish_log(self, log):
+        """Publica un log recién guardado y los contadores que incrementa."""
+        counters: Dict[str, Any] = {"total_logs": 1, "logs_today": 1}
+        if log.event_category == EVENT_CREACION and log.action_type:
+            counters["action_counts_today"] = {log.action_type: 1}
+        self.publish(
+            event={
+                "type": "log_created",
+                "id": log.id,
+                "timestamp": log.timestamp.isoformat(),
+                "event": log.event,
+                "action_type": log.action_type,
+                "event_category": log.event_category,
+                "id_device": log.id_device,
+                "id_user": log.id_user,
+                "id_action": log.id_action,
+            },
+            counters=counters,
+        )
+
+    def publish_device_status(self, device_id: int, status: str):
+        self.publish(event={
+            "type": "device_status",
+            "id_device": device_id,
+            "status": status,
+            "timestamp": datetime.utcnow().isoformat(),
+        })
+
+    # ---------------------- ENVÍO POR TICK ----------------------
+    async def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, _PendingBatch()
+        if pending.is_empty():
+            return
+        self.manager.publish_local([TOPIC_DASHBOARD], {
+            "type": "dashboard_batch",
+            "events": pending.events,
+            "counters": pending.counters,
+        })
+
+    async def _flush_loop(self):
+        while self.manager.has_subscribers(TOPIC_DASHBOARD):
+            await asyncio.sleep(self.tick_seconds)
+            await self.flush()
+
+
+def _event_topics(event: Dict[str, Any]) -> List[str]:
+    topics = [device_topic(event["id_device"])] if event.get("id_device") is not None else []
+    if event.get("type") == "log_created":
+        topics.append(TOPIC_LOGS)
+        if event.get("id_user") is not None:
+            topics.append(user_topic(event["id_user"]))
+    return topics
+
+
+# Instancia global
+dashboard_stream = DashboardStream(
+    tick_seconds=settings.DASHBOARD_STREAM_TICK_MS / 1000,
+    manager=manager,
+    backplane=backplane,
+)
@@ -1,10 +1,34 @@
-from typing import Annotated
+from typing import Annotated, Any, Dict, List
 from fastapi import Depends
+from sqlalchemy import insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from core.config import settings
+from core.db_pool import engine_options
 
-# Motor de conexión a la base de datos
-engine = create_engine(settings.DATABASE_URL, echo=True)
+# Driver async equivalente a cada driver sync de DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+asyncmy",
+}
+
+def async_database_url(url: str) -> str:
+    """Convierte DATABASE_URL (ej. mysql+pymysql://...) a su versión async (mysql+asyncmy://...)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No hay driver async configurado para '{backend}'")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+# Motor de conexión a la base de datos (scripts y rutas sync)
+engine = create_engine(settings.DATABASE_URL, **engine_options("sync"))
+
+# Motor async para las rutas async: no bloquea el event loop de los WebSockets
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL), **engine_options("async", is_async=True)
+)
 
 def create_db_and_tables():
     """Crea todas las tablas definidas en los modelos si no existen."""
@@ -14,12 +38,53 @@ def create_db_and_tables():
     from models.logs import Log
     from models.users import User
     from models.tokens import Token
+    from models.action_rollups import ActionRollup
+    from models.logs_archive import LogArchive
     
 
     SQLModel.metadata.create_all(engine)
 
+    # create_all no agrega índices a tablas existentes: crearlos si faltan
+    for index in [*Log.__table__.indexes, *ActionDevice.__table__.indexes]:
+        try:
+            index.create(engine, checkfirst=True)
+        except Exception as e:
+            print(f"⚠️ No se pudo crear el índice {index.name}: {e}")
+
+def bulk_insert_ids(session: Session, model, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Inserta rows y devuelve los ids en el orden de rows, siempre dentro de la
+    transacción de la sesión. Usar con session.run_sync().
+    - Con RETURNING (SQLite >= 3.35, MariaDB): sort_by_parameter_order hace que
+      SQLAlchemy empareje cada id con su fila.
+    - MySQL no tiene RETURNING: un solo INSERT multi-fila. Es un "simple insert"
+      (InnoDB conoce el número de filas), así que sus ids son consecutivos desde
+      LAST_INSERT_ID() (el id de la primera fila) con paso auto_increment_increment.
+    - SQLite sin RETURNING: la sesión tiene la base bloqueada, los ids son
+      consecutivos y lastrowid es el de la última fila.
+    Si no se necesitan los ids, basta session.execute(insert(table), rows).
+    """
+    if not rows:
+        return []
+    table = model.__table__
+    dialect = session.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        return list(session.execute(stmt, rows).scalars())
+    last_row_id = session.execute(insert(table).values(rows)).lastrowid
+    if dialect.name == "mysql":
+        step = session.execute(text("SELECT @@auto_increment_increment")).scalar()
+        return [last_row_id + i * step for i in range(len(rows))]
+    return list(range(last_row_id - len(rows) + 1, last_row_id + 1))
+
 def get_session():
     """Generador para obtener la sesión de la base de datos."""
     with Session(engine) as session:
         yield session
 
+async def get_async_session():
+    """Sesión async para rutas `async def` (usar `await session.exec(...)`)."""
+    # expire_on_commit=False: tras el commit los atributos se leen sin otra consulta
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
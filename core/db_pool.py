@@ -0,0 +1,98 @@
+# core/db_pool.py
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from core.config import settings
+
+
+class PoolStats:
+    """Contadores de uso de un pool: checkouts, espera para obtener conexión y timeouts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+        }
+
+
+# Estadísticas por nombre de pool ("sync", "async"); sobreviven a pool.recreate()
+pool_stats: Dict[str, PoolStats] = {}
+
+
+class _TimedPoolMixin:
+    """Mide cuánto espera cada checkout a que el pool entregue una conexión."""
+
+    def _do_get(self):
+        stats = pool_stats.setdefault(self._orig_logging_name or "default", PoolStats())
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            stats.record((time.perf_counter() - start) * 1000, timed_out=True)
+            raise
+        stats.record((time.perf_counter() - start) * 1000)
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(name: str, is_async: bool = False) -> Dict[str, Any]:
+    """Argumentos de create_engine / create_async_engine según Settings (perfil DB_PROFILE)."""
+    return {
+        "echo": settings.DB_ECHO,
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_logging_name": name,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def describe_pool(engine) -> Dict[str, Any]:
+    """Estado actual del pool de un motor más sus contadores acumulados."""
+    pool = engine.pool
+    data = {
+        "profile": settings.DB_PROFILE,
+        "pool_class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeout_seconds": settings.DB_POOL_TIMEOUT,
+        "recycle_seconds": settings.DB_POOL_RECYCLE,
+        "pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    stats = pool_stats.get(pool._orig_logging_name or "default")
+    data.update(stats.to_dict() if stats else PoolStats().to_dict())
+    return data
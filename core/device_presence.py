@@ -0,0 +1,234 @@
+# core/device_presence.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket
+from sqlalchemy import update
+from sqlmodel import select
+
+from core.config import settings
+from core.dashboard_stream import dashboard_stream
+from core.database import AsyncSession, async_engine
+from core.websocket_manager import ConnectionManager, manager
+from models.devices import Device
+
+STATUS_ONLINE = "online"
+STATUS_DISCONNECTED = "desconectado"
+# 1001 "Going Away": el dispositivo dejó de responder los pings
+WS_CLOSE_HEARTBEAT_TIMEOUT = 1001
+# Peso de la última medición en el RTT promedio (media móvil exponencial)
+RTT_EWMA_ALPHA = 0.2
+
+
+class _DevicePresence:
+    """Estado de un dispositivo conectado a este worker."""
+
+    def __init__(self, device_id: int, websocket: WebSocket):
+        self.device_id = device_id
+        self.websocket = websocket
+        self.connected_since = datetime.utcnow()
+        self.last_heartbeat = self.connected_since
+        self.last_seen = time.monotonic()
+        self.rtt_ms: Optional[float] = None
+        self.avg_rtt_ms: Optional[float] = None
+        self.ping_seq = 0
+        self.ping_sent_at: Optional[float] = None  # time.monotonic() del último ping sin respuesta
+
+
+class DevicePresence:
+    """
+    Tabla en memoria de los dispositivos conectados por /ws/device/{id}: desde
+    cuándo, último latido y RTT medido con ping/pong.
+
+    Cada DEVICE_HEARTBEAT_SECONDS se envía {"type": "ping", "seq": n} y el firmware
+    responde {"type": "pong", "seq": n}; cualquier mensaje del dispositivo cuenta
+    como latido. Sin latidos durante DEVICE_HEARTBEAT_TIMEOUT_SECONDS se cierra
+    el socket. Los cambios de Device.status no se escriben en cada evento: se
+    acumulan (el último gana) y se guardan cada DEVICE_STATUS_FLUSH_SECONDS con
+    un UPDATE por valor de status.
+    """
+
+    def __init__(self, manager: ConnectionManager, heartbeat_seconds: float, timeout_seconds: float,
+                 flush_seconds: float):
+        self.manager = manager
+        self.heartbeat_seconds = heartbeat_seconds
+        self.timeout_seconds = timeout_seconds
+        self.flush_seconds = flush_seconds
+        self._devices: Dict[int, _DevicePresence] = {}
+        self._pending_status: Dict[int, str] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.transitions = 0
+        self.coalesced = 0
+        self.status_writes = 0
+        self.flushes = 0
+        self.timeouts = 0
+
+    # ---------------------- CICLO DE VIDA ----------------------
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await self.flush()
+
+    # ---------------------- EVENTOS DEL SOCKET ----------------------
+    def connected(self, device_id: int, websocket: WebSocket):
+        self._devices[device_id] = _DevicePresence(device_id, websocket)
+        self._set_status(device_id, STATUS_ONLINE)
+
+    def disconnected(self, device_id: int, websocket: WebSocket):
+        presence = self._devices.get(device_id)
+        # Si ya se reconectó con otro socket, el cierre del viejo no cuenta
+        if presence is None or presence.websocket is not websocket:
+            return
+        del self._devices[device_id]
+        self._set_status(device_id, STATUS_DISCONNECTED)
+
+    def seen(self, device_id: int):
+        presence = self._devices.get(device_id)
+        if presence is not None:
+            presence.last_heartbeat = datetime.utcnow()
+            presence.last_seen = time.monotonic()
+
+    def pong(self, device_id: int, message: Dict[str, Any]):
+        presence = self._devices.get(device_id)
+        if presence is None or presence.ping_sent_at is None or message.get("seq") != presence.ping_seq:
+            return
+        presence.rtt_ms = round((time.monotonic() - presence.ping_sent_at) * 1000, 2)
+        presence.ping_sent_at = None
+        if presence.avg_rtt_ms is None:
+            presence.avg_rtt_ms = presence.rtt_ms
+        else:
+            presence.avg_rtt_ms = round(
+                RTT_EWMA_ALPHA * presence.rtt_ms + (1 - RTT_EWMA_ALPHA) * presence.avg_rtt_ms, 2
+            )
+
+    def _set_status(self, device_id: int, status: str):
+        self.transitions += 1
+        if device_id in self._pending_status:
+            self.coalesced += 1
+        self._pending_status[device_id] = status
+        # El tablero se entera al instante; la base, en el próximo flush
+        dashboard_stream.publish_device_status(device_id, status)
+
+    # ---------------------- LATIDOS ----------------------
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            now = time.monotonic()
+            for presence in list(self._devices.values()):
+                if now - presence.last_seen > self.timeout_seconds:
+                    self.timeouts += 1
+                    print(f"💔 Dispositivo {presence.device_id} sin latidos en {self.timeout_seconds:.0f} s, se desconecta")
+                    self.disconnected(presence.device_id, presence.websocket)
+                    self.manager.close(presence.websocket, WS_CLOSE_HEARTBEAT_TIMEOUT)
+                    continue
+                presence.ping_seq += 1
+                presence.ping_sent_at = now
+                await self.manager.send_json(presence.websocket, {"type": "ping", "seq": presence.ping_seq})
+
+    # ---------------------- ESCRITURA AGRUPADA ----------------------
+    async def flush(self):
+        """Escribe los status acumulados: un UPDATE por valor, no uno por dispositivo."""
+        pending, self._pending_status = self._pending_status, {}
+        by_status: Dict[str, List[int]] = {}
+        for device_id, status in pending.items():
+            # Con varios workers, el dispositivo pudo reconectarse en otro: no pisar su "online"
+            if status == STATUS_DISCONNECTED and self.manager.is_device_connected(device_id):
+                continue
+            by_status.setdefault(status, []).append(device_id)
+        if not by_status:
+            return
+        try:
+            async with AsyncSession(async_engine) as session:
+                now = datetime.utcnow()
+                for status, ids in by_status.items():
+                    await session.execute(
+                        update(Device).where(Device.id.in_(ids)).values(status=status, updated_at=now)
+                    )
+                await session.commit()
+        except Exception as e:
+            print(f"❌ Error guardando el status de {len(pending)} dispositivos: {e}")
+            # Reintentar en el próximo flush, salvo que haya llegado un cambio más nuevo
+            for device_id, status in pending.items():
+                self._pending_status.setdefault(device_id, status)
+            return
+        self.flushes += 1
+        self.status_writes += sum(len(ids) for ids in by_status.values())
+
+    async def _reconcile(self):
+        """
+        Marca desconectados los dispositivos que quedaron "online" en la base (por
+        ejemplo tras un reinicio) y no están conectados a ningún worker.
+        """
+        async with AsyncSession(async_engine) as session:
+            ids = (await session.exec(select(Device.id).where(Device.status == STATUS_ONLINE))).all()
+        stale = [device_id for device_id in ids if not self.manager.is_device_connected(device_id)]
+        for device_id in stale:
+            self._pending_status.setdefault(device_id, STATUS_DISCONNECTED)
+        if stale:
+            print(f"🔌 {len(stale)} dispositivos figuraban online sin conexión, se marcan desconectados")
+
+    async def _flush_loop(self):
+        # Esperar a que los dispositivos se reconecten y los demás workers se anuncien
+        reconcile_at = time.monotonic() + self.timeout_seconds
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                if reconcile_at is not None and time.monotonic() >= reconcile_at:
+                    reconcile_at = None
+                    await self._reconcile()
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Error en la escritura de presencia: {e}")
+
+    # ---------------------- CONSULTA ----------------------
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Presencia de los dispositivos de este worker y de los conectados a otros."""
+        now = datetime.utcnow()
+        rows = [
+            {
+                "device_id": p.device_id,
+                "online": True,
+                "worker": self.manager.backplane.worker_id,
+                "connected_since": p.connected_since,
+                "connected_seconds": round((now - p.connected_since).total_seconds(), 1),
+                "last_heartbeat": p.last_heartbeat,
+                "rtt_ms": p.rtt_ms,
+                "avg_rtt_ms": p.avg_rtt_ms,
+            }
+            for p in self._devices.values()
+        ]
+        for device_id, (worker, _) in list(self.manager.remote_devices.items()):
+            if device_id not in self._devices and self.manager.is_device_connected(device_id):
+                rows.append({"device_id": device_id, "online": True, "worker": worker})
+        return sorted(rows, key=lambda row: row["device_id"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": len(self._devices),
+            "heartbeat_seconds": self.heartbeat_seconds,
+            "timeout_seconds": self.timeout_seconds,
+            "flush_seconds": self.flush_seconds,
+            "pending_status_writes": len(self._pending_status),
+            "transitions": self.transitions,
+            "coalesced": self.coalesced,
+            "status_writes": self.status_writes,
+            "flushes": self.flushes,
+            "timeouts": self.timeouts,
+        }
+
+
+# Instancia global
+device_presence = DevicePresence(
+    manager=manager,
+    heartbeat_seconds=settings.DEVICE_HEARTBEAT_SECONDS,
+    timeout_seconds=settings.DEVICE_HEARTBEAT_TIMEOUT_SECONDS,
+    flush_seconds=settings.DEVICE_STATUS_FLUSH_SECONDS,
+)
@@ -0,0 +1,149 @@
+# core/log_archive.py
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sqlalchemy import union_all
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.database import engine
+from models.logs import Log
+from models.logs_archive import LogArchive
+from models.actions_devices import ActionDevice
+from models.users import User
+from models.devices import Device
+
+PROJECT_DIR = Path(__file__).parent.parent
+STATE_FILE = "_estado.json"
+ARCHIVE_COMPRESSION = "zstd"
+
+ARCHIVE_COLUMNS = [
+    ("id", "int64"), ("timestamp", "timestamp"), ("event", "string"),
+    ("action_type", "string"), ("event_category", "string"),
+    ("id_device", "int64"), ("device_name", "string"),
+    ("id_user", "int64"), ("username", "string"),
+    ("id_action", "int64"), ("action_name", "string"),
+]
+
+
+def archive_dir() -> Path:
+    path = Path(settings.LOG_ARCHIVE_DIR)
+    return path if path.is_absolute() else PROJECT_DIR / path
+
+
+def _archive_schema(pa):
+    types = {"int64": pa.int64(), "string": pa.string(), "timestamp": pa.timestamp("us")}
+    return pa.schema([(name, types[kind]) for name, kind in ARCHIVE_COLUMNS])
+
+
+def read_state() -> Dict[str, Any]:
+    path = archive_dir() / STATE_FILE
+    if not path.exists():
+        return {"last_id": 0, "rows": 0, "files": 0, "updated_at": None}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_state(state: Dict[str, Any]):
+    path = archive_dir() / STATE_FILE
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _archive_source(model, after_id: int):
+    # Solo outer joins: ningún log puede quedar fuera del archivo (ej. confirmaciones sin usuario)
+    return select(
+        model.id, model.timestamp, model.event, model.action_type, model.event_category,
+        model.id_device, Device.name.label("device_name"),
+        model.id_user, User.username,
+        model.id_action, ActionDevice.action.label("action_name"),
+    ).outerjoin(
+        User, model.id_user == User.id
+    ).outerjoin(
+        Device, model.id_device == Device.id
+    ).outerjoin(
+        ActionDevice, model.id_action == ActionDevice.id
+    ).where(model.id > after_id)
+
+
+def _archive_query(after_id: int, limit: int):
+    """
+    Logs con id mayor a after_id de logs y logs_archive: la retención mueve filas
+    conservando su id, así las que se movieron antes de exportarse no se pierden
+    sin importar en qué orden corran retención y exportación.
+    """
+    merged = union_all(_archive_source(Log, after_id), _archive_source(LogArchive, after_id)).subquery()
+    return select(merged).order_by(merged.c.id).limit(limit)
+
+
+def _write_partitions(pa, pq, rows: List[Dict[str, Any]]) -> int:
+    """
+    Escribe un lote en particiones por día: date=AAAA-MM-DD/part-<primer_id>-<último_id>.parquet.
+    El nombre depende solo del rango de ids, así repetir un lote sobrescribe en vez de duplicar.
+    """
+    by_day: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        by_day[row["timestamp"].strftime("%Y-%m-%d")].append(row)
+
+    schema = _archive_schema(pa)
+    for day, day_rows in by_day.items():
+        partition = archive_dir() / f"date={day}"
+        partition.mkdir(parents=True, exist_ok=True)
+        filename = f"part-{day_rows[0]['id']:012d}-{day_rows[-1]['id']:012d}.parquet"
+        table = pa.Table.from_pylist(day_rows, schema=schema)
+        tmp_path = partition / f"{filename}.tmp"
+        pq.write_table(table, tmp_path, compression=ARCHIVE_COMPRESSION)
+        os.replace(tmp_path, partition / filename)
+    return len(by_day)
+
+
+_archive_lock = threading.Lock()
+
+
+def export_logs_archive(batch_size: int = None) -> Dict[str, Any]:
+    """
+    Exporta a Parquet los logs (activos y ya archivados por la retención) con id
+    mayor al último exportado, en lotes de batch_size filas. El estado se guarda
+    después de cada lote, así una ejecución interrumpida continúa donde quedó.
+    """
+    # Import diferido: pyarrow es pesado y solo lo usa el archivo columnar
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    batch_size = batch_size or settings.LOG_ARCHIVE_BATCH_SIZE
+
+    if not _archive_lock.acquire(blocking=False):
+        raise RuntimeError("Ya hay una exportación del archivo en curso")
+    try:
+        archive_dir().mkdir(parents=True, exist_ok=True)
+        state = read_state()
+        exported = 0
+
+        with Session(engine) as session:
+            while True:
+                rows = [
+                    dict(row._mapping)
+                    for row in session.execute(_archive_query(state["last_id"], batch_size))
+                ]
+                if not rows:
+                    break
+                written = _write_partitions(pa, pq, rows)
+                exported += len(rows)
+
+                state.update({
+                    "last_id": rows[-1]["id"],
+                    "rows": state["rows"] + len(rows),
+                    "files": state["files"] + written,
+                    "updated_at": datetime.utcnow().isoformat(),
+                })
+                _write_state(state)
+                print(f"🗄️ Archivo de logs: {exported} filas exportadas (último id {state['last_id']})")
+
+        return {"exported_rows": exported, "directory": str(archive_dir()), **state}
+    finally:
+        _archive_lock.release()
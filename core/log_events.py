@@ -0,0 +1,51 @@
+# core/log_events.py
+from typing import Optional, Tuple
+
+# Categorías de evento guardadas en Log.event_category
+EVENT_CREACION = "creacion"
+EVENT_CONFIRMACION = "confirmacion"
+EVENT_EJECUCION = "ejecucion"
+EVENT_NO_EJECUCION = "no_ejecucion"
+EVENT_LOGIN = "login"
+EVENT_OTRO = "otro"
+
+# Eventos que cuentan como acciones de usuario en los reportes
+USER_ACTION_CATEGORIES = (EVENT_CREACION, EVENT_EJECUCION, EVENT_NO_EJECUCION)
+
+# Prefijos de los eventos que llevan el nombre de la acción entre comillas
+ACTION_EVENT_PREFIXES = ("Acción '", "Dispositivo confirmó ejecución de acción '")
+
+
+def extract_action_from_event(event: str) -> Optional[str]:
+    """
+    Extrae 'MOTOR_IZQ' de "Acción 'MOTOR_IZQ' creada..." o de
+    "Dispositivo confirmó ejecución de acción 'MOTOR_IZQ'".
+    """
+    for prefix in ACTION_EVENT_PREFIXES:
+        if event.startswith(prefix):
+            start = len(prefix)
+            end = event.find("'", start)
+            if end > start:
+                return event[start:end]
+    return None
+
+
+def classify_event(event: str) -> Tuple[Optional[str], str]:
+    """
+    Devuelve (action_type, event_category) a partir del texto de un log antiguo.
+    Solo se usa para migrar datos; los logs nuevos guardan ambos campos al escribirse.
+    """
+    action_type = extract_action_from_event(event)
+    if "creada para dispositivo" in event:
+        category = EVENT_CREACION
+    elif "confirmó ejecución" in event:
+        category = EVENT_CONFIRMACION
+    elif "ejecutada correctamente" in event:
+        category = EVENT_EJECUCION
+    elif "marcada como no ejecutada" in event:
+        category = EVENT_NO_EJECUCION
+    elif "inició sesión" in event:
+        category = EVENT_LOGIN
+    else:
+        category = EVENT_OTRO
+    return action_type, category
@@ -0,0 +1,85 @@
+# core/log_export.py
+import csv
+import io
+import json
+from typing import Any, Dict, Iterator, List
+
+from sqlmodel import Session
+
+from core.database import engine
+from core.log_queries import build_action_logs_query
+from models.logs import Log
+from models.actions_devices import ActionDevice
+from models.users import User
+from models.devices import Device
+
+# Filas que el driver trae por viaje (cursor del lado del servidor)
+EXPORT_FETCH_BATCH = 1000
+
+EXPORT_FIELDS = [
+    "id", "timestamp", "event", "action_type", "event_category",
+    "id_device", "device_name", "id_user", "username", "id_action", "action_name",
+]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def build_export_query(filters: Dict[str, Any]):
+    """
+    Mismos filtros que /reports/action-logs, pero solo columnas planas (sin objetos ORM).
+    Historial completo: outer joins, así las confirmaciones sin usuario también salen.
+    """
+    return build_action_logs_query(
+        filters.get("start_date"), filters.get("end_date"), filters.get("device_id"),
+        filters.get("user_id"), filters.get("action_type"), filters.get("event_type"),
+        outer_joins=True,
+    ).with_only_columns(
+        Log.id, Log.timestamp, Log.event, Log.action_type, Log.event_category,
+        Log.id_device, Device.name.label("device_name"),
+        Log.id_user, User.username,
+        Log.id_action, ActionDevice.action.label("action_name"),
+    )
+
+
+def iter_export_batches(filters: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Recorre los logs filtrados en lotes de EXPORT_FETCH_BATCH filas con un cursor
+    del lado del servidor: nunca se materializa el resultado completo.
+    """
+    query = build_export_query(filters).order_by(Log.timestamp.desc(), Log.id.desc())
+    with Session(engine) as session:
+        result = session.exec(query.execution_options(yield_per=EXPORT_FETCH_BATCH))
+        for partition in result.partitions():
+            yield [dict(row._mapping) for row in partition]
+
+
+def stream_logs_csv(filters: Dict[str, Any]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for batch in iter_export_batches(filters):
+        for row in batch:
+            row["timestamp"] = row["timestamp"].isoformat()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_logs_ndjson(filters: Dict[str, Any]) -> Iterator[str]:
+    for batch in iter_export_batches(filters):
+        yield "".join(
+            json.dumps(row, default=lambda value: value.isoformat(), ensure_ascii=False) + "\n"
+            for row in batch
+        )
+
+
+EXPORT_STREAMS = {
+    "csv": stream_logs_csv,
+    "ndjson": stream_logs_ndjson,
+}
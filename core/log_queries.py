@@ -0,0 +1,55 @@
+# core/log_queries.py
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlmodel import select
+
+from models.logs import Log
+from models.actions_devices import ActionDevice
+from models.users import User
+from models.devices import Device
+
+
+def build_action_logs_query(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    action_type: Optional[str] = None,
+    event_type: Optional[str] = None,
+    outer_joins: bool = False,
+):
+    """
+    Consulta base de logs de acciones (con usuario, dispositivo y acción) y los
+    filtros comunes de /reports/action-logs y de las exportaciones. Sin ORDER BY.
+    Con outer_joins=True no se pierde ningún log: las confirmaciones del IoT
+    (sin usuario) salen con username en None, como en el archivo columnar.
+    """
+    query = select(
+        Log,
+        User.username,
+        Device.name.label("device_name"),
+        ActionDevice.action.label("action_name")
+    ).join(
+        User, Log.id_user == User.id, isouter=outer_joins
+    ).join(
+        Device, Log.id_device == Device.id, isouter=outer_joins
+    ).outerjoin(
+        ActionDevice, Log.id_action == ActionDevice.id
+    )
+
+    if start_date:
+        query = query.where(Log.timestamp >= start_date)
+    if end_date:
+        # Añadir 1 día para incluir el día completo
+        end_date_with_time = end_date + timedelta(days=1)
+        query = query.where(Log.timestamp < end_date_with_time)
+    if device_id:
+        query = query.where(Log.id_device == device_id)
+    if user_id:
+        query = query.where(Log.id_user == user_id)
+    if action_type:
+        query = query.where(Log.action_type == action_type)
+    if event_type:
+        query = query.where(Log.event_category == event_type)
+
+    return query
@@ -0,0 +1,77 @@
+# core/pagination.py
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Hashable, Tuple
+
+from fastapi import HTTPException, status
+from sqlmodel import or_, and_
+
+from core.config import settings
+
+
+# ---------------------- CURSOR (timestamp, id) ----------------------
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Codifica la posición (timestamp, id) del último registro como cursor opaco."""
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+
+def keyset_condition(timestamp_col, id_col, cursor: str):
+    """
+    Condición "después del cursor" para ORDER BY timestamp DESC, id DESC.
+    Permite buscar directamente en el índice en lugar de saltar OFFSET filas.
+    """
+    timestamp, row_id = decode_cursor(cursor)
+    return and_(
+        # Rango redundante pero "sargable": el motor puede buscar en el índice por timestamp
+        timestamp_col <= timestamp,
+        or_(timestamp_col < timestamp, and_(timestamp_col == timestamp, id_col < row_id)),
+    )
+
+
+# ---------------------- CONTEO CACHEADO ----------------------
+class CountCache:
+    """
+    Caché corta de COUNT(*) por combinación de filtros.
+    En modo cursor el total es aproximado (puede tener hasta ttl_seconds de retraso).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Devuelve (total, exacto). exacto=False si el valor viene de la caché."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0], False
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value, True
+
+
+# Instancia global
+count_cache = CountCache(ttl_seconds=settings.COUNT_CACHE_TTL_SECONDS)
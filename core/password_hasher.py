@@ -0,0 +1,94 @@
+# core/password_hasher.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.security import hash_password, verify_password
+
+
+class PasswordHasher:
+    """
+    Ejecuta bcrypt (100-300 ms de CPU por operación) en un pool de hilos propio y
+    acotado. bcrypt libera el GIL, así que el event loop y los WebSockets de los
+    dispositivos siguen respondiendo durante una ráfaga de logins. Si la cola
+    supera max_queue se responde 503 en lugar de acumular esperas sin límite.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.queued = 0       # Enviadas y aún sin hilo
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _tracked(self, func: Callable, *args) -> Callable[[], Any]:
+        submitted = time.perf_counter()
+
+        def _job():
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.total_wait_ms += (started - submitted) * 1000
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.total_run_ms += (time.perf_counter() - started) * 1000
+
+        return _job
+
+    def _submit(self, func: Callable, *args):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servidor ocupado verificando credenciales, intente de nuevo"
+                )
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        return self._executor.submit(self._tracked(func, *args))
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(hash_password, password))
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self._submit(verify_password, plain_password, hashed_password))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "max_queue_depth": self.max_queue_depth,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait_ms / self.completed, 2) if self.completed else 0.0,
+                "avg_run_ms": round(self.total_run_ms / self.completed, 2) if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Instancia global
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
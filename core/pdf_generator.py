@@ -1,21 +1,144 @@
 
 import os
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional
 from core.time_utils import format_colombia_time  
-# core/pdf_generator.py - función corregida
-def generate_logs_pdf(data: List[Dict[str, Any]], filename: str, filters: Dict[str, Any]):
+
+# Filas por tabla: cada bloque ocupa ~una página, así ReportLab nunca mide una tabla gigante
+ROWS_PER_TABLE = 40
+
+TABLE_HEADER = ['Fecha/Hora (Colombia)', 'Acción', 'Evento', 'Usuario', 'Dispositivo']
+TABLE_COL_WIDTHS = [1.5*inch, 1.0*inch, 2.8*inch, 1.0*inch, 1.2*inch]
+TABLE_STYLE = TableStyle([
+    # Estilo para encabezados
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    
+    # Estilo para filas de datos
+    ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F8F9FA')]),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+
+class _StreamingDocTemplate(BaseDocTemplate):
+    """
+    Documento de una sola plantilla que se maqueta a medida que llegan los
+    flowables de un iterable: el mismo ciclo de BaseDocTemplate.build()
+    (clean_hanging + handle_flowable), pero la cola se rellena desde el
+    generador. En memoria solo vive la tabla que se está maquetando.
+    """
+
+    def __init__(self, filename: str, on_page, **kwargs):
+        super().__init__(filename, **kwargs)
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='Reporte', frames=frame, onPage=on_page, pagesize=self.pagesize)])
+
+    def build_stream(self, flowables: Iterable[Any]):
+        source = iter(flowables)
+        pending: List[Any] = []
+        self._startBuild()
+        self.canv._doctemplate = self
+        try:
+            while True:
+                if not pending:
+                    nxt = next(source, None)
+                    if nxt is None:
+                        break
+                    pending.append(nxt)
+                self.clean_hanging()
+                self.handle_flowable(pending)
+        finally:
+            del self.canv._doctemplate
+        self._endBuild()
+
+
+def _table_row(item: Dict[str, Any]) -> List[Any]:
+    # ✅ CORREGIR: Manejar diferentes formatos de timestamp
+    if isinstance(item['timestamp'], str):
+        # Si es string, convertir a datetime
+        original_timestamp = datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00'))
+    else:
+        # Si ya es datetime
+        original_timestamp = item['timestamp']
+    
+    colombia_time = format_colombia_time(original_timestamp, "%Y-%m-%d %H:%M:%S")
+    
+    # Acortar evento si es muy largo
+    event = item['event']
+    if len(event) > 60:
+        event = event[:57] + '...'
+    
+    return [
+        colombia_time,  # ✅ HORA COLOMBIA
+        item['action'] or 'N/A',
+        event,
+        item['username'],
+        item['device_name']
+    ]
+
+
+def _table_chunks(rows: Iterator[Dict[str, Any]], counter: List[int]) -> Iterator[Table]:
+    """Convierte las filas en tablas de ROWS_PER_TABLE filas, con encabezado repetido."""
+    while True:
+        chunk = list(islice(rows, ROWS_PER_TABLE))
+        if not chunk:
+            return
+        table_data = [TABLE_HEADER]
+        for item in chunk:
+            try:
+                table_data.append(_table_row(item))
+            except Exception as e:
+                print(f"⚠️ Error procesando item: {e}")
+                continue  # Saltar este item y continuar
+        counter[0] += len(table_data) - 1
+        if len(table_data) == 1:
+            continue
+        table = Table(table_data, colWidths=TABLE_COL_WIDTHS, repeatRows=1)
+        table.setStyle(TABLE_STYLE)
+        yield table
+
+
+def _draw_footer(canvas, doc):
+    """Pie de página en cada página con su número real."""
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.drawRightString(
+        doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2,
+        f"Generado por Sistema IoT Control - Hora Colombia - Página {doc.page}"
+    )
+    canvas.restoreState()
+
+
+def generate_logs_pdf(data: Iterable[Dict[str, Any]], filename: str, filters: Dict[str, Any],
+                      total: Optional[int] = None, on_progress: Optional[Callable[[int], None]] = None) -> bool:
     """
     Genera un PDF profesional con tabla para los logs de acciones en hora Colombia.
+
+    `data` puede ser una lista o un generador: las filas se consumen en bloques de
+    ROWS_PER_TABLE, así la memoria no crece con el tamaño del reporte. Con un
+    generador, `total` es el número de registros que se muestra en el encabezado.
+    `on_progress(filas)` se llama cada vez que se termina de maquetar un bloque.
     """
     try:
         # Crear documento
-        doc = SimpleDocTemplate(filename, pagesize=A4, topMargin=30, bottomMargin=30)
+        doc = _StreamingDocTemplate(filename, on_page=_draw_footer, pagesize=A4, topMargin=30, bottomMargin=30)
         story = []
         styles = getSampleStyleSheet()
         
@@ -46,7 +169,7 @@ def generate_logs_pdf(data: List[Dict[str, Any]], filename: str, filters: Dict[s
         colombia_now = format_colombia_time(datetime.utcnow(), "%d/%m/%Y %H:%M:%S")
         report_info = [
             f"<b>Fecha de generación:</b> {colombia_now} (Hora Colombia)",
-            f"<b>Total de registros:</b> {len(data)}"
+            f"<b>Total de registros:</b> {total if total is not None else len(data)}"
         ]
         
         # ✅ CORREGIR: Manejar fechas correctamente
@@ -81,86 +204,31 @@ def generate_logs_pdf(data: List[Dict[str, Any]], filename: str, filters: Dict[s
         story.append(info_para)
         story.append(Spacer(1, 25))
         
-        # Tabla de datos si hay registros
-        if data:
-            # Encabezados de tabla
-            table_data = [['Fecha/Hora (Colombia)', 'Acción', 'Evento', 'Usuario', 'Dispositivo']]
-            
-            # Llenar datos de la tabla CON HORA COLOMBIA
-            for item in data:
-                try:
-                    # ✅ CORREGIR: Manejar diferentes formatos de timestamp
-                    if isinstance(item['timestamp'], str):
-                        # Si es string, convertir a datetime
-                        original_timestamp = datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00'))
-                    else:
-                        # Si ya es datetime
-                        original_timestamp = item['timestamp']
-                    
-                    colombia_time = format_colombia_time(original_timestamp, "%Y-%m-%d %H:%M:%S")
-                    
-                    # Acortar evento si es muy largo
-                    event = item['event']
-                    if len(event) > 60:
-                        event = event[:57] + '...'
-                    
-                    table_data.append([
-                        colombia_time,  # ✅ HORA COLOMBIA
-                        item['action'] or 'N/A',
-                        event,
-                        item['username'],
-                        item['device_name']
-                    ])
-                except Exception as e:
-                    print(f"⚠️ Error procesando item: {e}")
-                    continue  # Saltar este item y continuar
-            
-            # Crear tabla
-            table = Table(table_data, colWidths=[1.5*inch, 1.0*inch, 2.8*inch, 1.0*inch, 1.2*inch])
-            table.setStyle(TableStyle([
-                # Estilo para encabezados
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                
-                # Estilo para filas de datos
-                ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F8F9FA')]),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ]))
-            
-            story.append(table)
-        else:
-            # Mensaje cuando no hay datos
-            no_data_style = ParagraphStyle(
-                'NoData',
-                parent=styles['Heading2'],
-                fontSize=14,
-                textColor=colors.red,
-                alignment=1,
-                spaceBefore=50
-            )
-            no_data = Paragraph("No se encontraron registros con los filtros aplicados", no_data_style)
-            story.append(no_data)
-        
-        # Pie de página CON HORA COLOMBIA
-        story.append(Spacer(1, 20))
-        footer_text = f"Generado por Sistema IoT Control - Hora Colombia - Página 1"
-        footer = Paragraph(footer_text, ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=2))
-        story.append(footer)
-        
+        # Tablas de datos por bloques, consumidas mientras se maqueta
+        rendered = [0]
+        tables = _table_chunks(iter(data), rendered)
+
+        def _tail():
+            for table in tables:
+                yield table
+                # El documento pidió el siguiente flowable: la tabla anterior ya está maquetada
+                if on_progress:
+                    on_progress(rendered[0])
+            if not rendered[0]:
+                # Mensaje cuando no hay datos
+                no_data_style = ParagraphStyle(
+                    'NoData',
+                    parent=styles['Heading2'],
+                    fontSize=14,
+                    textColor=colors.red,
+                    alignment=1,
+                    spaceBefore=50
+                )
+                yield Paragraph("No se encontraron registros con los filtros aplicados", no_data_style)
+
         # Generar PDF
-        doc.build(story)
-        print(f"✅ PDF generado exitosamente: {filename}")
+        doc.build_stream(chain(story, _tail()))
+        print(f"✅ PDF generado exitosamente: {filename} ({rendered[0]} registros)")
         return True
         
     except Exception as e:
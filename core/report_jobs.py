@@ -0,0 +1,437 @@
+# core/report_jobs.py
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlmodel import Session, func, select
+from starlette.concurrency import run_in_threadpool
+
+from core.backplane import Backplane, backplane
+from core.config import settings
+from core.database import AsyncSession, async_engine, engine
+from core.log_queries import build_action_logs_query
+from core.pdf_generator import generate_logs_pdf
+from models.logs import Log
+
+REPORTS_DIR = Path(__file__).parent.parent / "static" / "reports"
+REPORT_PREFIX = "action_logs_report_"
+CACHE_KEY_LENGTH = 24
+# Solo los PDFs de la caché: action_logs_report_<hash>_<registros>.pdf. Los demás
+# archivos de static/reports (p. ej. reportes versionados en git) no se tocan.
+CACHED_REPORT_RE = re.compile(rf"^{REPORT_PREFIX}([0-9a-f]{{{CACHE_KEY_LENGTH}}})_(\d+)\.pdf$")
+ROW_FETCH_BATCH = 500
+# Cada cuánto el worker escribe su avance y el servidor lo lee
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+# Estados de un trabajo
+JOB_PENDIENTE = "pendiente"
+JOB_CONSULTANDO = "consultando"
+JOB_RENDERIZANDO = "renderizando"
+JOB_COMPLETADO = "completado"
+JOB_ERROR = "error"
+ACTIVE_STATES = (JOB_PENDIENTE, JOB_CONSULTANDO, JOB_RENDERIZANDO)
+
+
+def _report_query(filters: Dict[str, Any]):
+    query = build_action_logs_query(
+        filters.get("start_date"), filters.get("end_date"), filters.get("device_id"),
+        filters.get("user_id"), filters.get("action_type"), filters.get("event_type"),
+    )
+    # Foto fija del reporte: conteo, render y clave de caché cubren los mismos logs
+    if filters.get("max_log_id") is not None:
+        query = query.where(Log.id <= filters["max_log_id"])
+    return query
+
+
+async def fetch_max_log_id(filters: Dict[str, Any]) -> int:
+    """Mayor id de log que cubre el reporte: cambia solo si entran logs nuevos que coinciden."""
+    async with AsyncSession(async_engine) as session:
+        result = await session.execute(_report_query(filters).with_only_columns(func.max(Log.id)))
+        return result.scalar() or 0
+
+
+def report_cache_key(filters: Dict[str, Any], max_log_id: int) -> str:
+    """Hash de los filtros normalizados + el último log cubierto."""
+    normalized = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in sorted(filters.items())
+        if value is not None
+    }
+    raw = json.dumps([normalized, max_log_id], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:CACHE_KEY_LENGTH]
+
+
+def cached_report_files() -> Iterator[Tuple[Path, str, int]]:
+    """(ruta, cache_key, registros) de cada PDF de la caché."""
+    if not REPORTS_DIR.exists():
+        return
+    for path in REPORTS_DIR.glob(f"{REPORT_PREFIX}*.pdf"):
+        match = CACHED_REPORT_RE.match(path.name)
+        if match:
+            yield path, match.group(1), int(match.group(2))
+
+
+def find_cached_report(cache_key: str) -> Optional[Tuple[Path, int]]:
+    """PDF ya generado para cache_key y su número de registros (va en el nombre)."""
+    for path in REPORTS_DIR.glob(f"{REPORT_PREFIX}{cache_key}_*.pdf"):
+        match = CACHED_REPORT_RE.match(path.name)
+        if match:
+            return path, int(match.group(2))
+    return None
+
+
+def count_pdf_rows(filters: Dict[str, Any]) -> int:
+    """Registros que tendrá el reporte (para el encabezado, antes de renderizar)."""
+    query = _report_query(filters)
+    if filters.get("limit"):
+        query = query.limit(filters["limit"])
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(query.subquery())).one()
+
+
+def iter_pdf_rows(session: Session, filters: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Recorre el reporte con cursor del lado del servidor, ROW_FETCH_BATCH filas a la vez."""
+    query = _report_query(filters).order_by(Log.timestamp.desc())
+    if filters.get("limit"):
+        query = query.limit(filters["limit"])
+
+    for log, username, device_name, action_name in session.exec(
+        query.execution_options(yield_per=ROW_FETCH_BATCH)
+    ):
+        yield {
+            "timestamp": log.timestamp,  # Mantener timestamp original
+            "event": log.event,
+            "action": log.action_type or action_name or "N/A",
+            "username": username,
+            "device_name": device_name,
+        }
+        session.expunge(log)  # No acumular objetos en el identity map
+
+
+def _progress_path(path: str) -> str:
+    return f"{path}.progress"
+
+
+def read_progress(path: str) -> Optional[int]:
+    """Filas ya maquetadas según el archivo de avance del worker (None si aún no hay)."""
+    try:
+        with open(_progress_path(path), encoding="utf-8") as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def render_report(filters: Dict[str, Any], path: str, total: int) -> bool:
+    """
+    Corre en el proceso del pool: consulta y renderiza por bloques sin cargar el
+    reporte completo en memoria ni copiarlo entre procesos. El avance (filas
+    maquetadas) se deja en <path>.progress, que el servidor lee mientras espera.
+    """
+    # El proceso "spawn" no pasa por main: registrar los modelos de las relaciones
+    from models.tokens import Token  # noqa: F401
+
+    progress_path = _progress_path(path)
+    last_write = [0.0]
+
+    def _write_progress(rows: int):
+        now = time.monotonic()
+        if now - last_write[0] < PROGRESS_INTERVAL_SECONDS:
+            return
+        last_write[0] = now
+        tmp = f"{progress_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(rows))
+        os.replace(tmp, progress_path)  # El lector nunca ve un número a medias
+
+    try:
+        with Session(engine) as session:
+            return generate_logs_pdf(iter_pdf_rows(session, filters), path, filters, total=total,
+                                     on_progress=_write_progress)
+    finally:
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+
+
+class ReportJob:
+    def __init__(self, filters: Dict[str, Any], cache_key: str):
+        self.id = uuid.uuid4().hex
+        self.filters = filters
+        self.cache_key = cache_key
+        self.cached = False
+        self.status = JOB_PENDIENTE
+        self.progress = 0
+        self.rows_rendered = 0
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.filename: Optional[str] = None
+        self.records_exported: Optional[int] = None
+        self.file_size: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "rows_rendered": self.rows_rendered,
+            "rows_total": self.records_exported,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+            "cached": self.cached,
+        }
+        if self.status == JOB_COMPLETADO:
+            data.update({
+                "message": "PDF generado exitosamente",
+                "filename": self.filename,
+                "filepath": f"/static/reports/{self.filename}",
+                "file_url": f"/static/reports/{self.filename}",
+                "records_exported": self.records_exported,
+                "generated_at": self.finished_at.isoformat(),
+                "file_size": self.file_size,
+                "timezone": "Hora Colombia (UTC-5)",
+            })
+        return data
+
+
+class ReportJobManager:
+    """
+    Cola de reportes PDF. La consulta corre en el threadpool y el render de
+    ReportLab en un pool de procesos acotado, así el event loop (y los WebSockets
+    de los dispositivos) nunca se bloquean mientras se genera un reporte.
+
+    Los archivos se nombran por hash de filtros + último log cubierto (más el
+    número de registros, que así sobrevive a un reinicio): una petición
+    idéntica reutiliza el PDF existente (o el trabajo en curso).
+
+    Con varios workers, el trabajo corre en el que recibió la petición y cada
+    cambio de estado se publica en el backplane: GET /reports/jobs/{id} responde
+    desde cualquier worker.
+    """
+
+    def __init__(self, workers: int, max_concurrent: int, max_pending: int,
+                 cache_max_bytes: int, cache_max_age_seconds: float, backplane: Backplane,
+                 keep_finished: int = 200):
+        self.workers = workers
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_max_age_seconds = cache_max_age_seconds
+        self.keep_finished = keep_finished
+        self.backplane = backplane
+        self._jobs: "OrderedDict[str, ReportJob]" = OrderedDict()
+        self._remote_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # Estado de trabajos de otros workers
+        self._inflight: Dict[str, ReportJob] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.evicted_files = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        backplane.on("report_job", self._on_remote_job)
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None  # Sin procesos: render en el threadpool
+        if self._pool is None:
+            # "spawn": los hijos no heredan conexiones ni hilos del servidor
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def submit(self, filters: Dict[str, Any]) -> ReportJob:
+        max_log_id = await fetch_max_log_id(filters)
+        cache_key = report_cache_key(filters, max_log_id)
+        # Los logs que entren después no se cuelan en el archivo de esta clave
+        filters = {**filters, "max_log_id": max_log_id}
+
+        # Mismo reporte ya generándose: compartir el trabajo
+        if cache_key in self._inflight:
+            self.cache_hits += 1
+            return self._inflight[cache_key]
+
+        # Mismo reporte ya generado: reutilizar el archivo
+        cached = find_cached_report(cache_key)
+        if cached is not None:
+            filepath, records = cached
+            self.cache_hits += 1
+            os.utime(filepath)  # Marca de uso reciente para el desalojo
+            job = ReportJob(filters, cache_key)
+            job.cached = True
+            job.filename = filepath.name
+            job.file_size = f"{filepath.stat().st_size / 1024:.1f} KB"
+            job.records_exported = job.rows_rendered = records
+            job.status, job.progress = JOB_COMPLETADO, 100
+            job.finished_at = datetime.now()
+            self._register(job)
+            return job
+
+        active = sum(1 for job in self._jobs.values() if job.status in ACTIVE_STATES)
+        if active >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Hay demasiados reportes en cola, intente más tarde"
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        self.cache_misses += 1
+        job = ReportJob(filters, cache_key)
+        self._register(job)
+        self._inflight[cache_key] = job
+        asyncio.create_task(self._run(job))
+        return job
+
+    def _register(self, job: ReportJob):
+        self._jobs[job.id] = job
+        self._prune()
+        self._publish(job)
+
+    def _publish(self, job: ReportJob):
+        self.backplane.publish_nowait({"kind": "report_job", "job": job.to_dict()})
+
+    async def _on_remote_job(self, message: Dict[str, Any]):
+        data = message["job"]
+        self._remote_jobs[data["job_id"]] = data
+        self._remote_jobs.move_to_end(data["job_id"])
+        while len(self._remote_jobs) > self.keep_finished:
+            self._remote_jobs.popitem(last=False)
+
+    def get_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado del trabajo, sea de este worker o de otro."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self._remote_jobs.get(job_id)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATES]
+        for job_id in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job_id]
+
+    async def _run(self, job: ReportJob):
+        # Se escribe en un temporal y se renombra: nunca se sirve un PDF a medias
+        tmp_path = REPORTS_DIR / f"{REPORT_PREFIX}{job.cache_key}.{job.id[:8]}.tmp"
+
+        async with self._semaphore:
+            try:
+                REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+                job.status = JOB_CONSULTANDO
+                self._publish(job)
+                job.records_exported = await run_in_threadpool(count_pdf_rows, job.filters)
+
+                job.status = JOB_RENDERIZANDO
+                self._publish(job)
+                loop = asyncio.get_running_loop()
+                render = loop.run_in_executor(
+                    self._get_pool(), render_report, job.filters, str(tmp_path), job.records_exported
+                )
+                # Avance real: filas maquetadas por el worker sobre el total contado
+                while not render.done():
+                    await asyncio.wait([render], timeout=PROGRESS_INTERVAL_SECONDS)
+                    self._update_progress(job, read_progress(str(tmp_path)))
+                success = render.result()
+                if not success or not tmp_path.exists():
+                    raise RuntimeError("El archivo PDF no se pudo crear")
+                filename = f"{REPORT_PREFIX}{job.cache_key}_{job.records_exported}.pdf"
+                filepath = REPORTS_DIR / filename
+                os.replace(tmp_path, filepath)
+
+                job.filename = filename
+                job.file_size = f"{filepath.stat().st_size / 1024:.1f} KB"
+                job.rows_rendered = job.records_exported
+                job.status, job.progress = JOB_COMPLETADO, 100
+                print(f"✅ Reporte {job.id} generado: {filepath}")
+
+            except Exception as e:
+                job.status, job.error = JOB_ERROR, str(e)
+                print(f"❌ Error en reporte {job.id}: {e}")
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            finally:
+                job.finished_at = datetime.now()
+                self._inflight.pop(job.cache_key, None)
+                self._publish(job)
+
+        await run_in_threadpool(self.evict)
+
+    def _update_progress(self, job: ReportJob, rows: Optional[int]):
+        if rows is None or rows == job.rows_rendered:
+            return
+        job.rows_rendered = rows
+        # 99 como tope: el 100 llega cuando el archivo ya está en su lugar
+        job.progress = min(99, rows * 100 // job.records_exported) if job.records_exported else 99
+        self._publish(job)
+
+    # ---------------------- DESALOJO ----------------------
+    def evict(self):
+        """
+        Borra reportes más viejos que cache_max_age_seconds y, si el directorio
+        sigue superando cache_max_bytes, los usados hace más tiempo primero.
+        """
+        files = []
+        for path, cache_key, _ in cached_report_files():
+            if cache_key in self._inflight:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        now = time.time()
+        files.sort()  # Menos usados primero
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            expired = now - mtime > self.cache_max_age_seconds
+            if not expired and total <= self.cache_max_bytes:
+                break
+            try:
+                path.unlink()
+                self.evicted_files += 1
+                total -= size
+                print(f"🧹 Reporte desalojado: {path.name}")
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        files = [path for path, _, _ in cached_report_files()]
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_ratio": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "evicted_files": self.evicted_files,
+            "files": len(files),
+            "bytes": sum(f.stat().st_size for f in files),
+            "max_bytes": self.cache_max_bytes,
+            "max_age_seconds": self.cache_max_age_seconds,
+            "active_jobs": sum(1 for job in self._jobs.values() if job.status in ACTIVE_STATES),
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Instancia global
+report_jobs = ReportJobManager(
+    workers=settings.REPORT_WORKERS,
+    max_concurrent=settings.REPORT_MAX_CONCURRENT,
+    max_pending=settings.REPORT_MAX_PENDING,
+    cache_max_bytes=settings.REPORT_CACHE_MAX_MB * 1024 * 1024,
+    cache_max_age_seconds=settings.REPORT_CACHE_MAX_AGE_HOURS * 3600,
+    backplane=backplane,
+)
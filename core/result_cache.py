@@ -0,0 +1,109 @@
+# core/result_cache.py
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable
+
+
+class ResultCache:
+    """
+    Caché por proceso de resultados calculados (ej. estadísticas del dashboard).
+
+    - Dentro de ttl_seconds se sirve el valor guardado sin tocar la DB.
+    - Con stale_seconds > 0 (stale-while-revalidate) un valor vencido se sigue
+      sirviendo ese tiempo extra mientras un hilo lo recalcula en segundo plano.
+    - Solo un cálculo por clave a la vez: N pestañas = 1 consulta por intervalo.
+    - Al guardar una clave nueva se borran las vencidas (y sus locks): claves
+      que cambian con el tiempo, como la del día, no se acumulan.
+    """
+
+    def __init__(self, ttl_seconds: float, stale_seconds: float = 0):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: Dict[Hashable, tuple] = {}  # key → (valor, calculado_en)
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._refreshing: set = set()
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def _lock_for(self, key: Hashable) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < self.ttl_seconds:
+                self.hits += 1
+                return entry[0]
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                self._refresh_in_background(key, compute)
+                return entry[0]
+
+        with self._lock_for(key):
+            # Otro hilo pudo calcularlo mientras esperábamos el lock
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            value = compute()
+            self._store(key, value)
+            return value
+
+    def _store(self, key: Hashable, value: Any):
+        is_new = key not in self._entries
+        self._entries[key] = (value, time.monotonic())
+        if is_new:
+            self._prune(keep=key)
+
+    def _prune(self, keep: Hashable):
+        """Borra las entradas que ya no se servirían ni como stale."""
+        max_age = self.ttl_seconds + self.stale_seconds
+        now = time.monotonic()
+        with self._guard:
+            for key, (_, computed_at) in list(self._entries.items()):
+                if key == keep or key in self._refreshing or now - computed_at < max_age:
+                    continue
+                self._entries.pop(key, None)
+                lock = self._locks.get(key)
+                if lock is not None and not lock.locked():
+                    del self._locks[key]
+
+    def _refresh_in_background(self, key: Hashable, compute: Callable[[], Any]):
+        with self._guard:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _refresh():
+            try:
+                with self._lock_for(key):
+                    self._store(key, compute())
+            except Exception as e:
+                print(f"⚠️ Error recalculando caché '{key}': {e}")
+            finally:
+                with self._guard:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_refresh, daemon=True).start()
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is not None and not lock.locked():
+                del self._locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,109 @@
+# core/retention.py
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, insert, literal
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from core.database import engine
+from models.logs import Log
+from models.logs_archive import LogArchive
+
+ARCHIVED_COLUMNS = ["id", "event", "id_device", "id_user", "id_action", "action_type", "event_category", "timestamp"]
+
+# Última ejecución (para /health/log-retention)
+retention_status: Dict[str, Any] = {"last_run": None, "last_moved": 0, "total_moved": 0, "running": False}
+# Solo evita dos ejecuciones en el mismo proceso; entre workers coordina la base (ver _move_batch)
+_retention_lock = threading.Lock()
+
+
+def _move_batch(session: Session, cutoff: datetime, batch_size: int) -> int:
+    """
+    Copia un lote de logs viejos a logs_archive y los borra de logs, en una transacción corta.
+    Las filas del lote quedan bloqueadas (FOR UPDATE SKIP LOCKED) hasta el commit:
+    si otro worker corre la retención a la vez, toma el lote siguiente en lugar
+    de copiar las mismas filas y chocar con la clave primaria de logs_archive.
+    SQLite ignora la cláusula, pero ahí las escrituras ya son de a una y el
+    INSERT ... SELECT vuelve a leer logs, así que no copia filas ya movidas.
+    """
+    ids = session.exec(
+        select(Log.id)
+        .where(Log.timestamp < cutoff)
+        .order_by(Log.timestamp)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        return 0
+
+    now = datetime.utcnow()
+    session.execute(
+        insert(LogArchive).from_select(
+            ARCHIVED_COLUMNS + ["archived_at"],
+            select(*[getattr(Log, column) for column in ARCHIVED_COLUMNS], literal(now)).where(Log.id.in_(ids)),
+        )
+    )
+    moved = session.execute(delete(Log).where(Log.id.in_(ids))).rowcount
+    session.commit()
+    # Filas que este worker movió de verdad (otro pudo haberse llevado parte del lote)
+    return moved
+
+
+def apply_log_retention(
+    retention_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> int:
+    """
+    Mueve a logs_archive los logs con más de retention_days días, por lotes de
+    batch_size filas con una pausa entre lotes, para no retener bloqueos largos
+    sobre la tabla viva. Los rollups (action_rollups) no se tocan: los conteos
+    históricos se mantienen. Devuelve el número de logs movidos.
+    """
+    retention_days = retention_days if retention_days is not None else settings.LOG_RETENTION_DAYS
+    batch_size = batch_size or settings.LOG_RETENTION_BATCH_SIZE
+    if retention_days <= 0:
+        return 0
+    if not _retention_lock.acquire(blocking=False):
+        print("⚠️ Retención de logs ya en curso, se omite esta ejecución")
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    moved = batches = 0
+    retention_status["running"] = True
+    try:
+        with Session(engine) as session:
+            while max_batches is None or batches < max_batches:
+                count = _move_batch(session, cutoff, batch_size)
+                if not count:
+                    break
+                moved += count
+                batches += 1
+                time.sleep(settings.LOG_RETENTION_PAUSE_MS / 1000)
+    finally:
+        retention_status.update({
+            "last_run": datetime.utcnow().isoformat(),
+            "last_moved": moved,
+            "total_moved": retention_status["total_moved"] + moved,
+            "running": False,
+        })
+        _retention_lock.release()
+
+    if moved:
+        print(f"🗄️ Retención: {moved} logs anteriores a {cutoff:%Y-%m-%d} movidos a logs_archive")
+    return moved
+
+
+async def retention_loop():
+    """Tarea de fondo: aplica la retención cada LOG_RETENTION_INTERVAL_MINUTES."""
+    while True:
+        try:
+            await run_in_threadpool(apply_log_retention)
+        except Exception as e:
+            print(f"❌ Error aplicando retención de logs: {e}")
+        await asyncio.sleep(settings.LOG_RETENTION_INTERVAL_MINUTES * 60)
@@ -0,0 +1,124 @@
+# core/rollups.py
+from datetime import datetime
+from typing import Dict, Tuple
+from sqlalchemy import update, delete, func, insert, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from models.action_rollups import ActionRollup
+from models.logs import Log
+from models.logs_archive import LogArchive
+from core.log_events import EVENT_CREACION, EVENT_CONFIRMACION, classify_event
+
+# Logs que suman al rollup: los mismos que escriben record_action_event (crear y confirmar)
+ROLLUP_CATEGORIES = (EVENT_CREACION, EVENT_CONFIRMACION)
+HOUR_FORMAT = "%Y-%m-%d %H:00:00"
+LEGACY_BATCH_SIZE = 5000
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    """Trunca un timestamp al inicio de su hora."""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def hour_bucket_sql(column, dialect_name: str):
+    """hour_bucket() en SQL: texto 'YYYY-MM-DD HH:00:00' (SQLite y MySQL)."""
+    if dialect_name == "mysql":
+        return func.date_format(column, HOUR_FORMAT)
+    return func.strftime(HOUR_FORMAT, column)
+
+
+def record_action_event(session: Session, id_device: int, action: str, timestamp: datetime, count: int = 1):
+    """
+    Incrementa en count el rollup (dispositivo, acción, hora) dentro de la transacción actual.
+    El commit lo hace quien escribe el log, así log y rollup quedan consistentes.
+    """
+    bucket = hour_bucket(timestamp)
+    increment = (
+        update(ActionRollup)
+        .where(
+            ActionRollup.id_device == id_device,
+            ActionRollup.action == action,
+            ActionRollup.bucket == bucket,
+        )
+        .values(count=ActionRollup.count + count)
+    )
+    if session.execute(increment).rowcount:
+        return
+
+    try:
+        with session.begin_nested():
+            session.add(ActionRollup(id_device=id_device, action=action, bucket=bucket, count=count))
+    except IntegrityError:
+        # Otra petición creó la fila en paralelo: solo incrementar
+        session.execute(increment)
+
+
+def record_action_events(session: Session, counts: Dict[Tuple[int, str], int], timestamp: datetime):
+    """Un incremento por (dispositivo, acción) para un lote de acciones creadas juntas."""
+    for (id_device, action), count in counts.items():
+        record_action_event(session, id_device, action, timestamp, count)
+
+
+def _legacy_counts(session: Session, model, counts: Dict[Tuple[int, str, datetime], int]):
+    """
+    Suma a counts los logs sin event_category (escritos antes de las columnas
+    estructuradas y aún sin migrar): se clasifican por el texto del evento, por
+    lotes de id. Después de migrar_logs_estructurados.py no queda ninguno.
+    """
+    last_id = 0
+    while True:
+        rows = session.exec(
+            select(model.id, model.id_device, model.event, model.timestamp)
+            .where(model.id > last_id, model.event_category == None)
+            .order_by(model.id)
+            .limit(LEGACY_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        for _, id_device, event, timestamp in rows:
+            action, category = classify_event(event)
+            if action and category in ROLLUP_CATEGORIES:
+                key = (id_device, action, hour_bucket(timestamp))
+                counts[key] = counts.get(key, 0) + 1
+        last_id = rows[-1][0]
+
+
+def rebuild_action_rollups(session: Session) -> int:
+    """
+    Recalcula la tabla action_rollups desde cero a partir de los logs existentes,
+    incluidos los ya movidos a logs_archive por la retención.
+    La base agrupa por las columnas action_type / event_category (índices, sin
+    leer el texto del evento): solo viaja una fila por (dispositivo, acción, hora).
+    Los logs viejos sin event_category se cuentan aparte desde su texto.
+    """
+    dialect_name = session.get_bind().dialect.name
+    sources = [
+        select(
+            model.id_device.label("id_device"),
+            model.action_type.label("action"),
+            hour_bucket_sql(model.timestamp, dialect_name).label("bucket"),
+        ).where(model.action_type != None, model.event_category.in_(ROLLUP_CATEGORIES))
+        for model in (LogArchive, Log)
+    ]
+    logs = union_all(*sources).subquery()
+    grouped = session.execute(
+        select(logs.c.id_device, logs.c.action, logs.c.bucket, func.count())
+        .group_by(logs.c.id_device, logs.c.action, logs.c.bucket)
+    ).all()
+
+    counts: Dict[Tuple[int, str, datetime], int] = {
+        (id_device, action, datetime.fromisoformat(str(bucket))): count
+        for id_device, action, bucket, count in grouped
+    }
+    for model in (LogArchive, Log):
+        _legacy_counts(session, model, counts)
+
+    session.execute(delete(ActionRollup))
+    if counts:
+        session.execute(insert(ActionRollup), [
+            {"id_device": id_device, "action": action, "bucket": bucket, "count": count}
+            for (id_device, action, bucket), count in counts.items()
+        ])
+    session.commit()
+    return len(counts)
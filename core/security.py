@@ -4,9 +4,12 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlmodel import select, Session
 import bcrypt
+import hashlib
+import uuid
 
 from core.config import settings
 from core.database import get_session
+from core.auth_cache import auth_cache
 from models.users import User
 from models.tokens import Token as DBToken
 
@@ -25,28 +28,45 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 # ---------------------- JWT TOKEN ----------------------
 def create_access_token(data: dict):
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    data.update({"exp": expire})
+    # jti: dos logins del mismo usuario en el mismo segundo no deben dar el mismo token (token_hash es único)
+    data.update({"exp": expire, "jti": uuid.uuid4().hex})
     token = jwt.encode(data, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return token, expire
 
 
+def token_digest(token: str) -> str:
+    """Huella SHA-256 del JWT: es lo único que se guarda y se busca en la tabla tokens."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
 def decode_token(token: str = Depends(outh2_scheme), session: Session = Depends(get_session)):
+    return verify_token(token, session)
+
+
+def verify_token(token: str, session: Session) -> User:
+    """Valida el JWT y que siga activo en la DB. Usado también por los WebSockets."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username = payload.get("username")
         if username is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
 
+        # ⚡ Token ya verificado recientemente: sin consultas a la DB
+        cached_user = auth_cache.get(token)
+        if cached_user is not None:
+            return cached_user
+
         user = session.exec(select(User).where(User.username == username)).first()
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
 
         db_token = session.exec(
-            select(DBToken).where(DBToken.token == token, DBToken.status_token == True)
+            select(DBToken).where(DBToken.token_hash == token_digest(token), DBToken.status_token == True)
         ).first()
         if not db_token:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inactivo o inválido")
 
+        auth_cache.set(token, user, payload.get("exp"))
         return user
 
     except JWTError:
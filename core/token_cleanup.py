@@ -0,0 +1,77 @@
+# core/token_cleanup.py
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from core.database import engine
+from models.tokens import Token
+
+# Última ejecución (para /health/token-sweep)
+token_sweep_status: Dict[str, Any] = {"last_run": None, "last_deleted": 0, "total_deleted": 0, "running": False}
+_sweep_lock = threading.Lock()
+
+
+def _delete_batch(session: Session, condition, batch_size: int) -> int:
+    """Borra un lote de tokens que cumplen condition, en una transacción corta."""
+    ids = session.exec(select(Token.id).where(condition).limit(batch_size)).all()
+    if not ids:
+        return 0
+    session.execute(delete(Token).where(Token.id.in_(ids)))
+    session.commit()
+    return len(ids)
+
+
+def sweep_tokens(batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> int:
+    """
+    Borra por lotes los tokens vencidos (índice de expiration) y los revocados por
+    logout (índice de status_token). Un JWT vencido ya no pasa jwt.decode, así que
+    su fila solo ocupaba espacio. Devuelve el número de tokens borrados.
+    """
+    batch_size = batch_size or settings.TOKEN_SWEEP_BATCH_SIZE
+    if not _sweep_lock.acquire(blocking=False):
+        print("⚠️ Limpieza de tokens ya en curso, se omite esta ejecución")
+        return 0
+
+    now = datetime.utcnow()
+    deleted = batches = 0
+    token_sweep_status["running"] = True
+    try:
+        with Session(engine) as session:
+            # Dos condiciones por separado: un OR impediría usar cada índice
+            for condition in (Token.expiration < now, Token.status_token == False):
+                while max_batches is None or batches < max_batches:
+                    count = _delete_batch(session, condition, batch_size)
+                    if not count:
+                        break
+                    deleted += count
+                    batches += 1
+                    time.sleep(settings.TOKEN_SWEEP_PAUSE_MS / 1000)
+    finally:
+        token_sweep_status.update({
+            "last_run": datetime.utcnow().isoformat(),
+            "last_deleted": deleted,
+            "total_deleted": token_sweep_status["total_deleted"] + deleted,
+            "running": False,
+        })
+        _sweep_lock.release()
+
+    if deleted:
+        print(f"🧹 Limpieza de tokens: {deleted} tokens vencidos o revocados borrados")
+    return deleted
+
+
+async def token_sweep_loop():
+    """Tarea de fondo: limpia la tabla tokens cada TOKEN_SWEEP_INTERVAL_MINUTES."""
+    while True:
+        try:
+            await run_in_threadpool(sweep_tokens)
+        except Exception as e:
+            print(f"❌ Error limpiando tokens: {e}")
+        await asyncio.sleep(settings.TOKEN_SWEEP_INTERVAL_MINUTES * 60)
@@ -1,52 +1,395 @@
 from fastapi import WebSocket
-from typing import List, Dict, Any
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+import asyncio
+import itertools
 import json
+import time
+
+from core.backplane import Backplane, backplane
+from core.config import settings
+
+try:
+    import orjson  # Opcional: codifica varias veces más rápido que json
+except ImportError:
+    orjson = None
+
+# Política cuando la cola de salida de un socket está llena
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DISCONNECT = "disconnect"
+SLOW_CONSUMER_POLICIES = (POLICY_DROP_OLDEST, POLICY_DISCONNECT)
+# 1013 "Try Again Later": el cliente puede reconectarse cuando se ponga al día
+WS_CLOSE_SLOW_CONSUMER = 1013
+
+# Temas de suscripción: además de estos, "device:{id}" y "user:{id}"
+TOPIC_LOGS = "logs"
+TOPIC_DASHBOARD = "dashboard"
+TOPIC_DEVICES = "devices"  # Todos los sockets de dispositivos (se suscriben solos)
+
+
+def device_topic(device_id: int) -> str:
+    return f"device:{device_id}"
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """
+    Codifica un mensaje a texto JSON (con orjson si está instalado). Quien envía
+    lo mismo a varios sockets codifica una vez y reparte el mismo str.
+    """
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(message)
+
+
+class _Connection:
+    """Un socket registrado con su cola de salida y la tarea que la vacía."""
+
+    def __init__(self, conn_id: int, websocket: WebSocket, queue_size: int):
+        self.id = conn_id
+        self.websocket = websocket
+        self.device_id: Optional[int] = None
+        self.topics: Set[str] = set()
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.device_connections: Dict[int, WebSocket] = {}  # 🔹 Dispositivos conectados
+    """
+    Registro de WebSockets (dispositivos y clientes) en diccionarios por id de conexión.
+
+    Cada socket tiene una cola de salida acotada que vacía su propia tarea escritora:
+    enviar o hacer broadcast solo encola, así un navegador lento o un ESP32 medio
+    caído no frena la entrega a los demás. Si la cola se llena se aplica
+    WS_SLOW_CONSUMER_POLICY: descartar el frame más viejo o desconectar el socket.
+
+    Los clientes se suscriben a temas y el índice tema → conexiones hace que
+    publicar en un tema solo recorra a sus suscriptores, no a todos los sockets.
+
+    Con varios workers de uvicorn cada uno tiene sus propios sockets: los broadcasts
+    y los mensajes a dispositivos conectados a otro worker viajan por el backplane.
+    Cada worker anuncia sus dispositivos cada BACKPLANE_PRESENCE_SECONDS y al
+    conectarse o desconectarse uno; sin anuncios durante tres periodos se olvidan.
+    """
+
+    def __init__(self, queue_size: int, slow_consumer_policy: str, send_timeout_seconds: float,
+                 backplane: Backplane, presence_seconds: float):
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"WS_SLOW_CONSUMER_POLICY debe ser uno de {SLOW_CONSUMER_POLICIES}")
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout_seconds = send_timeout_seconds
+        self.backplane = backplane
+        self.presence_seconds = presence_seconds
+        self._ids = itertools.count(1)
+        self.connections: Dict[int, _Connection] = {}
+        self._by_socket: Dict[WebSocket, _Connection] = {}
+        self.device_connections: Dict[int, int] = {}  # 🔹 Dispositivo → id de conexión
+        self.remote_devices: Dict[int, Tuple[str, float]] = {}  # 🔹 Dispositivo → (worker, último anuncio)
+        self.topics: Dict[str, Set[int]] = {}  # 🔹 Tema → ids de conexión suscritas
+        self._presence_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.topic_messages = 0
+        self.topic_frames = 0
+        self.remote_sent = 0
+        self.remote_received = 0
+        self.frames_queued = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
+        backplane.on("ws_device", self._on_remote_device)
+        backplane.on("ws_broadcast", self._on_remote_broadcast)
+        backplane.on("ws_topic", self._on_remote_topic)
+        backplane.on("ws_presence", self._on_remote_presence)
+        backplane.on("ws_presence_request", self._on_presence_request)
+
+    # ---------------------- CICLO DE VIDA ----------------------
+    async def start(self):
+        """Pide a los demás workers sus dispositivos y empieza a anunciar los propios."""
+        self._loop = asyncio.get_running_loop()
+        if self.backplane.distributed:
+            await self.backplane.publish({"kind": "ws_presence_request"})
+            self._presence_task = asyncio.create_task(self._presence_loop())
+
+    def shutdown(self):
+        if self._presence_task is not None:
+            self._presence_task.cancel()
 
-    async def connect(self, websocket: WebSocket):
+    # ---------------------- REGISTRO ----------------------
+    async def connect(self, websocket: WebSocket) -> int:
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"✅ Nueva conexión ({len(self.active_connections)} activas)")
+        conn = _Connection(next(self._ids), websocket, self.queue_size)
+        self.connections[conn.id] = conn
+        self._by_socket[websocket] = conn
+        conn.writer = asyncio.create_task(self._writer(conn))
+        print(f"✅ Nueva conexión ({len(self.connections)} activas)")
+        return conn.id
+
+    def register_device(self, device_id: int, websocket: WebSocket):
+        conn = self._by_socket.get(websocket)
+        if conn is not None:
+            conn.device_id = device_id
+            self.device_connections[device_id] = conn.id
+            self.subscribe(websocket, [TOPIC_DEVICES])
+            self._announce()
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"❌ Conexión cerrada ({len(self.active_connections)} restantes)")
+        conn = self._by_socket.pop(websocket, None)
+        if conn is None:
+            return
+        conn.closed = True
+        self.connections.pop(conn.id, None)
+        self._remove_from_topics(conn, list(conn.topics))
+        # Solo si el dispositivo no se reconectó ya con otro socket
+        if conn.device_id is not None and self.device_connections.get(conn.device_id) == conn.id:
+            self.device_connections.pop(conn.device_id, None)
+            self._announce()
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+        print(f"❌ Conexión cerrada ({len(self.connections)} restantes)")
+
+    # ---------------------- TEMAS ----------------------
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        """Suscribe el socket a los temas. Devuelve todos sus temas actuales."""
+        conn = self._by_socket.get(websocket)
+        if conn is None:
+            return []
+        for topic in topics:
+            conn.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(conn.id)
+        return sorted(conn.topics)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        conn = self._by_socket.get(websocket)
+        if conn is None:
+            return []
+        self._remove_from_topics(conn, topics)
+        return sorted(conn.topics)
+
+    def subscriptions(self, websocket: WebSocket) -> List[str]:
+        conn = self._by_socket.get(websocket)
+        return sorted(conn.topics) if conn is not None else []
+
+    def _remove_from_topics(self, conn: _Connection, topics: Iterable[str]):
+        for topic in topics:
+            conn.topics.discard(topic)
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(conn.id)
+                if not subscribers:
+                    del self.topics[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self.topics
 
-    async def send_json(self, websocket: WebSocket, message: Dict[str, Any]):
+    def _fan_out(self, topics: Iterable[str], text: str):
+        # Unión de suscriptores: un socket suscrito a varios de los temas recibe una sola copia
+        conn_ids: Set[int] = set()
+        for topic in topics:
+            conn_ids |= self.topics.get(topic, set())
+        self.topic_messages += 1
+        for conn_id in conn_ids:
+            conn = self.connections.get(conn_id)
+            if conn is not None and self._enqueue(conn, text):
+                self.topic_frames += 1
+
+    async def publish_json(self, topics: Iterable[str], message: Dict[str, Any]):
+        """Publica en los temas, en este worker y en los demás."""
+        topics = list(topics)
+        text = encode_message(message)
+        self._fan_out(topics, text)
+        await self.backplane.publish({"kind": "ws_topic", "topics": topics, "text": text})
+
+    def publish_local(self, topics: Iterable[str], message: Dict[str, Any]):
+        """
+        Publica solo en los suscriptores de este worker (para eventos que ya se
+        replican por el backplane). Se puede llamar desde rutas sync.
+        """
+        topics = [topic for topic in topics if topic in self.topics]
+        if not topics:
+            return
+        text = encode_message(message)
         try:
-            await websocket.send_text(json.dumps(message))
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is None or running is self._loop:
+            self._fan_out(topics, text)
+        else:
+            self._loop.call_soon_threadsafe(self._fan_out, topics, text)
+
+    # ---------------------- COLA DE SALIDA ----------------------
+    def _enqueue(self, conn: _Connection, text: str) -> bool:
+        if conn.closed:
+            return False
+        if conn.queue.full():
+            if self.slow_consumer_policy == POLICY_DROP_OLDEST:
+                conn.queue.get_nowait()
+                conn.dropped += 1
+                self.frames_dropped += 1
+            else:
+                self.slow_disconnects += 1
+                print(f"🐢 Conexión {conn.id} no consume sus mensajes, se desconecta")
+                self._close(conn, WS_CLOSE_SLOW_CONSUMER)
+                return False
+        conn.queue.put_nowait(text)
+        self.frames_queued += 1
+        return True
+
+    def close(self, websocket: WebSocket, code: int):
+        """Desregistra el socket y lo cierra con el código dado."""
+        conn = self._by_socket.get(websocket)
+        if conn is not None:
+            self._close(conn, code)
+
+    def _close(self, conn: _Connection, code: int):
+        self.disconnect(conn.websocket)
+        asyncio.create_task(self._close_socket(conn.websocket, code))
+
+    @staticmethod
+    async def _close_socket(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass  # Ya estaba cerrado
+
+    async def _writer(self, conn: _Connection):
+        try:
+            while True:
+                text = await conn.queue.get()
+                await asyncio.wait_for(conn.websocket.send_text(text), self.send_timeout_seconds)
+                conn.sent += 1
+                self.frames_sent += 1
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"[Error al enviar mensaje WS] {e}")
+            # Error o envío atascado más de WS_SEND_TIMEOUT_SECONDS: el socket no sirve
+            print(f"[Error envío WS] conexión {conn.id}: {e!r}")
+            self.send_errors += 1
+            self._close(conn, WS_CLOSE_SLOW_CONSUMER)
+
+    # ---------------------- ENVÍO ----------------------
+    async def send_json(self, websocket: WebSocket, message: Dict[str, Any]) -> bool:
+        """Encola un mensaje para un socket. Devuelve False si el socket ya no está activo."""
+        conn = self._by_socket.get(websocket)
+        if conn is None:
+            print("[Error al enviar mensaje WS] Conexión no registrada")
+            return False
+        return self._enqueue(conn, encode_message(message))
 
     async def broadcast_json(self, message: Dict[str, Any]):
-        disconnected = []
-        for ws in self.active_connections:
-            try:
-                await ws.send_text(json.dumps(message))
-            except Exception as e:
-                print(f"[Error envío WS] {e}")
-                disconnected.append(ws)
-        for ws in disconnected:
-            self.disconnect(ws)
-
-
-    async def send_to_device(self, device_id: int, message: Dict[str, Any]):
-        """Envia mensaje solo a un dispositivo específico"""
-        ws = self.device_connections.get(device_id)
-        if ws:
-            try:
-                await self.send_json(ws, message)
-                print(f"✅ Mensaje enviado al dispositivo {device_id}")
-            except Exception as e:
-                print(f"❌ Error enviando al dispositivo {device_id}: {e}")
-                self.device_connections.pop(device_id, None)
-        else:
-            print(f"⚠️ No hay conexión activa para el dispositivo {device_id}")
+        # Una sola codificación: todas las colas (y los demás workers) comparten el mismo str
+        text = encode_message(message)
+        self.broadcast_text(text)
+        await self.backplane.publish({"kind": "ws_broadcast", "text": text})
+
+    def broadcast_text(self, text: str):
+        """Encola un frame ya codificado en todas las conexiones."""
+        for conn in list(self.connections.values()):
+            self._enqueue(conn, text)
+
+    async def send_to_device(self, device_id: int, message: Dict[str, Any]) -> bool:
+        """Encola un mensaje solo para un dispositivo específico. Devuelve False si no se pudo."""
+        conn = self.connections.get(self.device_connections.get(device_id))
+        if conn is None:
+            worker = self._remote_worker(device_id)
+            if worker is None:
+                print(f"⚠️ No hay conexión activa para el dispositivo {device_id}")
+                return False
+            await self.backplane.publish({"kind": "ws_device", "device_id": device_id, "text": encode_message(message)})
+            self.remote_sent += 1
+            print(f"🔀 Mensaje para el dispositivo {device_id} enviado al worker {worker}")
+            return True
+        if self._enqueue(conn, encode_message(message)):
+            print(f"✅ Mensaje encolado para el dispositivo {device_id}")
+            return True
+        print(f"❌ Error enviando al dispositivo {device_id}")
+        return False
+
+    # ---------------------- OTROS WORKERS ----------------------
+    def _remote_worker(self, device_id: int) -> Optional[str]:
+        entry = self.remote_devices.get(device_id)
+        if entry is None or time.monotonic() - entry[1] > self.presence_seconds * 3:
+            return None
+        return entry[0]
+
+    def is_device_connected(self, device_id: int) -> bool:
+        """True si el dispositivo está conectado a este worker o a otro."""
+        return device_id in self.device_connections or self._remote_worker(device_id) is not None
+
+    def _announce(self):
+        self.backplane.publish_nowait({"kind": "ws_presence", "devices": list(self.device_connections)})
+
+    async def _presence_loop(self):
+        while True:
+            await asyncio.sleep(self.presence_seconds)
+            self._announce()
+            expired = [d for d in self.remote_devices if self._remote_worker(d) is None]
+            for device_id in expired:
+                self.remote_devices.pop(device_id, None)
+
+    async def _on_remote_presence(self, message: Dict[str, Any]):
+        # Cada anuncio trae la lista completa del worker: reemplaza la anterior
+        worker = message["origin"]
+        for device_id in [d for d, (w, _) in self.remote_devices.items() if w == worker]:
+            self.remote_devices.pop(device_id, None)
+        now = time.monotonic()
+        for device_id in message["devices"]:
+            self.remote_devices[device_id] = (worker, now)
+
+    async def _on_presence_request(self, message: Dict[str, Any]):
+        self._announce()
+
+    async def _on_remote_device(self, message: Dict[str, Any]):
+        conn = self.connections.get(self.device_connections.get(message["device_id"]))
+        if conn is None:
+            print(f"⚠️ Mensaje de otro worker para el dispositivo {message['device_id']}, que no está aquí")
+            return
+        if self._enqueue(conn, message["text"]):
+            self.remote_received += 1
+
+    async def _on_remote_broadcast(self, message: Dict[str, Any]):
+        self.broadcast_text(message["text"])
+
+    async def _on_remote_topic(self, message: Dict[str, Any]):
+        self._fan_out(message["topics"], message["text"])
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [conn.queue.qsize() for conn in self.connections.values()]
+        return {
+            "connections": len(self.connections),
+            "devices": len(self.device_connections),
+            "remote_devices": sum(1 for d in self.remote_devices if self._remote_worker(d) is not None),
+            "remote_sent": self.remote_sent,
+            "remote_received": self.remote_received,
+            "topics": {topic: len(subscribers) for topic, subscribers in self.topics.items()},
+            "topic_messages": self.topic_messages,
+            "topic_frames": self.topic_frames,
+            "queue_size": self.queue_size,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "send_timeout_seconds": self.send_timeout_seconds,
+            "encoder": "orjson" if orjson is not None else "json",
+            "queued_now": sum(depths),
+            "max_queue_depth_now": max(depths, default=0),
+            "frames_queued": self.frames_queued,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "send_errors": self.send_errors,
+        }
+
 
 # Instancia global
-manager = ConnectionManager()
+manager = ConnectionManager(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    slow_consumer_policy=settings.WS_SLOW_CONSUMER_POLICY,
+    send_timeout_seconds=settings.WS_SEND_TIMEOUT_SECONDS,
+    backplane=backplane,
+    presence_seconds=settings.BACKPLANE_PRESENCE_SECONDS,
+)
@@ -0,0 +1,23 @@
+# exportar_logs_columnar.py
+"""
+Exporta los logs (con nombres de usuario, dispositivo y acción) a archivos
+Parquet particionados por día en LOG_ARCHIVE_DIR. Es incremental: cada
+ejecución continúa desde el último id exportado.
+
+Uso: python exportar_logs_columnar.py
+"""
+from core.database import create_db_and_tables
+from core.log_archive import export_logs_archive
+
+def exportar_logs_columnar():
+    create_db_and_tables()
+    try:
+        result = export_logs_archive()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    print(f"✅ {result['exported_rows']} logs nuevos exportados a {result['directory']} "
+          f"(total {result['rows']}, último id {result['last_id']})")
+
+if __name__ == "__main__":
+    exportar_logs_columnar()
@@ -5,8 +5,18 @@ import os
 from pathlib import Path
 
 # Importar routers
-from routers import auth, users, devices, actions, logs, reports, health, ws_device
-from core.database import create_db_and_tables 
+from routers import auth, users, devices, actions, logs, reports, health, ws_device, ws_dashboard
+from core.database import create_db_and_tables, async_engine
+from core.report_jobs import report_jobs
+from core.password_hasher import password_hasher
+from core.config import settings
+from core.retention import retention_loop
+from core.token_cleanup import token_sweep_loop
+from core.action_dispatcher import action_dispatcher
+from core.backplane import backplane
+from core.websocket_manager import manager
+from core.device_presence import device_presence
+import asyncio
 
 # Crear instancia de la app
 app = FastAPI(
@@ -53,6 +63,59 @@ def startup():
     print("✅ Tablas verificadas.")
     print("✅ Servidor de archivos estáticos configurado")
 
+retention_task = None
+token_sweep_task = None
+
+@app.on_event("startup")
+async def start_log_retention():
+    """Inicia la retención periódica de logs si LOG_RETENTION_DAYS > 0."""
+    global retention_task
+    if settings.LOG_RETENTION_DAYS > 0:
+        retention_task = asyncio.create_task(retention_loop())
+        print(f"✅ Retención de logs activa: {settings.LOG_RETENTION_DAYS} días")
+
+@app.on_event("startup")
+async def start_backplane():
+    """Conecta el bus entre workers (BACKPLANE_URL) y anuncia los dispositivos de este worker."""
+    await backplane.start()
+    await manager.start()
+
+@app.on_event("startup")
+async def start_device_presence():
+    """Inicia los pings a dispositivos y la escritura agrupada de su status."""
+    device_presence.start()
+
+@app.on_event("startup")
+async def start_action_dispatcher():
+    """Recupera las acciones sin confirmar e inicia los reintentos."""
+    await action_dispatcher.start()
+
+@app.on_event("startup")
+async def start_token_sweep():
+    """Inicia la limpieza periódica de tokens vencidos o revocados."""
+    global token_sweep_task
+    if settings.TOKEN_SWEEP_INTERVAL_MINUTES > 0:
+        token_sweep_task = asyncio.create_task(token_sweep_loop())
+        print(f"✅ Limpieza de tokens cada {settings.TOKEN_SWEEP_INTERVAL_MINUTES} min")
+
+# --- Evento de Cierre ---
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Detiene los pools de reportes PDF y de bcrypt, las tareas periódicas, el backplane
+    y el motor async. Antes guarda los status de dispositivos pendientes.
+    """
+    report_jobs.shutdown()
+    password_hasher.shutdown()
+    action_dispatcher.shutdown()
+    await device_presence.shutdown()
+    manager.shutdown()
+    await backplane.close()
+    for task in (retention_task, token_sweep_task):
+        if task is not None:
+            task.cancel()
+    await async_engine.dispose()
+
 # Registrar routers
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -62,6 +125,7 @@ app.include_router(logs.router)
 app.include_router(reports.router)
 app.include_router(health.router)
 app.include_router(ws_device.router)
+app.include_router(ws_dashboard.router)
 
 # Ruta raíz
 @app.get("/")
@@ -0,0 +1,147 @@
+# medir_broadcast_serializacion.py
+"""
+Micro-benchmark: costo de serializar un broadcast de WebSocket con 10, 100 y
+1000 conexiones.
+
+Compara codificar el mensaje una vez por destinatario (como antes) con
+codificarlo una sola vez y compartir el mismo str entre todas las colas
+(core/websocket_manager.encode_message, con orjson si está instalado). Al final
+mide el broadcast_json real del ConnectionManager y verifica que codifica una
+sola vez por broadcast. No abre sockets ni toca la base de datos.
+
+Uso: python medir_broadcast_serializacion.py [broadcasts_por_medicion]
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "medir-broadcast")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import core.websocket_manager as ws_manager
+from core.backplane import InMemoryBackplane
+from core.websocket_manager import ConnectionManager, _Connection
+
+CONEXIONES = (10, 100, 1000)
+BROADCASTS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+REPETICIONES = 5
+
+
+def mensaje_log(i: int) -> dict:
+    """Un mensaje como el que publica el tablero al crearse un log."""
+    return {
+        "type": "log_created",
+        "log": {
+            "id": i,
+            "id_device": 7,
+            "id_user": 3,
+            "event": "Acción ejecutada",
+            "action": "ROTATE_RIGHT",
+            "timestamp": "2026-10-17T12:00:00.123456",
+            "details": {"steps": 2048, "speed": 12, "source": "dashboard"},
+        },
+        "counters": {"total_logs": 10_000 + i, "devices_online": 42},
+    }
+
+
+def por_broadcast_us(funcion, conexiones: int) -> float:
+    """Mediana (de REPETICIONES) del tiempo por broadcast, en microsegundos."""
+    muestras = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        for i in range(BROADCASTS):
+            funcion(mensaje_log(i), conexiones)
+        muestras.append((time.perf_counter() - inicio) / BROADCASTS * 1_000_000)
+    return statistics.median(muestras)
+
+
+def por_destinatario(message: dict, conexiones: int):
+    # Antes: json.dumps dentro del bucle de envío, una vez por socket
+    for _ in range(conexiones):
+        json.dumps(message)
+
+
+def una_vez_json(message: dict, conexiones: int):
+    text = json.dumps(message)
+    for _ in range(conexiones):
+        _ = text
+
+
+def una_vez_encoder(message: dict, conexiones: int):
+    text = ws_manager.encode_message(message)
+    for _ in range(conexiones):
+        _ = text
+
+
+class _SocketFalso:
+    async def send_text(self, text: str):
+        pass
+
+
+async def medir_manager(conexiones: int) -> tuple:
+    """broadcast_json real: codificar + encolar en cada conexión. Devuelve (µs, codificaciones)."""
+    manager = ConnectionManager(queue_size=BROADCASTS + 1, slow_consumer_policy="drop_oldest", send_timeout_seconds=10,
+                                backplane=InMemoryBackplane(), presence_seconds=10)
+    for conn_id in range(1, conexiones + 1):
+        conn = _Connection(conn_id, _SocketFalso(), manager.queue_size)
+        manager.connections[conn_id] = conn
+        manager._by_socket[conn.websocket] = conn
+
+    original = ws_manager.encode_message
+    llamadas = 0
+
+    def contar(message):
+        nonlocal llamadas
+        llamadas += 1
+        return original(message)
+
+    ws_manager.encode_message = contar
+    muestras = []
+    try:
+        for _ in range(REPETICIONES):
+            inicio = time.perf_counter()
+            for i in range(BROADCASTS):
+                await manager.broadcast_json(mensaje_log(i))
+            muestras.append((time.perf_counter() - inicio) / BROADCASTS * 1_000_000)
+            for conn in manager.connections.values():
+                while not conn.queue.empty():
+                    conn.queue.get_nowait()
+    finally:
+        ws_manager.encode_message = original
+
+    # Todas las colas deben guardar el mismo objeto str, no copias
+    await manager.broadcast_json(mensaje_log(0))
+    frames = {id(conn.queue.get_nowait()) for conn in manager.connections.values()}
+    assert len(frames) == 1, f"{len(frames)} frames distintos para un mismo broadcast"
+    return statistics.median(muestras), llamadas / (REPETICIONES * BROADCASTS)
+
+
+def medir():
+    encoder = "orjson" if ws_manager.orjson is not None else "json"
+    tamano = len(ws_manager.encode_message(mensaje_log(0)))
+    print(f"📦 Mensaje de {tamano} bytes, {BROADCASTS} broadcasts x {REPETICIONES} repeticiones, encoder {encoder}")
+    print(f"{'conexiones':>10} | {'json por socket':>15} | {'json una vez':>12} | "
+          f"{encoder + ' una vez':>13} | {'broadcast_json':>14} | codif./broadcast")
+
+    fallas = []
+    for conexiones in CONEXIONES:
+        antes = por_broadcast_us(por_destinatario, conexiones)
+        json_una = por_broadcast_us(una_vez_json, conexiones)
+        encoder_una = por_broadcast_us(una_vez_encoder, conexiones)
+        real, codificaciones = asyncio.run(medir_manager(conexiones))
+        print(f"{conexiones:>10} | {antes:>12.1f} µs | {json_una:>9.1f} µs | "
+              f"{encoder_una:>10.1f} µs | {real:>11.1f} µs | {codificaciones:.0f}")
+        if codificaciones != 1:
+            fallas.append(f"{conexiones} conexiones: {codificaciones} codificaciones por broadcast")
+
+    if fallas:
+        print("❌ broadcast_json codifica más de una vez: " + "; ".join(fallas))
+        sys.exit(1)
+    print("✅ broadcast_json codifica una sola vez por broadcast, sin importar las conexiones")
+
+
+if __name__ == "__main__":
+    medir()
@@ -0,0 +1,127 @@
+# medir_busqueda_tokens.py
+"""
+Mide la latencia de la búsqueda de tokens de verify_token (por token_hash, con
+índice único) mientras la tabla tokens crece hasta millones de filas, y la
+compara con la misma búsqueda sin índice (como era con el JWT completo).
+
+Al final marca un 20 % de los tokens como vencidos y mide la limpieza por lotes
+de core/token_cleanup.py. Usa una base SQLite temporal; nunca toca la DATABASE_URL real.
+
+Uso: python medir_busqueda_tokens.py [filas_maximas]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="tokens_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'tokens.db')}"
+os.environ.setdefault("SECRET_KEY", "medir-tokens")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ["DB_ECHO"] = "false"
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from core.database import engine, create_db_and_tables
+from core.security import token_digest
+from core.token_cleanup import sweep_tokens
+from models.tokens import Token
+from models.users import User
+
+FILAS_MAXIMAS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+TAMANOS = [n for n in (10_000, 100_000, 1_000_000, 2_000_000, 5_000_000) if n <= FILAS_MAXIMAS]
+BUSQUEDAS = 500
+BUSQUEDAS_SIN_INDICE = 10
+LOTE_INSERCION = 100_000
+# La p95 con índice en la tabla más grande no debe superar este múltiplo de la más chica
+MAX_CRECIMIENTO = 3.0
+
+
+def insertar_tokens(desde: int, hasta: int):
+    """Inserta tokens sintéticos (id desde+1..hasta) con SQL directo, por lotes."""
+    ahora = datetime.utcnow()
+    vence = (ahora + timedelta(days=1)).isoformat(" ")
+    creado = ahora.isoformat(" ")
+    raw = engine.raw_connection()
+    try:
+        for inicio in range(desde, hasta, LOTE_INSERCION):
+            fin = min(inicio + LOTE_INSERCION, hasta)
+            raw.cursor().executemany(
+                "INSERT INTO tokens (id, id_user, token_hash, status_token, date_token, expiration) "
+                "VALUES (?, 1, ?, 1, ?, ?)",
+                [(i, token_digest(f"jwt-sintetico-{i}"), creado, vence) for i in range(inicio + 1, fin + 1)],
+            )
+            raw.commit()
+    finally:
+        raw.close()
+
+
+def medir_busquedas(session: Session, filas: int, cantidad: int, con_indice: bool) -> dict:
+    muestras = []
+    for _ in range(cantidad):
+        digest = token_digest(f"jwt-sintetico-{random.randint(1, filas)}")
+        # "+token_hash" impide a SQLite usar el índice: equivale a la búsqueda vieja por JWT
+        columna = "token_hash" if con_indice else "+token_hash"
+        inicio = time.perf_counter()
+        fila = session.exec(
+            text(f"SELECT id FROM tokens WHERE {columna} = :digest AND status_token = 1").bindparams(digest=digest)
+        ).first()
+        muestras.append((time.perf_counter() - inicio) * 1000)
+        assert fila is not None
+    muestras.sort()
+    return {
+        "p50": statistics.median(muestras),
+        "p95": muestras[max(int(len(muestras) * 0.95) - 1, 0)],
+    }
+
+
+def verificar_plan(session: Session):
+    consulta = select(Token).where(Token.token_hash == "x", Token.status_token == True)
+    sql = str(consulta.compile(engine, compile_kwargs={"literal_binds": True}))
+    plan = " ".join(row[-1] for row in session.exec(text(f"EXPLAIN QUERY PLAN {sql}")).all())
+    print(f"🔎 Plan de verify_token: {plan}")
+    assert "ix_tokens_token_hash" in plan, "La búsqueda de tokens no usa el índice de token_hash"
+
+
+def medir():
+    create_db_and_tables()
+    with Session(engine) as session:
+        session.add(User(name="Carga", username="carga", email="carga@example.com", password="x"))
+        session.commit()
+        verificar_plan(session)
+
+    resultados = []
+    filas = 0
+    for tamano in TAMANOS:
+        inicio = time.perf_counter()
+        insertar_tokens(filas, tamano)
+        filas = tamano
+        with Session(engine) as session:
+            con_indice = medir_busquedas(session, filas, BUSQUEDAS, con_indice=True)
+            sin_indice = medir_busquedas(session, filas, BUSQUEDAS_SIN_INDICE, con_indice=False)
+        resultados.append(con_indice)
+        print(f"🔐 {filas:>9,} tokens (carga {time.perf_counter() - inicio:5.1f} s) | "
+              f"con índice p50 {con_indice['p50']:6.3f} ms p95 {con_indice['p95']:6.3f} ms | "
+              f"sin índice p50 {sin_indice['p50']:8.1f} ms")
+
+    # Limpieza: 20 % de los tokens vencidos
+    with Session(engine) as session:
+        session.exec(text("UPDATE tokens SET expiration = '2000-01-01 00:00:00' WHERE id % 5 = 0"))
+        session.commit()
+    inicio = time.perf_counter()
+    borrados = sweep_tokens(batch_size=5000)
+    print(f"🧹 Limpieza: {borrados:,} tokens vencidos borrados en {time.perf_counter() - inicio:.1f} s (lotes de 5000)")
+
+    crecimiento = resultados[-1]["p95"] / resultados[0]["p95"]
+    if crecimiento > MAX_CRECIMIENTO:
+        print(f"❌ La búsqueda con índice creció {crecimiento:.1f}x entre {TAMANOS[0]:,} y {TAMANOS[-1]:,} filas")
+        sys.exit(1)
+    print(f"✅ Búsqueda constante: p95 x{crecimiento:.2f} entre {TAMANOS[0]:,} y {TAMANOS[-1]:,} filas")
+
+
+if __name__ == "__main__":
+    medir()
@@ -0,0 +1,88 @@
+# medir_consultas_user_activity.py
+"""
+Mide cuántas consultas SQL dispara GET /reports/user-activity según el número
+de usuarios. Con la consulta agrupada el número debe ser constante (sin N+1).
+
+Usa una base SQLite temporal; nunca toca la DATABASE_URL real.
+Uso: python medir_consultas_user_activity.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_tmpdir = tempfile.mkdtemp(prefix="user_activity_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "medir-consultas")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from sqlalchemy import event
+from sqlmodel import Session
+from fastapi.testclient import TestClient
+
+import main
+from core.database import engine
+from core.log_events import EVENT_CREACION
+from models.devices import Device
+from models.logs import Log
+from models.users import User
+
+engine.echo = False
+
+TAMANOS = [10, 100, 500]
+
+
+def agregar_usuarios(hasta: int):
+    """Inserta usuarios (con un log cada uno) directamente, sin pasar por bcrypt."""
+    with Session(engine) as session:
+        actuales = session.query(User).count()
+        for i in range(actuales, hasta):
+            user = User(name=f"Operador {i}", username=f"op{i}", email=f"op{i}@example.com", password="x")
+            session.add(user)
+            session.flush()
+            session.add(Log(
+                id_device=1, id_user=user.id, event=f"Acción 'LED_ON' creada para dispositivo 1",
+                action_type="LED_ON", event_category=EVENT_CREACION, timestamp=datetime.utcnow()
+            ))
+        session.commit()
+
+
+def main_medir():
+    consultas = []
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    with TestClient(main.app) as client:
+        client.post("/api/auth/register", json={
+            "username": "bench", "email": "bench@example.com", "name": "Bench", "password": "bench"
+        })
+        r = client.post("/api/auth/login", data={"username": "bench", "password": "bench"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        with Session(engine) as session:
+            session.add(Device(name="esp32-bench"))
+            session.commit()
+
+        resultados = []
+        for n in TAMANOS:
+            agregar_usuarios(n)
+            client.get("/reports/user-activity", headers=headers)  # calentar caché de token
+            consultas.clear()
+            event.listen(engine, "before_cursor_execute", _contar)
+            inicio = time.perf_counter()
+            r = client.get("/reports/user-activity", headers=headers)
+            duracion = (time.perf_counter() - inicio) * 1000
+            event.remove(engine, "before_cursor_execute", _contar)
+            assert r.status_code == 200, r.text
+            resultados.append((n, len(consultas), duracion))
+            print(f"👤 {r.json()['summary']['total_users']:>4} usuarios → {len(consultas)} consultas SQL, {duracion:.1f} ms")
+
+    if len({q for _, q, _ in resultados}) != 1:
+        print("❌ El número de consultas crece con los usuarios (N+1)")
+        sys.exit(1)
+    print("✅ Número de consultas constante")
+
+
+if __name__ == "__main__":
+    main_medir()
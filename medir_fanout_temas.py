@@ -0,0 +1,92 @@
+# medir_fanout_temas.py
+"""
+Micro-benchmark: costo por evento de un broadcast a todos los sockets contra
+publicar en el tema del dispositivo (core/websocket_manager.publish_json), con
+N tableros que siguen cada uno a una sola máquina.
+
+Con broadcast cada evento se encola en los N sockets; con temas, solo en los
+suscriptores de "device:{id}". No abre sockets ni toca la base de datos.
+
+Uso: python medir_fanout_temas.py [eventos_por_medicion]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "medir-fanout")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from core.backplane import InMemoryBackplane
+from core.websocket_manager import ConnectionManager, _Connection, device_topic
+
+CLIENTES = (100, 1000, 5000)
+EVENTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+REPETICIONES = 5
+
+
+class _SocketFalso:
+    async def send_text(self, text: str):
+        pass
+
+
+def crear_manager(clientes: int) -> ConnectionManager:
+    """Un tablero por máquina: el cliente i sigue solo al dispositivo i."""
+    manager = ConnectionManager(queue_size=EVENTOS + 1, slow_consumer_policy="drop_oldest", send_timeout_seconds=10,
+                                backplane=InMemoryBackplane(), presence_seconds=10)
+    for conn_id in range(1, clientes + 1):
+        conn = _Connection(conn_id, _SocketFalso(), manager.queue_size)
+        manager.connections[conn_id] = conn
+        manager._by_socket[conn.websocket] = conn
+        manager.subscribe(conn.websocket, [device_topic(conn_id)])
+    return manager
+
+
+def vaciar(manager: ConnectionManager) -> int:
+    frames = 0
+    for conn in manager.connections.values():
+        while not conn.queue.empty():
+            conn.queue.get_nowait()
+            frames += 1
+    return frames
+
+
+async def medir_modo(manager: ConnectionManager, clientes: int, por_tema: bool) -> tuple:
+    """Devuelve (µs por evento, frames encolados por evento)."""
+    muestras = []
+    frames = 0
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        for i in range(EVENTOS):
+            device_id = i % clientes + 1
+            message = {"type": "log_created", "id": i, "id_device": device_id, "action_type": "LED_ON"}
+            if por_tema:
+                await manager.publish_json([device_topic(device_id)], message)
+            else:
+                await manager.broadcast_json(message)
+        muestras.append((time.perf_counter() - inicio) / EVENTOS * 1_000_000)
+        frames += vaciar(manager)
+    return statistics.median(muestras), frames / (REPETICIONES * EVENTOS)
+
+
+async def medir():
+    print(f"📡 {EVENTOS} eventos x {REPETICIONES} repeticiones, cada cliente sigue un dispositivo")
+    print(f"{'clientes':>8} | {'broadcast':>12} | {'frames':>6} | {'por tema':>10} | {'frames':>6}")
+    fallas = []
+    for clientes in CLIENTES:
+        manager = crear_manager(clientes)
+        todos, frames_todos = await medir_modo(manager, clientes, por_tema=False)
+        tema, frames_tema = await medir_modo(manager, clientes, por_tema=True)
+        print(f"{clientes:>8} | {todos:>9.1f} µs | {frames_todos:>6.0f} | {tema:>7.1f} µs | {frames_tema:>6.0f}")
+        if frames_tema != 1:
+            fallas.append(f"{clientes} clientes: {frames_tema} frames por evento")
+
+    if fallas:
+        print("❌ La publicación por tema llegó a sockets no suscritos: " + "; ".join(fallas))
+        sys.exit(1)
+    print("✅ Publicar en un tema solo encola en sus suscriptores")
+
+
+if __name__ == "__main__":
+    asyncio.run(medir())
@@ -0,0 +1,160 @@
+# medir_latencia_ws_login.py
+"""
+Prueba de carga: mide la latencia de ida y vuelta de un WebSocket de dispositivo
+(/ws/device/2, mensaje "auth") mientras ocurren 50 logins concurrentes.
+
+Con bcrypt en el pool acotado (core/password_hasher.py) la latencia debe quedar
+plana; como contraste se repite la ráfaga verificando bcrypt dentro del event loop.
+
+Levanta uvicorn en un hilo con una base SQLite temporal; nunca toca la DATABASE_URL real.
+Uso: python medir_latencia_ws_login.py [logins_concurrentes]
+"""
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="ws_login_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'carga.db')}"
+os.environ.setdefault("SECRET_KEY", "medir-latencia")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ["DB_ECHO"] = "false"
+
+import httpx
+import uvicorn
+import websockets
+from sqlmodel import Session
+
+import main
+from core.database import engine
+from core.password_hasher import password_hasher
+from core.security import verify_password
+from models.devices import Device
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+INTERVALO_SONDA = 0.02
+# La p95 durante la ráfaga no debe superar este múltiplo de la p95 en reposo (o 50 ms)
+MAX_DEGRADACION = 3.0
+MIN_P95_MS = 50.0
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(puerto: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=puerto, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def sondear(ws, muestras: list, detener: asyncio.Event):
+    """Envía "auth" cada INTERVALO_SONDA y registra el tiempo hasta la respuesta."""
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        await ws.send('{"type": "auth", "token": "sonda"}')
+        while json.loads(await ws.recv()).get("type") != "auth_response":
+            pass
+        muestras.append((time.perf_counter() - inicio) * 1000)
+        await asyncio.sleep(INTERVALO_SONDA)
+
+
+async def fase(nombre: str, base: str, ws, logins: int, reposo: float = 0, exigir_ok: bool = True) -> dict:
+    muestras: list = []
+    detener = asyncio.Event()
+    sonda = asyncio.create_task(sondear(ws, muestras, detener))
+
+    inicio = time.perf_counter()
+    fallidos = []
+    if logins:
+        async with httpx.AsyncClient(base_url=base, timeout=120) as client:
+            respuestas = await asyncio.gather(*[
+                client.post("/api/auth/login", data={"username": "carga", "password": "carga"})
+                for _ in range(logins)
+            ])
+        fallidos = [r.status_code for r in respuestas if r.status_code != 200]
+        assert not (exigir_ok and fallidos), f"Logins fallidos: {fallidos}"
+    else:
+        await asyncio.sleep(reposo)
+    duracion = time.perf_counter() - inicio
+
+    detener.set()
+    await sonda
+    muestras.sort()
+    resultado = {
+        "nombre": nombre,
+        "duracion": duracion,
+        "p50": statistics.median(muestras),
+        "p95": muestras[int(len(muestras) * 0.95) - 1] if len(muestras) > 1 else muestras[0],
+        "max": muestras[-1],
+        "n": len(muestras),
+    }
+    print(f"📡 {nombre:<32} {duracion:6.2f} s | RTT p50 {resultado['p50']:7.1f} ms | "
+          f"p95 {resultado['p95']:7.1f} ms | máx {resultado['max']:7.1f} ms ({resultado['n']} sondas)")
+    if fallidos:
+        print(f"   ⚠️ {len(fallidos)} logins fallaron ({sorted(set(fallidos))})")
+    return resultado
+
+
+async def medir(puerto: int):
+    base = f"http://127.0.0.1:{puerto}"
+    async with httpx.AsyncClient(base_url=base) as client:
+        r = await client.post("/api/auth/register", json={
+            "username": "carga", "email": "carga@example.com", "name": "Carga", "password": "carga"
+        })
+        assert r.status_code == 200, r.text
+
+    # Dispositivo 2: el login notifica al dispositivo 1 y no debe mezclarse con la sonda
+    async with websockets.connect(f"ws://127.0.0.1:{puerto}/ws/device/2") as ws:
+        reposo = await fase("Reposo", base, ws, 0, reposo=1.0)
+        con_pool = await fase(f"{LOGINS} logins (bcrypt en pool)", base, ws, LOGINS)
+
+        # Contraste: bcrypt dentro del event loop, como antes. Con el loop bloqueado las
+        # transacciones abiertas superan el busy timeout de SQLite y algunos logins fallan
+        original = password_hasher.verify
+
+        async def verificar_en_loop(plain, hashed):
+            return verify_password(plain, hashed)
+
+        password_hasher.verify = verificar_en_loop
+        try:
+            en_loop = await fase(f"{LOGINS} logins (bcrypt en el loop)", base, ws, LOGINS, exigir_ok=False)
+        finally:
+            password_hasher.verify = original
+
+    print(f"🔐 Pool de bcrypt: {password_hasher.stats()}")
+    return reposo, con_pool, en_loop
+
+
+def main_medir():
+    with Session(engine) as session:
+        main.create_db_and_tables()
+        session.add(Device(name="esp32-carga"))
+        session.commit()
+
+    puerto = puerto_libre()
+    server = iniciar_servidor(puerto)
+    try:
+        reposo, con_pool, en_loop = asyncio.run(medir(puerto))
+    finally:
+        server.should_exit = True
+
+    limite = max(MIN_P95_MS, reposo["p95"] * MAX_DEGRADACION)
+    if con_pool["p95"] > limite:
+        print(f"❌ La latencia del WebSocket subió con el pool: p95 {con_pool['p95']:.1f} ms (límite {limite:.1f} ms)")
+        sys.exit(1)
+    print(f"✅ Latencia plana durante la ráfaga: p95 {con_pool['p95']:.1f} ms con pool "
+          f"vs {en_loop['p95']:.1f} ms con bcrypt en el loop")
+
+
+if __name__ == "__main__":
+    main_medir()
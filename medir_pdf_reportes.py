@@ -0,0 +1,92 @@
+# medir_pdf_reportes.py
+"""
+Mide tiempo y memoria pico de generate_logs_pdf con filas sintéticas entregadas
+por un generador (como lo hace el worker de reportes). El render por bloques debe
+costar lo mismo por cada 1000 filas sin importar el tamaño del reporte (lineal,
+no cuadrático). La memoria solo crece con el contenido de las páginas ya emitidas,
+que ReportLab guarda hasta cerrar el archivo; sirve de referencia antes de subir
+REPORT_MAX_ROWS.
+
+No usa la base de datos.
+Uso: python medir_pdf_reportes.py [filas ...]   (por defecto 1000 5000 20000)
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault("SECRET_KEY", "medir-pdf")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from core.pdf_generator import generate_logs_pdf
+
+# Presupuesto por cada 1000 filas (holgado para máquinas lentas)
+MAX_MS_POR_1000 = 1500
+MAX_MB_POR_1000 = 1.5
+# El costo por 1000 filas del reporte más grande frente al más pequeño (lineal ≈ 1)
+MAX_CRECIMIENTO_POR_1000 = 2.0
+
+
+def filas_sinteticas(n: int):
+    inicio = datetime(2026, 1, 1)
+    for i in range(n):
+        yield {
+            "timestamp": inicio + timedelta(seconds=i),
+            "event": f"Acción 'LED_ON' creada para dispositivo {i % 20} por el usuario operador{i % 7}",
+            "action": "LED_ON",
+            "username": f"operador{i % 7}",
+            "device_name": f"esp32-{i % 20}",
+        }
+
+
+def medir(n: int, ruta: str):
+    filtros = {"limit": n}
+
+    inicio = time.perf_counter()
+    assert generate_logs_pdf(filas_sinteticas(n), ruta, filtros, total=n)
+    duracion = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    generate_logs_pdf(filas_sinteticas(n), ruta, filtros, total=n)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return duracion, pico, os.path.getsize(ruta)
+
+
+def main_medir():
+    tamanos = [int(x) for x in sys.argv[1:]] or [1000, 5000, 20000]
+    ruta = os.path.join(tempfile.mkdtemp(prefix="pdf_bench_"), "reporte.pdf")
+
+    resultados = []
+    for n in tamanos:
+        duracion, pico, tamano = medir(n, ruta)
+        ms_1000 = duracion * 1000 / (n / 1000)
+        mb_1000 = pico / 1024 / 1024 / (n / 1000)
+        resultados.append((n, ms_1000, mb_1000))
+        print(f"📄 {n:>6} filas → {duracion:6.2f} s ({ms_1000:6.1f} ms/1000 filas), "
+              f"pico {pico / 1024 / 1024:6.1f} MB ({mb_1000:4.2f} MB/1000 filas), "
+              f"archivo {tamano / 1024:7.1f} KB")
+
+    fallos = []
+    for n, ms_1000, mb_1000 in resultados:
+        if ms_1000 > MAX_MS_POR_1000:
+            fallos.append(f"{n} filas: {ms_1000:.0f} ms por 1000 filas (máx {MAX_MS_POR_1000})")
+        if mb_1000 > MAX_MB_POR_1000:
+            fallos.append(f"{n} filas: {mb_1000:.2f} MB por 1000 filas (máx {MAX_MB_POR_1000})")
+    crecimiento = resultados[-1][1] / resultados[0][1]
+    if crecimiento > MAX_CRECIMIENTO_POR_1000:
+        fallos.append(f"el tiempo por 1000 filas creció x{crecimiento:.1f} (máx x{MAX_CRECIMIENTO_POR_1000})")
+
+    for fallo in fallos:
+        print(f"❌ {fallo}")
+    if fallos:
+        sys.exit(1)
+    print(f"✅ Costo lineal: x{crecimiento:.1f} en tiempo por 1000 filas entre "
+          f"{resultados[0][0]} y {resultados[-1][0]} filas")
+
+
+if __name__ == "__main__":
+    main_medir()
@@ -0,0 +1,57 @@
+# migrar_logs_estructurados.py
+from sqlalchemy import inspect, text, update
+from sqlmodel import Session, select
+from core.database import engine
+from core.log_events import classify_event
+from models.logs import Log
+from models.actions_devices import ActionDevice
+
+BATCH_SIZE = 2000
+
+def agregar_columnas():
+    """Agrega action_type / event_category (y sus índices) a una tabla logs existente."""
+    columnas = {c["name"] for c in inspect(engine).get_columns("logs")}
+    with engine.begin() as conn:
+        if "action_type" not in columnas:
+            conn.execute(text("ALTER TABLE logs ADD COLUMN action_type VARCHAR(100) NULL"))
+        if "event_category" not in columnas:
+            conn.execute(text("ALTER TABLE logs ADD COLUMN event_category VARCHAR(20) NULL"))
+    for index in Log.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+def rellenar_logs():
+    """Rellena los campos estructurados desde el texto del evento, por lotes de id."""
+    total = 0
+    last_id = 0
+    with Session(engine) as session:
+        while True:
+            rows = session.exec(
+                select(Log.id, Log.event, ActionDevice.action)
+                .outerjoin(ActionDevice, Log.id_action == ActionDevice.id)
+                .where(Log.id > last_id, Log.event_category == None)
+                .order_by(Log.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            cambios = []
+            for log_id, event, action_name in rows:
+                action_type, category = classify_event(event)
+                cambios.append({
+                    "id": log_id,
+                    # "Acción ejecutada correctamente" no nombra la acción: usar la de actions_devices
+                    "action_type": action_type or action_name,
+                    "event_category": category,
+                })
+            session.execute(update(Log), cambios)
+            session.commit()
+            total += len(cambios)
+            last_id = rows[-1][0]
+            print(f"   ... {total} logs migrados")
+    return total
+
+if __name__ == "__main__":
+    agregar_columnas()
+    print("✅ Columnas e índices verificados")
+    total = rellenar_logs()
+    print(f"✅ Migración completada: {total} logs actualizados")
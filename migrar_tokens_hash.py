@@ -0,0 +1,99 @@
+# migrar_tokens_hash.py
+"""
+Migra la tabla tokens al formato con huella: token (JWT completo, sin índice)
+pasa a token_hash (SHA-256, único e indexado), con índices en expiration y
+status_token para la limpieza periódica.
+
+La tabla se reconstruye: se renombra a tokens_legacy, se crea la nueva y se
+copian por lotes solo los tokens activos y vigentes (los vencidos o revocados
+ya no autorizan nada). Al final se borra tokens_legacy.
+
+Como el JWT viejo no tenía jti, un mismo token pudo guardarse en varias filas
+(dos logins del mismo usuario en el mismo segundo): se copia solo la primera
+de cada huella, porque token_hash es único.
+
+Uso: python migrar_tokens_hash.py
+"""
+from datetime import datetime
+from sqlalchemy import Boolean, DateTime, Integer, String, column, func, inspect, insert, select, table, text
+from core.database import engine
+from core.security import token_digest
+from models.users import User  # noqa: F401  (registra la FK tokens.id_user)
+from models.tokens import Token
+
+tokens = Token.__table__
+
+BATCH_SIZE = 5000
+LEGACY_TABLE = "tokens_legacy"
+
+# Columnas tipadas de la tabla vieja: las fechas vuelven como datetime también en SQLite
+legacy = table(
+    LEGACY_TABLE,
+    column("id", Integer), column("id_user", Integer), column("token", String),
+    column("status_token", Boolean), column("date_token", DateTime), column("expiration", DateTime),
+)
+
+def reconstruir_tabla():
+    """Renombra la tabla vieja y crea la nueva. Devuelve False si no hay nada que migrar."""
+    tablas = inspect(engine).get_table_names()
+    if LEGACY_TABLE not in tablas:
+        if "tokens" not in tablas or "token_hash" in {c["name"] for c in inspect(engine).get_columns("tokens")}:
+            print("✅ La tabla tokens ya usa token_hash")
+            return False
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE tokens RENAME TO {LEGACY_TABLE}"))
+    # Si tokens_legacy ya existía, una ejecución anterior se interrumpió: se continúa
+    tokens.create(engine, checkfirst=True)
+    return True
+
+def copiar_tokens_activos():
+    """Copia los tokens activos calculando su huella, por lotes de id. Devuelve (copiados, duplicados)."""
+    total = 0
+    duplicados = 0
+    now = datetime.utcnow()
+    with engine.connect() as conn:
+        last_id = conn.execute(select(func.coalesce(func.max(tokens.c.id), 0))).scalar()
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(legacy.c.id, legacy.c.id_user, legacy.c.token, legacy.c.date_token, legacy.c.expiration)
+                .where(legacy.c.id > last_id, legacy.c.status_token == True, legacy.c.expiration >= now)
+                .order_by(legacy.c.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            # Primera fila de cada huella dentro del lote...
+            por_huella = {}
+            for row in rows:
+                por_huella.setdefault(token_digest(row.token), row)
+            # ... y sin las que ya se copiaron en un lote anterior
+            existentes = set(conn.execute(
+                select(tokens.c.token_hash).where(tokens.c.token_hash.in_(list(por_huella)))
+            ).scalars())
+            nuevos = [
+                {
+                    "id": row.id,
+                    "id_user": row.id_user,
+                    "token_hash": digest,
+                    "status_token": True,
+                    "date_token": row.date_token,
+                    "expiration": row.expiration,
+                }
+                for digest, row in por_huella.items()
+                if digest not in existentes
+            ]
+            if nuevos:
+                conn.execute(insert(tokens), nuevos)
+        total += len(nuevos)
+        duplicados += len(rows) - len(nuevos)
+        last_id = rows[-1].id
+        print(f"   ... {total} tokens copiados, {duplicados} duplicados omitidos")
+    return total, duplicados
+
+if __name__ == "__main__":
+    if reconstruir_tabla():
+        total, duplicados = copiar_tokens_activos()
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+        print(f"✅ Migración completada: {total} tokens activos conservados, {duplicados} duplicados descartados")
@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+class ActionRollup(SQLModel, table=True):
+    """Conteo pre-agregado de eventos de acción por dispositivo, acción y hora."""
+    __tablename__ = "action_rollups"
+    __table_args__ = (
+        UniqueConstraint("id_device", "action", "bucket", name="uq_action_rollups_device_action_bucket"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    id_device: int = Field(foreign_key="devices.id", index=True)
+    action: str = Field(max_length=100)
+    bucket: datetime = Field(index=True)  # Inicio de la hora (UTC)
+    count: int = Field(default=0)
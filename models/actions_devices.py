@@ -1,9 +1,14 @@
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import List, Optional
 
 class ActionDevice(SQLModel, table=True):
     __tablename__ = "actions_devices"
+    __table_args__ = (
+        # Acciones sin confirmar recientes (cola de reenvío al arrancar)
+        Index("ix_actions_devices_pending", "executed", "created_at"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     id_device: int = Field(foreign_key="devices.id")
@@ -1,23 +1,37 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import Relationship, SQLModel, Field
 
 class Log(SQLModel, table=True):
     __tablename__ = "logs"
+    # Índices para los patrones reales de consulta (filtro + ORDER BY timestamp)
+    __table_args__ = (
+        Index("ix_logs_timestamp", "timestamp"),
+        Index("ix_logs_device_timestamp", "id_device", "timestamp"),
+        Index("ix_logs_user_timestamp", "id_user", "timestamp"),
+        Index("ix_logs_action", "id_action"),
+        Index("ix_logs_action_type_timestamp", "action_type", "timestamp"),
+        Index("ix_logs_category_timestamp", "event_category", "timestamp"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     event: str = Field(max_length=255)
     
     # Claves Foráneas
     id_device: int = Field(foreign_key="devices.id")
-    id_user: int = Field(foreign_key="users.id")
+    id_user: Optional[int] = Field(default=None, foreign_key="users.id")  # None: evento del IoT
     id_action: Optional[int] = Field(default=None, foreign_key="actions_devices.id")
 
+    # Datos estructurados del evento (ver core/log_events.py)
+    action_type: Optional[str] = Field(default=None, max_length=100)
+    event_category: Optional[str] = Field(default=None, max_length=20)
+
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     
     # Relaciones Bidireccionales
     device: "Device" = Relationship(back_populates="logs")
-    user: "User" = Relationship(back_populates="logs")
+    user: Optional["User"] = Relationship(back_populates="logs")
     action_device: Optional["ActionDevice"] = Relationship(back_populates="logs") 
 
 from typing import TYPE_CHECKING
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+class LogArchive(SQLModel, table=True):
+    """
+    Logs movidos fuera de la tabla viva por la política de retención (core/retention.py).
+    Conserva el id original y no tiene claves foráneas: el histórico no bloquea
+    borrados de usuarios o dispositivos.
+    """
+    __tablename__ = "logs_archive"
+    __table_args__ = (
+        Index("ix_logs_archive_timestamp", "timestamp"),
+        Index("ix_logs_archive_device_timestamp", "id_device", "timestamp"),
+    )
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    event: str = Field(max_length=255)
+    id_device: int
+    id_user: Optional[int] = None
+    id_action: Optional[int] = None
+    action_type: Optional[str] = Field(default=None, max_length=100)
+    event_category: Optional[str] = Field(default=None, max_length=20)
+    timestamp: datetime
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
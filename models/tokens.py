@@ -7,10 +7,11 @@ class Token(SQLModel, table=True):
 
     id: Optional[int] = Field(default=None, primary_key=True)
     id_user: int = Field(foreign_key="users.id")
-    token: str
-    status_token: bool = Field(default=True)
+    # SHA-256 del JWT (64 hex): búsqueda por índice de largo fijo, sin guardar el token completo
+    token_hash: str = Field(max_length=64, unique=True, index=True)
+    status_token: bool = Field(default=True, index=True)
     date_token: datetime
-    expiration: datetime
+    expiration: datetime = Field(index=True)
 
     user: "User" = Relationship(back_populates="tokens")
 
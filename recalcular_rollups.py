@@ -0,0 +1,29 @@
+# recalcular_rollups.py
+"""
+Rellena la tabla action_rollups a partir de los logs existentes (logs y logs_archive).
+
+Orden: primero migrar_logs_estructurados.py (action_type / event_category), luego
+este script. Por eso se ejecuta aquí la migración antes de recalcular: solo toca
+los logs con event_category vacía, así que es inmediata si ya se había corrido.
+Aun sin migrar, rebuild_action_rollups cuenta esos logs desde el texto del evento.
+
+Uso: python recalcular_rollups.py
+"""
+from sqlmodel import Session
+from core.database import engine, create_db_and_tables
+from core.rollups import rebuild_action_rollups
+from migrar_logs_estructurados import agregar_columnas, rellenar_logs
+
+def recalcular_rollups():
+    """Rellena la tabla action_rollups a partir de los logs existentes."""
+    create_db_and_tables()
+    agregar_columnas()
+    migrados = rellenar_logs()
+    if migrados:
+        print(f"✅ {migrados} logs antiguos migrados a columnas estructuradas")
+    with Session(engine) as session:
+        total = rebuild_action_rollups(session)
+    print(f"✅ Rollups recalculados: {total} filas (dispositivo, acción, hora)")
+
+if __name__ == "__main__":
+    recalcular_rollups()
@@ -2,15 +2,22 @@
 # 📁 endpoints/actions.py (ACTUALIZADO CON PROTECCIÓN)
 # ===============================================================
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, update
 from sqlmodel import select
+from collections import Counter
 from datetime import datetime
-from core.database import Session, get_session
+from core.config import settings
+from core.database import Session, AsyncSession, get_session, get_async_session, bulk_insert_ids
 from core.security import decode_token
-from core.websocket_manager import manager
+from core.websocket_manager import manager, device_topic
+from core.dashboard_stream import dashboard_stream
+from core.action_dispatcher import action_dispatcher
+from core.rollups import record_action_event, record_action_events
+from core.log_events import EVENT_CREACION, EVENT_CONFIRMACION, EVENT_EJECUCION, EVENT_NO_EJECUCION
 from models.actions_devices import ActionDevice
 from models.devices import Device
 from models.logs import Log
-from schemas.actions_schema import ActionDeviceCreate, ActionDeviceRead, ActionDeviceUpdate
+from schemas.actions_schema import ActionDeviceCreate, ActionDeviceBatchCreate, ActionDeviceRead, ActionDeviceUpdate
 
 router = APIRouter(prefix="/actions", tags=["Actions Devices"])
 
@@ -20,14 +27,14 @@ router = APIRouter(prefix="/actions", tags=["Actions Devices"])
 @router.post("/", response_model=ActionDeviceRead)
 async def create_action(
     data: ActionDeviceCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user=Depends(decode_token),
 ):
     """Crea una acción para un dispositivo específico."""
     print(f"📥 Datos recibidos: {data.dict()}")  # Debug
     
     # Validar dispositivo existente
-    device = session.exec(select(Device).where(Device.id == data.id_device)).first()
+    device = (await session.exec(select(Device).where(Device.id == data.id_device))).first()
     if not device:
         raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
 
@@ -40,40 +47,105 @@ async def create_action(
     )
     
     session.add(new_action)
-    session.commit()
-    session.refresh(new_action)  # ✅ Esto obtiene el ID generado
-
-    # Enviar al WebSocket
-    payload = {
-        "type": "action_execute",
-        "action_id": new_action.id,
-        "id_device": new_action.id_device,
-        "action_type": new_action.action,
-        "timestamp": new_action.created_at.isoformat(),
-    }
-    
-    try:
-        await manager.send_to_device(data.id_device, payload)
-        print(f"✅ Acción enviada por WebSocket al dispositivo {data.id_device}")
-    except Exception as e:
-        print(f"⚠️ No se pudo enviar al dispositivo {data.id_device}: {e}")
+    await session.flush()  # ✅ Obtiene el ID generado sin cerrar la transacción
 
-    # Crear log CON EL ID DE LA ACCIÓN
+    # Crear log CON EL ID DE LA ACCIÓN: acción, log y rollup van en un solo commit
     log = Log(
         id_device=data.id_device,
         id_user=user.id,
         id_action=new_action.id,  # ✅ AGREGAR ESTA LÍNEA
         event=f"Acción '{data.action}' creada para dispositivo {data.id_device}",
+        action_type=data.action,
+        event_category=EVENT_CREACION,
         timestamp=datetime.utcnow()
     )
     session.add(log)
-    session.commit()
+    await session.run_sync(record_action_event, data.id_device, data.action, log.timestamp)
+    await session.commit()
+    dashboard_stream.publish_log(log)
+
+    # Enviar al WebSocket recién con todo guardado: si el dispositivo no está conectado
+    # queda en cola hasta que se reconecte
+    try:
+        await action_dispatcher.enqueue([new_action])
+    except Exception as e:
+        print(f"⚠️ No se pudo encolar la acción para el dispositivo {data.id_device}: {e}")
 
     print(f"✅ Acción creada exitosamente: ID {new_action.id}")
     return new_action
 
 # ---------------------------------------------------------------
 
+# ===============================================================
+# 📦 POST /actions/batch → Crear varias acciones de una vez (PROTEGIDA)
+# ===============================================================
+@router.post("/batch", response_model=list[ActionDeviceRead])
+async def create_actions_batch(
+    data: ActionDeviceBatchCreate,
+    session: AsyncSession = Depends(get_async_session),
+    user=Depends(decode_token),
+):
+    """
+    Crea una secuencia de acciones (para uno o varios dispositivos) en una sola
+    transacción: acciones y logs se insertan por lotes y cada dispositivo recibe
+    un único frame "action_batch" con todas las suyas, en orden.
+    """
+    if not data.actions:
+        raise HTTPException(status_code=400, detail="El lote no tiene acciones")
+    if len(data.actions) > settings.ACTION_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.ACTION_BATCH_MAX_SIZE} acciones por lote"
+        )
+
+    # Validar todos los dispositivos con una sola consulta
+    device_ids = {item.id_device for item in data.actions}
+    found = set((await session.exec(select(Device.id).where(Device.id.in_(device_ids)))).all())
+    missing = sorted(device_ids - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Dispositivos no encontrados: {missing}")
+
+    now = datetime.utcnow()
+    new_actions = [
+        ActionDevice(id_device=item.id_device, action=item.action, executed=False, created_at=now)
+        for item in data.actions
+    ]
+    action_ids = await session.run_sync(
+        bulk_insert_ids, ActionDevice, [action.model_dump(exclude={"id"}) for action in new_actions]
+    )
+    for action, action_id in zip(new_actions, action_ids):
+        action.id = action_id
+
+    logs = [
+        Log(
+            id_device=action.id_device,
+            id_user=user.id,
+            id_action=action.id,
+            event=f"Acción '{action.action}' creada para dispositivo {action.id_device}",
+            action_type=action.action,
+            event_category=EVENT_CREACION,
+            timestamp=now,
+        )
+        for action in new_actions
+    ]
+    # Los logs no necesitan sus ids: un executemany simple
+    await session.execute(insert(Log), [log.model_dump(exclude={"id"}) for log in logs])
+    counts = Counter((action.id_device, action.action) for action in new_actions)
+    await session.run_sync(record_action_events, counts, now)
+    await session.commit()
+    for log in logs:
+        dashboard_stream.publish_log(log)
+
+    try:
+        await action_dispatcher.enqueue(new_actions)
+    except Exception as e:
+        print(f"⚠️ No se pudo encolar el lote de acciones: {e}")
+
+    print(f"✅ Lote de {len(new_actions)} acciones creado para {len(device_ids)} dispositivos")
+    return new_actions
+
+# ---------------------------------------------------------------
+
 # ===============================================================
 # 🔄 PUT /actions/{action_id} → Actualizar estado de acción (PROTEGIDA)
 # ===============================================================
@@ -81,11 +153,11 @@ async def create_action(
 async def update_action_status(
     action_id: int,
     update: ActionDeviceUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user=Depends(decode_token),
 ):
     """Actualiza el estado (ejecutada) de una acción."""
-    action = session.exec(select(ActionDevice).where(ActionDevice.id == action_id)).first()
+    action = (await session.exec(select(ActionDevice).where(ActionDevice.id == action_id))).first()
     if not action:
         raise HTTPException(status_code=404, detail="Acción no encontrada")
 
@@ -102,11 +174,17 @@ async def update_action_status(
         id_user=user.id,
         id_action=action.id,  # ✅ AGREGAR ESTA LÍNEA
         event=log_message,
+        action_type=action.action,
+        event_category=EVENT_EJECUCION if action.executed else EVENT_NO_EJECUCION,
         timestamp=datetime.utcnow(),
     )
     session.add(log)
-    session.commit()
-    session.refresh(action)
+    await session.commit()
+    await session.refresh(action)
+    dashboard_stream.publish_log(log)
+    if action.executed:
+        # Marcada a mano como ejecutada: deja de reintentarse
+        action_dispatcher.discard(action.id_device, action.id)
 
     # Notificar por WebSocket
     payload = {
@@ -182,6 +260,7 @@ def delete_action(
 
     session.delete(action)
     session.commit()
+    action_dispatcher.discard(action.id_device, action_id)
     return
 
 # ---------------------------------------------------------------
@@ -192,28 +271,42 @@ def delete_action(
 @router.post("/device/confirm/{action_id}")
 async def confirm_action_execution(
     action_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     Endpoint llamado por el IoT (ESP32, Arduino, etc.)
     cuando confirma que la acción fue ejecutada físicamente.
     """
-    action = session.exec(select(ActionDevice).where(ActionDevice.id == action_id)).first()
+    action = (await session.exec(select(ActionDevice).where(ActionDevice.id == action_id))).first()
     if not action:
         raise HTTPException(status_code=404, detail="Acción no encontrada")
 
-    action.executed = True
-    session.add(action)
+    # Idempotente: un reintento puede llegar antes que la primera confirmación, y el
+    # firmware vuelve a confirmar los ids repetidos. Solo la primera marca executed
+    # (UPDATE condicional, seguro ante confirmaciones concurrentes) y escribe log y rollup.
+    result = await session.execute(
+        update(ActionDevice)
+        .where(ActionDevice.id == action_id, ActionDevice.executed == False)
+        .values(executed=True)
+    )
+    if result.rowcount == 0:
+        action_dispatcher.ack(action.id_device, action.id)
+        return {"message": "Acción ya confirmada", "action_id": action.id}
 
     log = Log(
         id_device=action.id_device,
         id_user=None,  # El IoT no tiene usuario
         id_action=action.id,  # ✅ AGREGAR ESTA LÍNEA
         event=f"Dispositivo confirmó ejecución de acción '{action.action}'",
+        action_type=action.action,
+        event_category=EVENT_CONFIRMACION,
         timestamp=datetime.utcnow(),
     )
     session.add(log)
-    session.commit()
+    await session.run_sync(record_action_event, action.id_device, action.action, log.timestamp)
+    await session.commit()
+    dashboard_stream.publish_log(log)
+    action_dispatcher.ack(action.id_device, action.id)
 
     payload = {
         "event": "action_confirmed",
@@ -224,8 +317,9 @@ async def confirm_action_execution(
     }
     
     try:
-        await manager.broadcast(payload)
+        # Solo a quien sigue este dispositivo, no a todos los sockets
+        await manager.publish_json([device_topic(action.id_device)], payload)
     except Exception as e:
-        print(f"⚠️ Error al broadcast confirmación: {e}")
+        print(f"⚠️ Error al publicar confirmación: {e}")
 
     return {"message": "Acción confirmada por el dispositivo", "action_id": action.id}
\ No newline at end of file
@@ -3,13 +3,15 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import select, Session
 from datetime import datetime, timezone
 
-from core.database import get_session
+from core.database import AsyncSession, get_session, get_async_session
 from models.users import User
 from models.tokens import Token as DBToken
 from schemas.users_schema import UserCreate, UserRead
 from schemas.auth_schema import LoginResponse
-from core.websocket_manager import manager
-from core.security import hash_password, verify_password, create_access_token
+from core.websocket_manager import manager, TOPIC_DEVICES
+from core.security import create_access_token, token_digest
+from core.password_hasher import password_hasher
+from core.auth_cache import auth_cache
 
 # ------------------- CONFIGURACIÓN DEL ROUTER -------------------
 router = APIRouter(prefix="/api/auth", tags=["Auth"])
@@ -17,14 +19,14 @@ router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
 # ------------------- REGISTRO DE USUARIO -------------------
 @router.post("/register", response_model=UserRead)
-def register_user(user: UserCreate, session: Session = Depends(get_session)):
+async def register_user(user: UserCreate, session: AsyncSession = Depends(get_async_session)):
     """Registra un nuevo usuario en la base de datos."""
     
-    existing_user = session.exec(select(User).where(User.username == user.username)).first()
+    existing_user = (await session.exec(select(User).where(User.username == user.username))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="El usuario ya existe")
 
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await password_hasher.hash(user.password)
     
     new_user = User(
         username=user.username,
@@ -35,24 +37,24 @@ def register_user(user: UserCreate, session: Session = Depends(get_session)):
     )
     
     session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    await session.commit()
+    await session.refresh(new_user)
     return new_user
 
 
 # ------------------- LOGIN -------------------
 @router.post("/login", response_model=LoginResponse)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_async_session)):
     """
     Autentica al usuario y genera un token JWT.
     """
     # Buscar usuario
-    user = session.exec(select(User).where(User.username == form_data.username)).first()
+    user = (await session.exec(select(User).where(User.username == form_data.username))).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no encontrado")
 
     # Validar contraseña
-    if not verify_password(form_data.password, user.password):
+    if not await password_hasher.verify(form_data.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Contraseña incorrecta")
 
     # Crear token JWT
@@ -65,17 +67,17 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Sessi
     # Guardar token en base de datos
     db_token = DBToken(
         id_user=user.id,
-        token=token,
+        token_hash=token_digest(token),
         status_token=True,
         date_token=datetime.now(timezone.utc),
         expiration=expire
     )
     session.add(db_token)
-    session.commit()
+    await session.commit()
 
     # 🔥 CORREGIDO: Siempre enviar al DISPOSITIVO 1 (IoT)
     try:
-        await manager.send_to_device(1, {  # ← DISPOSITIVO 1 FIJO
+        sent = await manager.send_to_device(1, {  # ← DISPOSITIVO 1 FIJO
             "type": "login",
             "success": True,
             "token": token,
@@ -87,20 +89,19 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Sessi
                 "email": user.email
             }
         })
-        print(f"✅ Notificación de login enviada al IoT (dispositivo 1)")
-    except Exception as e:
-        print(f"⚠️ No se pudo notificar al IoT: {e}")
-        # Intentar broadcast como fallback
-        try:
-            await manager.broadcast({
+        if sent:
+            print(f"✅ Notificación de login enviada al IoT (dispositivo 1)")
+        else:
+            # send_to_device no lanza: devuelve False si el dispositivo 1 no está conectado
+            await manager.publish_json([TOPIC_DEVICES], {
                 "type": "login", 
                 "success": True,
                 "token": token,
                 "name": user.name
             })
             print(f"🔥 Broadcast de login enviado como fallback")
-        except Exception as e2:
-            print(f"❌ Fallback también falló: {e2}")
+    except Exception as e:
+        print(f"⚠️ No se pudo notificar al IoT: {e}")
 
     # Respuesta al cliente web/app
     return {
@@ -122,11 +123,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Sessi
 @router.post("/logout")
 def logout(token: str, session: Session = Depends(get_session)):
     """Invalida un token activo."""
-    db_token = session.exec(select(DBToken).where(DBToken.token == token, DBToken.status_token == True)).first()
+    db_token = session.exec(select(DBToken).where(DBToken.token_hash == token_digest(token), DBToken.status_token == True)).first()
     if not db_token:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Token no encontrado o ya invalidado")
 
     db_token.status_token = False
     session.add(db_token)
     session.commit()
+    auth_cache.invalidate_token(token)
     return {"success": True, "message": "Sesión cerrada correctamente"}
@@ -4,8 +4,10 @@ from typing import List, Optional
 from sqlmodel import Session, select
 from core.database import get_session 
 from core.security import decode_token 
+from core.dashboard_stream import dashboard_stream
+from core.device_presence import device_presence
 from models.devices import Device
-from schemas.devices_schema import DeviceCreate, DeviceRead, DeviceUpdate, DeviceUpdateIP
+from schemas.devices_schema import DeviceCreate, DeviceRead, DeviceUpdate, DeviceUpdateIP, DevicePresenceRead
 
 router = APIRouter(prefix="/devices", tags=["Devices"])
 
@@ -106,6 +108,17 @@ def list_devices(
     
     return results
 
+# ===============================================================
+# 📶 GET - Presencia en vivo (desde memoria, sin consultar la DB)
+# ===============================================================
+@router.get("/presence", response_model=List[DevicePresenceRead])
+async def get_devices_presence(user=Depends(decode_token)):
+    """
+    Dispositivos conectados ahora por WebSocket: desde cuándo, último latido y RTT
+    del ping/pong. Los conectados a otro worker solo indican el worker.
+    """
+    return device_presence.snapshot()
+
 # ===============================================================
 # 🔍 GET - Obtener dispositivo por ID (PROTEGIDA CON VALIDACIÓN)
 # ===============================================================
@@ -181,6 +194,7 @@ def update_device(
             )
     
     # Actualizar campos
+    previous_status = device.status
     update_data = data.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(device, key, value)
@@ -190,6 +204,9 @@ def update_device(
     session.commit()
     session.refresh(device)
     
+    if device.status != previous_status:
+        dashboard_stream.publish_device_status(device.id, device.status)
+    
     # 📝 Log de actualización
     print(f"✏️ Dispositivo actualizado: {device.name} por usuario: {user.username}")
     
@@ -231,6 +248,7 @@ def update_device_ip(
         )
     
     # Actualizar IP y estado
+    previous_status = device.status
     device.direction = data.ip_address
     device.status = "online"
     device.updated_at = datetime.utcnow()
@@ -239,6 +257,9 @@ def update_device_ip(
     session.commit()
     session.refresh(device)
     
+    if previous_status != "online":
+        dashboard_stream.publish_device_status(device.id, device.status)
+    
     # 📝 Log de actualización de IP
     print(f"🌐 IP actualizada: {device.name} -> {data.ip_address} por usuario: {user.username}")
     
@@ -1,6 +1,17 @@
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, text
-from core.database import get_session
+from core.database import get_session, engine, async_engine
+from core.db_pool import describe_pool
+from core.auth_cache import auth_cache
+from core.password_hasher import password_hasher
+from core.report_jobs import report_jobs
+from core.retention import retention_status
+from core.token_cleanup import token_sweep_status
+from core.action_dispatcher import action_dispatcher
+from core.websocket_manager import manager
+from core.backplane import backplane
+from core.device_presence import device_presence
+from core.config import settings
 
 router = APIRouter(prefix="/health", tags=["Health Check"])
 
@@ -22,3 +33,106 @@ def health_check(session: Session = Depends(get_session)):
             "backend": "offline",
             "database": f"error: {str(e)}"
         }
+
+
+@router.get("/auth-cache")
+def auth_cache_stats():
+    """
+    Métricas de la caché de tokens verificados (aciertos, fallos, consultas ahorradas).
+    """
+    return auth_cache.stats()
+
+
+
+@router.get("/password-hasher")
+def password_hasher_stats():
+    """
+    Métricas del pool de bcrypt: profundidad de cola, hilos ocupados, espera y duración media.
+    """
+    return password_hasher.stats()
+
+
+@router.get("/report-cache")
+def report_cache_stats():
+    """
+    Métricas de la caché de reportes PDF (reutilizados, generados, desalojados, espacio usado).
+    """
+    return report_jobs.stats()
+
+
+@router.get("/log-retention")
+def log_retention_status():
+    """
+    Política de retención de logs y resultado de la última ejecución.
+    """
+    return {
+        "retention_days": settings.LOG_RETENTION_DAYS,
+        "interval_minutes": settings.LOG_RETENTION_INTERVAL_MINUTES,
+        **retention_status,
+    }
+
+
+@router.get("/token-sweep")
+def token_sweep_stats():
+    """
+    Limpieza de tokens vencidos o revocados: intervalo y resultado de la última ejecución.
+    """
+    return {
+        "interval_minutes": settings.TOKEN_SWEEP_INTERVAL_MINUTES,
+        "batch_size": settings.TOKEN_SWEEP_BATCH_SIZE,
+        **token_sweep_status,
+    }
+
+
+@router.get("/db-pool")
+def db_pool_stats():
+    """
+    Estado de los pools de conexiones (sync y async): tamaño, conexiones en uso,
+    overflow, checkouts, tiempo de espera y timeouts.
+    """
+    return {
+        "sync": describe_pool(engine),
+        "async": describe_pool(async_engine.sync_engine),
+    }
+
+
+@router.get("/action-dispatch")
+async def action_dispatch_stats():
+    """
+    Cola de acciones por dispositivo: pendientes sin confirmar, envíos, reintentos,
+    descartes y latencia hasta la confirmación del IoT.
+    """
+    return action_dispatcher.stats()
+
+
+@router.get("/websockets")
+async def websocket_stats():
+    """
+    Conexiones WebSocket activas y sus colas de salida: frames encolados,
+    enviados, descartados y desconexiones por consumidor lento.
+    """
+    return manager.stats()
+
+
+@router.get("/backplane")
+async def backplane_stats():
+    """
+    Bus entre workers: backend (memory, sqlite o redis), id de este worker,
+    mensajes publicados y recibidos, y dispositivos conectados a otros workers.
+    """
+    return {
+        **backplane.stats(),
+        "local_devices": sorted(manager.device_connections),
+        "remote_devices": {
+            device_id: worker for device_id, (worker, _) in sorted(manager.remote_devices.items())
+        },
+    }
+
+
+@router.get("/device-presence")
+async def device_presence_stats():
+    """
+    Presencia de dispositivos: conectados a este worker, transiciones de status,
+    cuántas se agruparon antes de escribirse y desconexiones por falta de latidos.
+    """
+    return device_presence.stats()
@@ -1,11 +1,14 @@
 # endpoints/logs.py
 from fastapi import APIRouter, Depends, Query, HTTPException, status
-from sqlmodel import select, func, or_
+from sqlmodel import select, func
 from typing import Optional, Dict, List, Any
 from core.database import Session, get_session
 from core.security import decode_token
 from models.logs import Log
 from models.devices import Device
+from core.log_events import EVENT_CREACION, EVENT_CONFIRMACION
+from core.pagination import count_cache, encode_cursor, keyset_condition
+from core.log_archive import archive_dir, export_logs_archive, read_state
 from schemas.logs_schema import LogReadPaginated
 
 router = APIRouter(prefix="/logs", tags=["Logs"])
@@ -22,12 +25,17 @@ def get_logs(
     event_contains: Optional[str] = Query(None, description="Filtrar logs cuyo evento contenga esta cadena."),
     status: Optional[str] = None,
     id_action: Optional[int] = None,
+    action_type: Optional[str] = Query(None, description="Acción exacta (MOTOR_IZQ, LED_ON, ...)."),
+    event_category: Optional[str] = Query(None, description="Categoría (creacion, confirmacion, ejecucion, ...)."),
     # 📝 Filtros de Paginación
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    use_cursor: bool = Query(False, description="Paginación por cursor (keyset) en lugar de OFFSET."),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor."),
 ):
     """
     Obtiene logs con filtros, paginación y recuentos por dispositivo, estado y tipo de acción.
+    Con use_cursor/cursor la página se busca por índice y el total sale de una caché corta.
     """
     
     # 1. CONSTRUCCIÓN DE LA CONSULTA BASE CON FILTROS
@@ -41,21 +49,45 @@ def get_logs(
         query = query.where(Log.event.ilike(f"%{event_contains}%")) 
         
     if status:
-        # Nota: Asumiendo que el campo 'status' existe en el modelo Log
-        query = query.where(Log.status == status)
+        # El modelo Log no tiene columna 'status': el estado del log es su categoría
+        query = query.where(Log.event_category == status)
         
     if id_action: 
         # Nota: Asumiendo que el campo 'id_action' existe en el modelo Log
         query = query.where(Log.id_action == id_action)
+
+    if action_type:
+        query = query.where(Log.action_type == action_type)
+
+    if event_category:
+        query = query.where(Log.event_category == event_category)
     
     # 2. EJECUTAR CONSULTA PARA OBTENER TOTAL y DATOS PAGINADOS
     # Utilizamos .subquery() para el conteo total con filtros
     total_query = select(func.count()).select_from(query.subquery())
-    total = session.exec(total_query).one()
-    
-    # Paginación
-    offset = (page - 1) * limit
-    logs = session.exec(query.offset(offset).limit(limit)).all()
+
+    # Más recientes primero (id desempata para que el cursor sea estable)
+    query = query.order_by(Log.timestamp.desc(), Log.id.desc())
+
+    next_cursor = None
+    if use_cursor or cursor:
+        # Paginación keyset: buscar después de (timestamp, id) del último log
+        cache_key = ("logs", id_device, event_contains, status, id_action, action_type, event_category)
+        total, total_exact = count_cache.get_or_compute(cache_key, lambda: session.exec(total_query).one())
+        if cursor:
+            query = query.where(keyset_condition(Log.timestamp, Log.id, cursor))
+        logs = session.exec(query.limit(limit + 1)).all()
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+        if has_more:
+            next_cursor = encode_cursor(logs[-1].timestamp, logs[-1].id)
+    else:
+        # Paginación clásica por página
+        total = session.exec(total_query).one()
+        total_exact = True
+        offset = (page - 1) * limit
+        logs = session.exec(query.offset(offset).limit(limit)).all()
+        has_more = offset + len(logs) < total
 
     # Calcular el número total de páginas
     pages = (total // limit) + (1 if total % limit > 0 else 0)
@@ -69,71 +101,35 @@ def get_logs(
         .group_by(Device.name)
     ).all()
 
-    # 3.2. Conteo por Estado (para todos los logs)
+    # 3.2. Conteo por Estado (categoría del evento, para todos los logs)
     counts_by_status = session.exec(
-        select(Log.status, func.count(Log.id))
-        .where(Log.status != None) # Asegurarse de que el status no sea None si es nullable
-        .group_by(Log.status)
+        select(Log.event_category, func.count(Log.id))
+        .where(Log.event_category != None)
+        .group_by(Log.event_category)
     ).all()
 
-    # 3.3. Conteo por Tipo de Acción (para las acciones especificadas)
-    # Filtramos logs que empiecen con "Acción '" y agrupamos por el contenido después de la comilla.
-    # Ejemplo: "Acción 'MOTOR_IZQ' creada..." -> Agrupa por "MOTOR_IZQ"
-    action_events = [
-        "Acción 'MOTOR_IZQ' creada para dispositivo",
-        "Acción 'MOTOR_DER' creada para dispositivo",
-        "Acción 'LED_ON' creada para dispositivo",
-        "Acción 'LED_OFF' creada para dispositivo",
-        "Dispositivo confirmó ejecución de acción 'MOTOR_IZQ'",
-        # Puedes añadir más aquí, pero me centraré en el nombre de la acción.
-    ]
-
-    # Usaremos una consulta que agrupa basándose en el nombre de la acción dentro del evento.
-    # Esto es complejo en SQL, una aproximación más sencilla y robusta es filtrar por LIKE y agrupar por el texto completo.
-    
-    # Consulta para contar logs cuyo evento comienza con "Acción '"
+    # 3.3. Conteo por Tipo de Acción (creaciones y confirmaciones)
+    # Agrupa directamente por las columnas estructuradas action_type / event_category.
     counts_by_action_type_raw = session.exec(
         select(
-            Log.event, 
+            Log.action_type,
+            Log.event_category,
             func.count(Log.id)
         )
         .where(
-            or_(
-                Log.event.ilike("Acción '% creada para dispositivo %"),
-                Log.event.ilike("Dispositivo confirmó ejecución de acción '%'")
-            )
+            Log.action_type != None,
+            Log.event_category.in_([EVENT_CREACION, EVENT_CONFIRMACION])
         )
-        .group_by(Log.event)
-        # Limitamos la consulta solo a los eventos más comunes para no saturar
-        .limit(20) 
+        .group_by(Log.action_type, Log.event_category)
     ).all()
     
-    # Post-procesamiento para limpiar el nombre del evento y obtener solo la acción
     counts_by_action_type: Dict[str, int] = {}
     
-    for event_text, count in counts_by_action_type_raw:
-        action_name = ""
-        if "Acción '" in event_text:
-            # Extrae 'MOTOR_IZQ' de "Acción 'MOTOR_IZQ' creada..."
-            try:
-                start = event_text.find("Acción '") + len("Acción '")
-                end = event_text.find("'", start)
-                action_name = event_text[start:end]
-            except:
-                action_name = event_text # Fallback
-        elif "Dispositivo confirmó ejecución de acción '" in event_text:
-            # Extrae 'MOTOR_IZQ' de "Dispositivo confirmó ejecución de acción 'MOTOR_IZQ'"
-            try:
-                start = event_text.find("acción '") + len("acción '")
-                end = event_text.find("'", start)
-                action_name = f"{event_text[start:end]} (Confirmado)"
-            except:
-                action_name = event_text # Fallback
-
-        if action_name:
-             counts_by_action_type[action_name] = counts_by_action_type.get(action_name, 0) + count
-        else:
-             counts_by_action_type[event_text] = counts_by_action_type.get(event_text, 0) + count
+    for action_name, category, count in counts_by_action_type_raw:
+        # Ejemplo: "MOTOR_IZQ" (creadas) y "MOTOR_IZQ (Confirmado)"
+        if category == EVENT_CONFIRMACION:
+            action_name = f"{action_name} (Confirmado)"
+        counts_by_action_type[action_name] = counts_by_action_type.get(action_name, 0) + count
 
 
     # 4. DEVOLVER RESPUESTA PAGINADA
@@ -147,4 +143,33 @@ def get_logs(
         counts_by_status=dict(counts_by_status),
         # 📝 Nuevo campo de conteo
         counts_by_action_type=counts_by_action_type, 
-    )
\ No newline at end of file
+        total_exact=total_exact,
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
+
+
+# ===============================================================
+# 🗄️ POST /logs/archive → Exportación incremental a Parquet
+# ===============================================================
+@router.post("/archive")
+def archive_logs(user=Depends(decode_token)):
+    """
+    Exporta los logs nuevos (desde el último id exportado) a archivos Parquet
+    particionados por día en LOG_ARCHIVE_DIR, para analítica fuera de la DB.
+    """
+    try:
+        return export_logs_archive()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+# ===============================================================
+# 🗄️ GET /logs/archive → Estado del archivo columnar
+# ===============================================================
+@router.get("/archive")
+def get_archive_state(user=Depends(decode_token)):
+    """
+    Último id exportado, filas y archivos escritos en el archivo columnar.
+    """
+    return {"directory": str(archive_dir()), **read_state()}
@@ -1,19 +1,36 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, status
-from fastapi.responses import FileResponse
-from sqlmodel import select, func, or_
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlmodel import select, func, or_, and_, case, true
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import os
 from pathlib import Path
-from core.database import Session, get_session
+from core.database import Session, get_session, engine
 from core.security import decode_token
 from models.logs import Log
 from models.actions_devices import ActionDevice
 from models.users import User
 from models.devices import Device
+from models.action_rollups import ActionRollup
+from core.rollups import hour_bucket
+from core.pagination import count_cache, encode_cursor, keyset_condition
+from core.result_cache import ResultCache
+from core.config import settings
+from core.log_queries import build_action_logs_query
+from core.report_jobs import report_jobs
+from core.log_export import EXPORT_MEDIA_TYPES, EXPORT_STREAMS
+from core.log_events import (
+    EVENT_CREACION, EVENT_CONFIRMACION, EVENT_LOGIN, EVENT_OTRO, USER_ACTION_CATEGORIES
+)
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
+# Caché corta de /reports/dashboard-stats (por proceso)
+dashboard_cache = ResultCache(
+    ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS,
+    stale_seconds=settings.DASHBOARD_CACHE_STALE_SECONDS,
+)
+
 # ===============================================================
 # 📊 GET /reports/actions-stats → Estadísticas de acciones
 # ===============================================================
@@ -31,38 +48,30 @@ def get_actions_stats(
     # Definir las acciones que queremos contar
     target_actions = ["MOTOR_STOP", "MOTOR_IZQ", "MOTOR_DER", "LED_ON", "LED_OFF"]
     
-    # Construir consulta base
-    query = select(Log)
+    # Consultar el rollup pre-agregado (dispositivo, acción, hora) en lugar de los logs
+    query = select(
+        ActionRollup.action,
+        func.sum(ActionRollup.count)
+    ).where(
+        ActionRollup.action.in_(target_actions)
+    )
     
     # Aplicar filtros
     if start_date:
-        query = query.where(Log.timestamp >= start_date)
+        query = query.where(ActionRollup.bucket >= hour_bucket(start_date))
     if end_date:
         # Añadir 1 día para incluir el día completo
         end_date_with_time = end_date + timedelta(days=1)
-        query = query.where(Log.timestamp < end_date_with_time)
+        query = query.where(ActionRollup.bucket < end_date_with_time)
     if device_id:
-        query = query.where(Log.id_device == device_id)
-    
-    # Filtrar solo logs de acciones
-    action_filters = []
-    for action in target_actions:
-        action_filters.append(Log.event.ilike(f"Acción '{action}'%"))
-        action_filters.append(Log.event.ilike(f"Dispositivo confirmó ejecución de acción '{action}'%"))
-    
-    query = query.where(or_(*action_filters))
+        query = query.where(ActionRollup.id_device == device_id)
     
-    # Obtener todos los logs filtrados
-    logs = session.exec(query).all()
+    query = query.group_by(ActionRollup.action)
     
     # Contar por tipo de acción
     action_counts = {action: 0 for action in target_actions}
-    
-    for log in logs:
-        for action in target_actions:
-            if f"'{action}'" in log.event:
-                action_counts[action] += 1
-                break
+    for action, count in session.exec(query).all():
+        action_counts[action] = int(count or 0)
     
     # Calcular totales
     total_actions = sum(action_counts.values())
@@ -89,78 +98,47 @@ def get_action_logs(
     user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
     event_type: Optional[str] = Query(None, description="Tipo de evento (creacion, confirmacion, ejecucion)"),
     page: int = Query(1, ge=1),
-    limit: int = Query(50, ge=1, le=200)
+    limit: int = Query(50, ge=1, le=200),
+    use_cursor: bool = Query(False, description="Paginación por cursor (keyset) en lugar de OFFSET"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor")
 ):
     """
     Obtiene logs detallados de acciones con filtros avanzados, paginación y hora Colombia.
+    Con use_cursor/cursor la página se busca por índice y el total sale de una caché corta.
     """
-    # Construir consulta base con joins
-    query = select(
-        Log,
-        User.username,
-        Device.name.label("device_name"),
-        ActionDevice.action.label("action_name")
-    ).join(
-        User, Log.id_user == User.id
-    ).join(
-        Device, Log.id_device == Device.id
-    ).outerjoin(
-        ActionDevice, Log.id_action == ActionDevice.id
-    )
+    # Construir consulta base con joins y filtros
+    query = build_action_logs_query(start_date, end_date, device_id, user_id, action_type, event_type)
     
-    # Aplicar filtros
-    if start_date:
-        query = query.where(Log.timestamp >= start_date)
-    if end_date:
-        end_date_with_time = end_date + timedelta(days=1)
-        query = query.where(Log.timestamp < end_date_with_time)
-    if device_id:
-        query = query.where(Log.id_device == device_id)
-    if user_id:
-        query = query.where(Log.id_user == user_id)
-    if action_type:
-        query = query.where(Log.event.ilike(f"%'{action_type}'%"))
-    if event_type:
-        if event_type == "creacion":
-            query = query.where(Log.event.ilike("Acción '% creada para dispositivo%"))
-        elif event_type == "confirmacion":
-            query = query.where(Log.event.ilike("Dispositivo confirmó ejecución de acción%"))
-        elif event_type == "ejecucion":
-            query = query.where(Log.event.ilike("Acción ejecutada correctamente"))
-    
-    # Ordenar por fecha descendente
-    query = query.order_by(Log.timestamp.desc())
-    
-    # Paginación
-    offset = (page - 1) * limit
+    # Ordenar por fecha descendente (id desempata para que el cursor sea estable)
+    query = query.order_by(Log.timestamp.desc(), Log.id.desc())
     
     # Obtener total
-    total_query = select(func.count()).select_from(query.subquery())
-    total = session.exec(total_query).one()
+    total_query = select(func.count()).select_from(query.order_by(None).subquery())
     
-    # Obtener datos paginados
-    results = session.exec(query.offset(offset).limit(limit)).all()
+    next_cursor = None
+    if use_cursor or cursor:
+        # Paginación keyset: buscar después de (timestamp, id) del último registro
+        cache_key = ("action-logs", start_date, end_date, device_id, user_id, action_type, event_type)
+        total, total_exact = count_cache.get_or_compute(cache_key, lambda: session.exec(total_query).one())
+        if cursor:
+            query = query.where(keyset_condition(Log.timestamp, Log.id, cursor))
+        results = session.exec(query.limit(limit + 1)).all()
+        has_more = len(results) > limit
+        results = results[:limit]
+        if has_more:
+            last_log = results[-1][0]
+            next_cursor = encode_cursor(last_log.timestamp, last_log.id)
+    else:
+        # Paginación clásica por página
+        offset = (page - 1) * limit
+        total = session.exec(total_query).one()
+        total_exact = True
+        results = session.exec(query.offset(offset).limit(limit)).all()
+        has_more = offset + len(results) < total
     
     # Procesar resultados CON HORA COLOMBIA
     logs_data = []
     for log, username, device_name, action_name in results:
-        # Determinar el tipo de acción desde el evento
-        detected_action = None
-        action_types = ["MOTOR_STOP", "MOTOR_IZQ", "MOTOR_DER", "LED_ON", "LED_OFF"]
-        for action in action_types:
-            if f"'{action}'" in log.event:
-                detected_action = action
-                break
-        
-        # Determinar tipo de evento
-        event_category = "otro"
-        if "creada para dispositivo" in log.event:
-            event_category = "creacion"
-        elif "confirmó ejecución" in log.event:
-            event_category = "confirmacion"
-        elif "ejecutada correctamente" in log.event:
-            event_category = "ejecucion"
-        
         # ✅ CONVERTIR A HORA COLOMBIA
         from core.time_utils import format_colombia_time
         colombia_time = format_colombia_time(log.timestamp)
@@ -171,8 +149,8 @@ def get_action_logs(
             "timestamp": log.timestamp,  
             "timestamp_colombia": colombia_time,  
             "event": log.event,
-            "action_type": detected_action or action_name,
-            "event_category": event_category,
+            "action_type": log.action_type or action_name,
+            "event_category": log.event_category or EVENT_OTRO,
             "username": username,
             "device_name": device_name,
             "id_device": log.id_device,
@@ -196,6 +174,9 @@ def get_action_logs(
         "page": page,
         "limit": limit,
         "pages": pages,
+        "total_exact": total_exact,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
         "timezone_info": timezone_info,  
         "filters": {
             "action_type": action_type,
@@ -210,7 +191,7 @@ def get_action_logs(
 # ===============================================================
 # 📄 POST /reports/export-logs-pdf → Exportar logs a PDF
 # ===============================================================
-@router.post("/export-logs-pdf")
+@router.post("/export-logs-pdf", status_code=status.HTTP_202_ACCEPTED)
 async def export_logs_to_pdf(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
@@ -219,145 +200,96 @@ async def export_logs_to_pdf(
     action_type: Optional[str] = None,
     event_type: Optional[str] = None,
     limit: Optional[int] = 1000,
-    session: Session = Depends(get_session),
     user_auth=Depends(decode_token),
 ):
     """
-    Exporta logs de acciones a PDF con hora Colombia.
+    Encola la exportación de logs de acciones a PDF (hora Colombia).
+    Responde de inmediato con el id del trabajo; el estado y el archivo se
+    consultan en GET /reports/jobs/{job_id}.
     """
-    try:
-        # Obtener el directorio base del proyecto
-        BASE_DIR = Path(__file__).parent.parent
-        REPORTS_DIR = BASE_DIR / "static" / "reports"
-        
-        # Crear directorio si no existe
-        REPORTS_DIR.mkdir(parents=True, exist_ok=True)
-        
-        # Generar nombre de archivo único
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"action_logs_report_{timestamp}.pdf"
-        filepath = REPORTS_DIR / filename
-        
-        # Obtener datos para el PDF
-        query = select(
-            Log,
-            User.username,
-            Device.name.label("device_name"),
-            ActionDevice.action.label("action_name")
-        ).join(
-            User, Log.id_user == User.id
-        ).join(
-            Device, Log.id_device == Device.id
-        ).outerjoin(
-            ActionDevice, Log.id_action == ActionDevice.id
-        )
-        
-        # Aplicar filtros
-        if start_date:
-            query = query.where(Log.timestamp >= start_date)
-        if end_date:
-            end_date_with_time = end_date + timedelta(days=1)
-            query = query.where(Log.timestamp < end_date_with_time)
-        if device_id:
-            query = query.where(Log.id_device == device_id)
-        if user_id:
-            query = query.where(Log.id_user == user_id)
-        if action_type:
-            query = query.where(Log.event.ilike(f"%'{action_type}'%"))
-        if event_type:
-            if event_type == "creacion":
-                query = query.where(Log.event.ilike("Acción '% creada para dispositivo%"))
-            elif event_type == "confirmacion":
-                query = query.where(Log.event.ilike("Dispositivo confirmó ejecución de acción%"))
-            elif event_type == "ejecucion":
-                query = query.where(Log.event.ilike("Acción ejecutada correctamente"))
-        
-        # Ordenar por fecha descendente
-        query = query.order_by(Log.timestamp.desc())
-        
-        # ✅ CORREGIR: Asegurar que limit sea integer
-        if limit:
-            try:
-                limit = int(limit)  # Convertir a integer
-                if limit > 5000:  # Límite máximo de seguridad
-                    limit = 5000
-                query = query.limit(limit)
-            except (ValueError, TypeError):
-                # Si hay error en la conversión, usar valor por defecto
-                query = query.limit(1000)
-        
-        # Ejecutar consulta
-        results = session.exec(query).all()
-        
-        # Procesar datos para el PDF
-        pdf_data = []
-        for log, username, device_name, action_name in results:
-            # Determinar acción desde el evento
-            detected_action = None
-            action_types = ["MOTOR_STOP", "MOTOR_IZQ", "MOTOR_DER", "LED_ON", "LED_OFF"]
-            for action in action_types:
-                if f"'{action}'" in log.event:
-                    detected_action = action
-                    break
-            
-            pdf_data.append({
-                "timestamp": log.timestamp,  # Mantener timestamp original
-                "event": log.event,
-                "action": detected_action or action_name or "N/A",
-                "username": username,
-                "device_name": device_name
-            })
-        
-        # ✅ USAR LA FUNCIÓN CORREGIDA
-        from core.pdf_generator import generate_logs_pdf
-        
-        # ✅ PREPARAR FILTROS CORRECTAMENTE
-        filters_dict = {
-            "start_date": start_date,
-            "end_date": end_date,
-            "device_id": device_id,
-            "user_id": user_id,
-            "action_type": action_type,
-            "event_type": event_type,
-            "limit": limit
-        }
-        
-        success = generate_logs_pdf(pdf_data, str(filepath), filters_dict)
-        
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error al generar el archivo PDF"
-            )
-        
-        # Verificar que el archivo se creó
-        if not filepath.exists():
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="El archivo PDF no se pudo crear"
-            )
-        
-        print(f"✅ PDF con hora Colombia generado exitosamente: {filepath}")
-        
-        return {
-            "message": "PDF generado exitosamente",
-            "filename": filename,
-            "filepath": f"/static/reports/{filename}",
-            "file_url": f"/static/reports/{filename}",
-            "records_exported": len(pdf_data),
-            "generated_at": datetime.now().isoformat(),
-            "file_size": f"{filepath.stat().st_size / 1024:.1f} KB",
-            "timezone": "Hora Colombia (UTC-5)"
-        }
-        
-    except Exception as e:
-        print(f"❌ Error generando PDF: {str(e)}")
-        import traceback
-        traceback.print_exc()  # ✅ PARA DEBUG DETALLADO
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generando PDF: {str(e)}"
-        )
+    # ✅ CORREGIR: Asegurar que limit sea integer
+    if limit:
+        try:
+            limit = int(limit)  # Convertir a integer
+            if limit > settings.REPORT_MAX_ROWS:  # Límite máximo de seguridad
+                limit = settings.REPORT_MAX_ROWS
+        except (ValueError, TypeError):
+            # Si hay error en la conversión, usar valor por defecto
+            limit = 1000
+    
+    # ✅ PREPARAR FILTROS CORRECTAMENTE
+    filters_dict = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "device_id": device_id,
+        "user_id": user_id,
+        "action_type": action_type,
+        "event_type": event_type,
+        "limit": limit
+    }
+    
+    job = await report_jobs.submit(filters_dict)
+    print(f"📄 Reporte PDF {'reutilizado' if job.cached else 'en cola'}: {job.id}")
+    
+    return {
+        "message": "Reporte PDF reutilizado" if job.cached else "Reporte PDF en cola",
+        "job_id": job.id,
+        "status": job.status,
+        "cached": job.cached,
+        "status_url": f"/reports/jobs/{job.id}"
+    }
+
+# ===============================================================
+# 📤 GET /reports/export-logs → Exportación completa en CSV / NDJSON
+# ===============================================================
+@router.get("/export-logs")
+def export_logs(
+    user=Depends(decode_token),
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="Formato: csv o ndjson"),
+    action_type: Optional[str] = Query(None, description="Tipo de acción (MOTOR_STOP, MOTOR_IZQ, etc)"),
+    start_date: Optional[datetime] = Query(None, description="Fecha inicio (YYYY-MM-DD)"),
+    end_date: Optional[datetime] = Query(None, description="Fecha fin (YYYY-MM-DD)"),
+    device_id: Optional[int] = Query(None, description="Filtrar por dispositivo"),
+    user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
+    event_type: Optional[str] = Query(None, description="Tipo de evento (creacion, confirmacion, ejecucion)"),
+):
+    """
+    Exporta todos los logs que cumplen los filtros (sin tope de filas), en streaming.
+    Las filas salen por lotes desde un cursor del lado del servidor, así la memoria
+    es constante sin importar el tamaño del histórico. Timestamps en UTC (ISO 8601).
+    """
+    filters_dict = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "device_id": device_id,
+        "user_id": user_id,
+        "action_type": action_type,
+        "event_type": event_type,
+    }
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    print(f"📤 Exportando logs en {format}: {filters_dict}")
+
+    return StreamingResponse(
+        EXPORT_STREAMS[format](filters_dict),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="action_logs_{timestamp}.{format}"'},
+    )
+
+# ===============================================================
+# ⏳ GET /reports/jobs/{job_id} → Estado de un reporte en cola
+# ===============================================================
+@router.get("/jobs/{job_id}")
+def get_report_job(
+    job_id: str,
+    user=Depends(decode_token),
+):
+    """
+    Devuelve el estado y progreso de un reporte. Al completarse incluye el archivo generado.
+    """
+    job = report_jobs.get_state(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trabajo de reporte no encontrado")
+    return job
 
 # ===============================================================
 # 📥 GET /reports/download-pdf/{filename} → Descargar PDF
@@ -452,75 +384,73 @@ def generate_simple_pdf(data: List[Dict[str, Any]], filename: str, filters: Dict
 # ===============================================================
 @router.get("/dashboard-stats")
 def get_dashboard_stats(
-    session: Session = Depends(get_session),
     user=Depends(decode_token),
 ):
     """
     Obtiene estadísticas generales para el dashboard incluyendo LED_OFF.
+    Se sirven desde una caché por proceso de pocos segundos: N pestañas abiertas
+    cuestan una sola consulta por intervalo.
     """
     try:
-        # Total de logs
-        total_logs = session.exec(select(func.count(Log.id))).one()
-        
-        # Logs de hoy
-        today = datetime.now().date()
-        logs_today = session.exec(
-            select(func.count(Log.id)).where(Log.timestamp >= today)
-        ).one()
+        return cached_dashboard_stats()
         
-        # Usuarios activos (que han generado logs hoy)
-        active_users = session.exec(
-            select(func.count(func.distinct(Log.id_user))).where(Log.timestamp >= today)
-        ).one()
-        
-        # Dispositivos activos
-        active_devices = session.exec(
-            select(func.count(func.distinct(Log.id_device))).where(Log.timestamp >= today)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error obteniendo estadísticas: {str(e)}"
+        )
+
+def cached_dashboard_stats() -> Dict[str, Any]:
+    """Estadísticas del dashboard de hoy, desde la caché (también usado por /ws/dashboard)."""
+    today = datetime.now().date()
+    return dashboard_cache.get_or_compute(("dashboard-stats", today), lambda: _compute_dashboard_stats(today))
+
+def _compute_dashboard_stats(today) -> Dict[str, Any]:
+    """Calcula las estadísticas del dashboard: el total y una agregación condicional sobre los logs de hoy."""
+    action_types = ["MOTOR_STOP", "MOTOR_IZQ", "MOTOR_DER", "LED_ON", "LED_OFF"]
+    is_today = Log.timestamp >= today
+    
+    # Abre su propia sesión: también se ejecuta desde el hilo de refresco de la caché
+    with Session(engine) as session:
+        # ✅ TOTAL HISTÓRICO: único agregado sin filtro (recorre el índice más chico)
+        total_logs = session.exec(select(func.count()).select_from(Log)).one()
+
+        # ✅ ACTIVOS Y CONTEO POR ACCIÓN DE HOY: rango sobre ix_logs_timestamp, no toda la tabla
+        counters = session.exec(
+            select(
+                func.count(Log.id),
+                func.count(func.distinct(Log.id_user)),
+                func.count(func.distinct(Log.id_device)),
+                *[
+                    func.sum(case((and_(Log.event_category == EVENT_CREACION, Log.action_type == action), 1), else_=0))
+                    for action in action_types
+                ]
+            ).where(is_today)
         ).one()
+        logs_today, active_users, active_devices = counters[:3]
+        action_counts = {action: int(count or 0) for action, count in zip(action_types, counters[3:])}
         
         # ✅ ACCIONES MÁS COMUNES HOY (INCLUYENDO LED_OFF)
         common_actions_query = select(Log.event, func.count(Log.id)).where(
-            Log.timestamp >= today,
+            is_today,
             or_(
-                Log.event.ilike("Acción 'MOTOR_STOP%"),
-                Log.event.ilike("Acción 'MOTOR_IZQ%"),
-                Log.event.ilike("Acción 'MOTOR_DER%"),
-                Log.event.ilike("Acción 'LED_ON%"),
-                Log.event.ilike("Acción 'LED_OFF%"),  # ✅ AGREGADO
-                Log.event.ilike("Dispositivo confirmó ejecución%")
+                and_(Log.event_category == EVENT_CREACION, Log.action_type.in_(action_types)),
+                Log.event_category == EVENT_CONFIRMACION
             )
         ).group_by(Log.event).order_by(func.count(Log.id).desc()).limit(10)
         
         common_actions = session.exec(common_actions_query).all()
-        
-        # ✅ CONTEO POR TIPO DE ACCIÓN ESPECÍFICO
-        action_counts = {}
-        action_types = ["MOTOR_STOP", "MOTOR_IZQ", "MOTOR_DER", "LED_ON", "LED_OFF"]
-        
-        for action in action_types:
-            count = session.exec(
-                select(func.count(Log.id)).where(
-                    Log.timestamp >= today,
-                    Log.event.ilike(f"Acción '{action}%")
-                )
-            ).first()
-            action_counts[action] = count or 0
-        
-        return {
-            "total_logs": total_logs,
-            "logs_today": logs_today,
-            "active_users": active_users,
-            "active_devices": active_devices,
-            "common_actions_today": dict(common_actions),
-            "action_counts_today": action_counts,  # ✅ NUEVO: conteo por acción
-            "last_updated": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error obteniendo estadísticas: {str(e)}"
-        )
+    
+    return {
+        "total_logs": total_logs,
+        "logs_today": int(logs_today or 0),
+        "active_users": active_users,
+        "active_devices": active_devices,
+        "common_actions_today": dict(common_actions),
+        "action_counts_today": action_counts,  # ✅ NUEVO: conteo por acción
+        "last_updated": datetime.now().isoformat()
+    }
+
 # ===============================================================
 # 👤 GET /reports/user-activity → Actividad de usuarios
 # ===============================================================
@@ -538,96 +468,53 @@ def get_user_activity(
     Obtiene estadísticas de actividad por usuario con hora Colombia.
     """
     try:
-        # Consulta base para usuarios
-        users_query = select(User)
-        users = session.exec(users_query).all()
+        # Condición de periodo (se aplica dentro de los agregados condicionales)
+        in_period = []
+        if start_date:
+            in_period.append(Log.timestamp >= start_date)
+        if end_date:
+            end_date_with_time = end_date + timedelta(days=1)
+            in_period.append(Log.timestamp < end_date_with_time)
+        period_cond = and_(*in_period) if in_period else true()
+        
+        # ====================
+        # UNA SOLA CONSULTA AGRUPADA POR USUARIO:
+        # logins, acciones y total en el periodo + última actividad (histórica)
+        # ====================
+        activity = select(
+            Log.id_user.label("id_user"),
+            func.sum(case((and_(period_cond, Log.event_category == EVENT_LOGIN), 1), else_=0)).label("login_count"),
+            func.sum(case((and_(period_cond, Log.event_category.in_(USER_ACTION_CATEGORIES)), 1), else_=0)).label("actions_created"),
+            func.sum(case((period_cond, 1), else_=0)).label("total_requests"),
+            func.max(Log.timestamp).label("last_activity")
+        ).where(
+            Log.id_user != None
+        ).group_by(Log.id_user).subquery()
+        
+        users_query = select(
+            User,
+            activity.c.login_count,
+            activity.c.actions_created,
+            activity.c.total_requests,
+            activity.c.last_activity
+        ).outerjoin(activity, activity.c.id_user == User.id)
         
+        from core.time_utils import format_colombia_time
         user_activity = []
         
-        for user_obj in users:
-            user_stats = {
+        for user_obj, login_count, actions_created, total_requests, last_activity in session.exec(users_query).all():
+            user_activity.append({
                 "user_id": user_obj.id,
                 "username": user_obj.username,
                 "name": user_obj.name,
                 "email": user_obj.email,
-                "total_requests": 0,
-                "login_count": 0,
-                "actions_created": 0,
-                "last_activity": None,
-                "last_activity_colombia": None  # ✅ NUEVO: Hora Colombia
-            }
-            
-            # ====================
-            # 1. CONTAR LOGINS
-            # ====================
-            if include_logins:
-                login_query = select(func.count(Log.id)).where(
-                    Log.id_user == user_obj.id,
-                    Log.event.ilike("%inició sesión%")
-                )
-                
-                if start_date:
-                    login_query = login_query.where(Log.timestamp >= start_date)
-                if end_date:
-                    end_date_with_time = end_date + timedelta(days=1)
-                    login_query = login_query.where(Log.timestamp < end_date_with_time)
-                
-                login_count = session.exec(login_query).first()
-                user_stats["login_count"] = login_count or 0
-            
-            # ====================
-            # 2. CONTAR ACCIONES CREADAS
-            # ====================
-            if include_actions:
-                actions_query = select(func.count(Log.id)).where(
-                    Log.id_user == user_obj.id,
-                    or_(
-                        Log.event.ilike("Acción '% creada para dispositivo%"),
-                        Log.event.ilike("Acción ejecutada correctamente"),
-                        Log.event.ilike("Acción marcada como no ejecutada")
-                    )
-                )
-                
-                if start_date:
-                    actions_query = actions_query.where(Log.timestamp >= start_date)
-                if end_date:
-                    end_date_with_time = end_date + timedelta(days=1)
-                    actions_query = actions_query.where(Log.timestamp < end_date_with_time)
-                
-                actions_count = session.exec(actions_query).first()
-                user_stats["actions_created"] = actions_count or 0
-            
-            # ====================
-            # 3. CONTAR TOTAL DE PETICIONES
-            # ====================
-            total_query = select(func.count(Log.id)).where(
-                Log.id_user == user_obj.id
-            )
-            
-            if start_date:
-                total_query = total_query.where(Log.timestamp >= start_date)
-            if end_date:
-                end_date_with_time = end_date + timedelta(days=1)
-                total_query = total_query.where(Log.timestamp < end_date_with_time)
-            
-            total_requests = session.exec(total_query).first()
-            user_stats["total_requests"] = total_requests or 0
-            
-            # ====================
-            # 4. OBTENER ÚLTIMA ACTIVIDAD CON HORA COLOMBIA
-            # ====================
-            last_activity_query = select(Log.timestamp).where(
-                Log.id_user == user_obj.id
-            ).order_by(Log.timestamp.desc()).limit(1)
-            
-            last_activity = session.exec(last_activity_query).first()
-            if last_activity:
-                user_stats["last_activity"] = last_activity
+                "total_requests": int(total_requests or 0),
+                "login_count": int(login_count or 0) if include_logins else 0,
+                "actions_created": int(actions_created or 0) if include_actions else 0,
+                "last_activity": last_activity,
                 # ✅ CONVERTIR A HORA COLOMBIA
-                from core.time_utils import format_colombia_time
-                user_stats["last_activity_colombia"] = format_colombia_time(last_activity)
-            
-            user_activity.append(user_stats)
+                "last_activity_colombia": format_colombia_time(last_activity) if last_activity else None
+            })
         
         # Ordenar por total de peticiones (descendente)
         user_activity.sort(key=lambda x: x["total_requests"], reverse=True)
@@ -677,7 +564,7 @@ def get_login_stats(
         ).join(
             User, Log.id_user == User.id
         ).where(
-            Log.event.ilike("%inició sesión%")
+            Log.event_category == EVENT_LOGIN
         )
         
         # Aplicar filtros de fecha
@@ -4,6 +4,7 @@ from typing import Annotated, List
 from sqlmodel import Session, select
 
 from core.database import get_session 
+from core.auth_cache import auth_cache
 from models.users import User
 from schemas.users_schema import UserRead, UserUpdate
 
@@ -51,6 +52,7 @@ def update_user(
     session.add(user)
     session.commit()
     session.refresh(user)
+    auth_cache.invalidate_user(user_id)
     return user
 
 # ===============================================================
@@ -67,4 +69,5 @@ def delete_user(
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     session.delete(user)
     session.commit()
+    auth_cache.invalidate_user(user_id)
     return {"message": "Usuario eliminado correctamente"}
\ No newline at end of file
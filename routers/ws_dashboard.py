@@ -0,0 +1,88 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from sqlmodel import Session
+from typing import List, Optional
+from core.database import engine
+from core.security import verify_token
+from core.dashboard_stream import dashboard_stream
+from core.websocket_manager import manager, TOPIC_DASHBOARD, TOPIC_LOGS, user_topic
+from routers.reports import cached_dashboard_stats
+import json
+
+router = APIRouter()
+
+def _authenticate(token: str):
+    with Session(engine) as session:
+        return verify_token(token, session)
+
+def _valid_topics(topics: List[str], user_id: int) -> Optional[List[str]]:
+    """Temas permitidos: dashboard, logs, device:{id} y solo el user:{id} propio."""
+    for topic in topics:
+        kind, _, value = topic.partition(":")
+        if topic in (TOPIC_DASHBOARD, TOPIC_LOGS):
+            continue
+        if kind == "device" and value.isdigit():
+            continue
+        if topic == user_topic(user_id):
+            continue
+        return None
+    return topics
+
+@router.websocket("/ws/dashboard")
+async def dashboard_websocket(websocket: WebSocket, token: str = "", topics: str = TOPIC_DASHBOARD):
+    """
+    Canal en vivo para tableros y apps. Solo llegan los mensajes de los temas suscritos:
+    - "dashboard": snapshot inicial de /reports/dashboard-stats y luego frames
+      "dashboard_batch" con los cambios acumulados en cada tick.
+    - "logs", "device:{id}", "user:{id}": cada evento al instante.
+    Autenticación: ws://.../ws/dashboard?token=<JWT>&topics=device:3,logs (por defecto "dashboard").
+    Para cambiar de temas: {"type": "subscribe" | "unsubscribe", "topics": [...]}.
+    """
+    try:
+        user = await run_in_threadpool(_authenticate, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    initial = _valid_topics([t for t in topics.split(",") if t], user.id)
+    if initial is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await manager.connect(websocket)
+    try:
+        await _subscribe(websocket, initial)
+
+        while True:
+            data = await websocket.receive_text()
+            # Pings en texto plano; el resto son cambios de suscripción
+            if data == "ping":
+                await manager.send_json(websocket, {"type": "pong"})
+                continue
+            try:
+                message = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            requested = message.get("topics") if isinstance(message, dict) else None
+            if not isinstance(requested, list) or _valid_topics(requested, user.id) is None:
+                await manager.send_json(websocket, {"type": "error", "message": "Temas no válidos"})
+            elif message.get("type") == "subscribe":
+                await _subscribe(websocket, requested)
+            elif message.get("type") == "unsubscribe":
+                current = manager.unsubscribe(websocket, requested)
+                await manager.send_json(websocket, {"type": "subscribed", "topics": current})
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket)
+
+async def _subscribe(websocket: WebSocket, topics: List[str]):
+    new_dashboard = TOPIC_DASHBOARD in topics and TOPIC_DASHBOARD not in manager.subscriptions(websocket)
+    current = manager.subscribe(websocket, topics)
+    await manager.send_json(websocket, {"type": "subscribed", "topics": current})
+    if new_dashboard:
+        dashboard_stream.start()
+        # 📸 Snapshot inicial (desde la caché del dashboard)
+        snapshot = await run_in_threadpool(cached_dashboard_stats)
+        await manager.send_json(websocket, {"type": "dashboard_snapshot", "stats": snapshot})
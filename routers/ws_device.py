@@ -1,5 +1,7 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from core.websocket_manager import manager
+from core.action_dispatcher import action_dispatcher
+from core.device_presence import device_presence
 import json
 
 router = APIRouter()
@@ -9,18 +11,28 @@ async def websocket_endpoint(websocket: WebSocket, device_id: int):
     await manager.connect(websocket)
     
     # 🔥 REGISTRAR CORRECTAMENTE EL DISPOSITIVO
-    manager.device_connections[device_id] = websocket
+    manager.register_device(device_id, websocket)
     print(f"✅ Dispositivo {device_id} conectado vía WebSocket")
+    device_presence.connected(device_id, websocket)
+    # Acciones creadas mientras estaba desconectado, en orden
+    await action_dispatcher.flush(device_id)
 
     try:
         while True:
             data = await websocket.receive_text()
-            print(f"📩 Mensaje recibido del dispositivo {device_id}: {data}")
+            # Cualquier mensaje del dispositivo cuenta como latido
+            device_presence.seen(device_id)
             
             # Procesar mensajes del dispositivo
             try:
                 message = json.loads(data)
                 message_type = message.get("type")
+
+                # Respuesta al ping de presencia: solo mide el RTT
+                if message_type == "pong":
+                    device_presence.pong(device_id, message)
+                    continue
+                print(f"📩 Mensaje recibido del dispositivo {device_id}: {data}")
                 
                 # Manejar autenticación desde el dispositivo
                 if message_type == "auth":
@@ -35,9 +47,10 @@ async def websocket_endpoint(websocket: WebSocket, device_id: int):
                         print(f"🔐 Dispositivo {device_id} autenticado")
                         
             except json.JSONDecodeError:
-                print("❌ Mensaje no es JSON válido")
+                print(f"❌ Mensaje no es JSON válido: {data}")
                 
     except WebSocketDisconnect:
+        print(f"❌ Dispositivo {device_id} desconectado")
+    finally:
         manager.disconnect(websocket)
-        manager.device_connections.pop(device_id, None)
-        print(f"❌ Dispositivo {device_id} desconectado")
\ No newline at end of file
+        device_presence.disconnected(device_id, websocket)
\ No newline at end of file
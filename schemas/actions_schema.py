@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -11,6 +11,11 @@ class ActionDeviceCreate(BaseModel):
     created_by: Optional[int] = None
 
 
+# 📦 Crear varias acciones de una vez (secuencias del teclado o scripts)
+class ActionDeviceBatchCreate(BaseModel):
+    actions: List[ActionDeviceCreate]
+
+
 # 📖 Leer una acción registrada (CORREGIDO)
 class ActionDeviceRead(BaseModel):
     id: int
@@ -77,4 +77,18 @@ class DeviceUpdateIP(BaseModel):
         return v
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# =====================================================
+# 📶 PRESENCIA (desde memoria)
+# =====================================================
+class DevicePresenceRead(BaseModel):
+    device_id: int
+    online: bool
+    worker: Optional[str] = None
+    # Solo para dispositivos conectados al worker que responde
+    connected_since: Optional[datetime] = None
+    connected_seconds: Optional[float] = None
+    last_heartbeat: Optional[datetime] = None
+    rtt_ms: Optional[float] = None
+    avg_rtt_ms: Optional[float] = None
@@ -7,9 +7,11 @@ from pydantic import BaseModel
 # =====================================================
 class LogBase(BaseModel):
     id_device: int  # ✅ Corregir: era "id_devices"
-    id_user: int
+    id_user: Optional[int] = None  # None en eventos confirmados por el IoT
     id_action: Optional[int] = None  # ✅ Ya está bien
     event: str
+    action_type: Optional[str] = None
+    event_category: Optional[str] = None
     status: Optional[str] = None  # ✅ Hacer opcional si no siempre se usa
 
 # =====================================================
@@ -23,7 +25,7 @@ class LogCreate(LogBase):
 # =====================================================
 class LogRead(LogBase):
     id: int
-    created_at: datetime
+    timestamp: datetime
 
     class Config:
         from_attributes = True
@@ -53,6 +55,10 @@ class LogReadPaginated(BaseModel):
     counts_by_status: Dict[str, int]
     # 📝 Nuevo campo añadido para el recuento de eventos de acción
     counts_by_action_type: Dict[str, int] 
+    # 🔖 Paginación por cursor (opcional)
+    total_exact: bool = True
+    has_more: bool = False
+    next_cursor: Optional[str] = None
     
     class Config:
         from_attributes = True
\ No newline at end of file
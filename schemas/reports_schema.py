@@ -39,6 +39,9 @@ class LogsReportResponse(BaseModel):
     page: int
     limit: int
     pages: int
+    total_exact: bool = True
+    has_more: bool = False
+    next_cursor: Optional[str] = None
     filters: Dict[str, Any]
 
     class Config:
@@ -0,0 +1,125 @@
+# tests/test_planes_logs.py
+"""
+Verifica que las consultas de los endpoints de logs/reportes usen índices.
+
+Levanta la API contra una base SQLite temporal, ejecuta cada endpoint con sus
+filtros, captura el SQL real que toca la tabla logs y corre EXPLAIN QUERY PLAN
+sobre cada sentencia. Falla si:
+- una consulta hace un escaneo completo de logs,
+- un ORDER BY timestamp necesita un B-tree temporal,
+- una consulta sin WHERE ni LIMIT (agregado sobre todo el histórico) no está
+  en AGREGADOS_SIN_FILTRO: cada lectura completa de logs tiene que ser explícita.
+
+Uso: python -m pytest tests/test_planes_logs.py
+"""
+import os
+import re
+import tempfile
+
+import pytest
+
+_tmpdir = tempfile.mkdtemp(prefix="planes_logs_")
+# Siempre una base temporal: nunca tocar la DATABASE_URL real
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'planes.db')}"
+os.environ.setdefault("SECRET_KEY", "verificar-planes")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+
+import main
+from core.database import engine
+
+engine.echo = False
+
+# Consultas (endpoint, parámetros) a verificar
+CASOS = [
+    ("/reports/action-logs", {}),
+    ("/reports/action-logs", {"device_id": 1}),
+    ("/reports/action-logs", {"user_id": 1}),
+    ("/reports/action-logs", {"action_type": "MOTOR_IZQ"}),
+    ("/reports/action-logs", {"event_type": "creacion"}),
+    ("/reports/action-logs", {"start_date": "2024-01-01", "end_date": "2030-01-01"}),
+    ("/reports/actions-stats", {"device_id": 1}),
+    ("/reports/dashboard-stats", {}),
+    ("/reports/user-activity", {"start_date": "2024-01-01"}),
+    ("/reports/login-stats", {}),
+    ("/logs/", {"id_device": 1}),
+    ("/logs/", {"action_type": "MOTOR_IZQ"}),
+    ("/logs/", {"use_cursor": True, "cursor": "WyIyMDMwLTAxLTAxVDAwOjAwOjAwIiwgMV0"}),
+]
+
+# Lecturas completas de logs aceptadas a conciencia: (endpoint, patrón del SQL, motivo).
+# Una consulta nueva sin WHERE ni LIMIT falla hasta que se agregue aquí.
+AGREGADOS_SIN_FILTRO = [
+    ("/reports/action-logs", r"^SELECT count\(",
+     "total de la paginación cuando no hay filtros"),
+    ("/reports/dashboard-stats", r"^SELECT count\(\*\) AS count_1 FROM logs$",
+     "total_logs: conteo histórico sobre el índice más chico"),
+    ("/logs/", r"^SELECT count\(\*\) AS count_1 FROM \(SELECT .* FROM logs\) AS anon_1$",
+     "total del listado sin filtros (con cursor sale de count_cache)"),
+    ("/logs/", r"GROUP BY devices\.name$",
+     "conteo por dispositivo de todo el histórico, metadatos del listado"),
+]
+
+# "SCAN logs" sin índice (SQLite >= 3.36 usa "SCAN logs", antes "SCAN TABLE logs")
+FULL_SCAN = re.compile(r"\bSCAN (TABLE )?logs\b(?!.*\bUSING\b)")
+TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+ORDER_BY_TIMESTAMP = re.compile(r"ORDER BY logs\.timestamp", re.IGNORECASE)
+WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        client.post("/api/auth/register", json={
+            "username": "planes", "email": "planes@example.com", "name": "Planes", "password": "planes"
+        })
+        r = client.post("/api/auth/login", data={"username": "planes", "password": "planes"})
+        client.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+        client.post("/devices/", json={"name": "esp32-planes"})
+        for action in ["MOTOR_IZQ", "MOTOR_DER", "LED_ON"]:
+            client.post("/actions/", json={"id_device": 1, "action": action})
+        yield client
+
+
+def capturar_consultas(client, path, params):
+    """Ejecuta el endpoint y devuelve los SELECT sobre logs que emitió."""
+    capturadas = []
+
+    def _listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and re.search(r"\blogs\b", statement):
+            capturadas.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _listener)
+    try:
+        r = client.get(path, params=params)
+    finally:
+        event.remove(engine, "before_cursor_execute", _listener)
+    assert r.status_code == 200, f"{path} {params} respondió {r.status_code}: {r.text[:200]}"
+    return capturadas
+
+
+def es_agregado_permitido(path, sql):
+    return any(path == p and re.search(patron, sql) for p, patron, _ in AGREGADOS_SIN_FILTRO)
+
+
+@pytest.mark.parametrize("path,params", CASOS, ids=[f"{path} {params}" for path, params in CASOS])
+def test_consultas_de_logs_usan_indices(client, path, params):
+    consultas = capturar_consultas(client, path, params)
+    problemas = []
+    with engine.connect() as conn:
+        for statement, parameters in consultas:
+            plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            detalles = [row[-1] for row in plan]
+            sql = " ".join(statement.split())
+            sin_filtro = not WHERE.search(sql) and not LIMIT.search(sql)
+            if sin_filtro and not es_agregado_permitido(path, sql):
+                problemas.append("lee todo logs sin estar en AGREGADOS_SIN_FILTRO")
+            if not sin_filtro:
+                problemas += [d for d in detalles if FULL_SCAN.search(d)]
+            if ORDER_BY_TIMESTAMP.search(statement):
+                problemas += [d for d in detalles if TEMP_SORT in d]
+            if problemas:
+                pytest.fail(f"{path} {params}: {problemas}\n   SQL: {sql[:300]}\n   PLAN: {' | '.join(detalles)}")
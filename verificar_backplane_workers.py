@@ -0,0 +1,161 @@
+# verificar_backplane_workers.py
+"""
+Verifica el enrutamiento entre workers: levanta uvicorn con 2 workers y el
+backplane SQLite, conecta 6 dispositivos por WebSocket (el kernel los reparte
+entre los workers) y crea acciones con peticiones HTTP que también caen en
+cualquiera de los dos. Cada dispositivo debe recibir todas sus acciones y,
+tras confirmarlas, ningún worker debe tener acciones pendientes.
+
+Usa una base SQLite temporal; nunca toca la DATABASE_URL real.
+Uso: python verificar_backplane_workers.py [BACKPLANE_URL]   (por defecto sqlite en el directorio temporal)
+"""
+import asyncio
+import collections
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+DISPOSITIVOS = 6
+ACCIONES_POR_DISPOSITIVO = 5
+WORKERS = 2
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(puerto: int, tmpdir: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'workers.db')}",
+        SECRET_KEY=os.environ.get("SECRET_KEY", "verificar-backplane"),
+        ALGORITHM=os.environ.get("ALGORITHM", "HS256"),
+        DB_ECHO="false",
+        BACKPLANE_URL=sys.argv[1] if len(sys.argv) > 1 else f"sqlite:///{os.path.join(tmpdir, 'bus.db')}",
+        BACKPLANE_PRESENCE_SECONDS="2",
+        TOKEN_SWEEP_INTERVAL_MINUTES="0",
+    )
+    # Las tablas se crean antes para que los workers no compitan creándolas
+    subprocess.run([sys.executable, "-c", "import main; main.create_db_and_tables()"],
+                   env=env, check=True, capture_output=True)
+    log = open(os.path.join(tmpdir, "uvicorn.log"), "w")
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(puerto),
+         "--workers", str(WORKERS), "--log-level", "warning"],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base = f"http://127.0.0.1:{puerto}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{base}/health/").status_code == 200:
+                break
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    return proceso
+
+
+async def dispositivo(device_id: int, ws, client: httpx.AsyncClient, recibidas: dict):
+    """Simula el firmware: registra cada acción recibida y la confirma."""
+    async for data in ws:
+        message = json.loads(data)
+        if message.get("type") == "action_execute":
+            acciones = [message]
+        elif message.get("type") == "action_batch":
+            acciones = message["actions"]
+        else:
+            continue
+        for accion in acciones:
+            recibidas[device_id].add(accion["action_id"])
+            await client.post(f"/actions/device/confirm/{accion['action_id']}")
+
+
+async def verificar(puerto: int) -> bool:
+    base = f"http://127.0.0.1:{puerto}"
+    # Sin keep-alive: cada petición abre conexión y puede caer en cualquier worker
+    async with httpx.AsyncClient(base_url=base, limits=httpx.Limits(max_keepalive_connections=0)) as client:
+        await client.post("/api/auth/register", json={
+            "username": "workers", "email": "workers@example.com", "name": "Workers", "password": "workers"
+        })
+        login = await client.post("/api/auth/login", data={"username": "workers", "password": "workers"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        for i in range(1, DISPOSITIVOS + 1):
+            r = await client.post("/devices/", json={"name": f"esp32-worker-{i}", "status": "online"}, headers=headers)
+            assert r.status_code == 201, r.text
+
+        recibidas = collections.defaultdict(set)
+        sockets = [await websockets.connect(f"ws://127.0.0.1:{puerto}/ws/device/{i}") for i in range(1, DISPOSITIVOS + 1)]
+        lectores = [asyncio.create_task(dispositivo(i, ws, client, recibidas)) for i, ws in enumerate(sockets, start=1)]
+        await asyncio.sleep(3)  # Anuncios de presencia entre workers
+
+        reparto = {}
+        for _ in range(20):
+            estado = (await client.get("/health/backplane")).json()
+            reparto[estado["worker_id"]] = estado["local_devices"]
+        print(f"🔀 Dispositivos por worker: {reparto}")
+
+        creadas = collections.defaultdict(set)
+        for _ in range(ACCIONES_POR_DISPOSITIVO):
+            for i in range(1, DISPOSITIVOS + 1):
+                r = await client.post("/actions/", json={"id_device": i, "action": "LED_ON"}, headers=headers)
+                assert r.status_code == 200, r.text
+                creadas[i].add(r.json()["id"])
+        r = await client.post("/actions/batch", headers=headers, json={
+            "actions": [{"id_device": i, "action": "LED_OFF"} for i in range(1, DISPOSITIVOS + 1)]
+        })
+        assert r.status_code == 200, r.text
+        for accion in r.json():
+            creadas[accion["id_device"]].add(accion["id"])
+
+        await asyncio.sleep(3)
+        pendientes = {}
+        for _ in range(10):
+            estado = (await client.get("/health/action-dispatch")).json()
+            for device_id, cola in estado["devices"].items():
+                pendientes[device_id] = max(pendientes.get(device_id, 0), cola["queue_depth"])
+
+        for tarea in lectores:
+            tarea.cancel()
+        for ws in sockets:
+            await ws.close()
+
+    ok = True
+    for i in range(1, DISPOSITIVOS + 1):
+        faltan = creadas[i] - recibidas[i]
+        marca = "✅" if not faltan else "❌"
+        print(f"{marca} Dispositivo {i}: {len(recibidas[i] & creadas[i])}/{len(creadas[i])} acciones recibidas")
+        ok = ok and not faltan
+    if any(pendientes.values()):
+        print(f"❌ Acciones sin confirmar en algún worker: {pendientes}")
+        ok = False
+    if len(reparto) < WORKERS:
+        print(f"⚠️ Las peticiones llegaron a {len(reparto)} worker(s); la prueba no cubrió el enrutamiento")
+    return ok
+
+
+def main():
+    tmpdir = tempfile.mkdtemp(prefix="backplane_")
+    puerto = puerto_libre()
+    servidor = iniciar_servidor(puerto, tmpdir)
+    try:
+        ok = asyncio.run(verificar(puerto))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+    if not ok:
+        print(f"❌ El enrutamiento entre workers falló (log en {tmpdir}/uvicorn.log)")
+        sys.exit(1)
+    print("✅ Todas las acciones llegaron a su dispositivo, sin importar el worker")
+
+
+if __name__ == "__main__":
+    main()